@@ -0,0 +1,274 @@
+"""
+Benchmark suite for the hot paths of the toy model and the quantum algorithms.
+
+Each benchmark is timed over the particle/layer grid of the paper (2-1024 particles,
+3 and 5 layers), recording the best and median wall time and the peak traced memory.
+Log-log fits of time and memory against the particle count give scaling exponents.
+Results can be stored as a baseline and later runs compared against it; a run fails
+when a point is slower than the baseline by more than `--threshold`, or when a scaling
+exponent grows by more than `--exponent-threshold`.
+
+A benchmark stops growing along the grid once one of its points exceeds the time budget,
+and any benchmark whose dependency stopped is skipped from then on too. Matrices are
+densified only up to `--max-dense-dim`.
+
+Usage:
+    python -m benchmarks.hot_paths --grid quick --save-baseline benchmarks/baseline.json
+    python -m benchmarks.hot_paths --grid paper --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import dataclasses
+from functools import cached_property
+import numpy as np
+import scipy
+import qiskit
+from toy_model.simple_hamiltonian import SimpleHamiltonian, get_tracks
+from toy_model.batch_hamiltonian import BatchHamiltonian
+from quantum_algorithms import sweep
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.HHL import HHLAlgorithm
+
+GRIDS = {
+    "paper": {"particles": [2, 4, 8, 16, 32, 64, 128, 256, 512, 1024], "layers": [3, 5]},
+    "quick": {"particles": [2, 4, 8, 16], "layers": [3]},
+}
+
+
+class Fixture:
+    """Inputs for one (n_particles, layers) grid point, built lazily and shared between benchmarks."""
+
+    def __init__(self, n_particles, layers, config):
+        self.n_particles = n_particles
+        self.layers = layers
+        self.config = config
+        self.seed = sweep.task_seed(config, n_particles, layers)
+
+    def generator(self):
+        return sweep.make_generator(self.n_particles, self.layers, self.config, self.seed)
+
+    @cached_property
+    def event(self):
+        return self.generator().generate_complete_events()
+
+    def new_hamiltonian(self):
+        return SimpleHamiltonian(**self.config["hamiltonian"])
+
+    @cached_property
+    def hamiltonian(self):
+        hamiltonian = self.new_hamiltonian()
+        hamiltonian.construct_hamiltonian(self.event)
+        return hamiltonian
+
+    @cached_property
+    def solution(self):
+        return self.hamiltonian.solve_classicaly()
+
+    @cached_property
+    def dense_A(self):
+        return self.hamiltonian.A.toarray()
+
+    @cached_property
+    def onebqf(self):
+        onebqf = OneBQF(self.dense_A, self.hamiltonian.b)
+        onebqf.build_circuit()
+        return onebqf
+
+
+def _noisy_event_setup(fixture):
+    generator = fixture.generator()
+    generator.generate_complete_events()
+    return (generator,)
+
+
+def _segments_setup(fixture):
+    return fixture.new_hamiltonian(), fixture.event
+
+
+def _hamiltonian_setup(fixture):
+    hamiltonian = fixture.new_hamiltonian()
+    hamiltonian.construct_segments(fixture.event)
+    return hamiltonian, fixture.event
+
+
+def _onebqf_run(onebqf):
+    onebqf.run(seed=0)
+
+
+@dataclasses.dataclass
+class Benchmark:
+    name: str
+    setup: callable
+    run: callable
+    depends: tuple = ()
+    dense: bool = False
+
+
+BENCHMARKS = [
+    Benchmark("generate_complete_events", lambda f: (f.generator(),), lambda g: g.generate_complete_events()),
+    Benchmark("make_noisy_event", _noisy_event_setup, lambda g: g.make_noisy_event(drop_rate=0.1, ghost_rate=0.1)),
+    Benchmark("construct_segments", _segments_setup, lambda h, e: h.construct_segments(e)),
+    Benchmark("construct_hamiltonian", _hamiltonian_setup, lambda h, e: h.construct_hamiltonian(e)),
+    Benchmark("BatchHamiltonian.construct", lambda f: (BatchHamiltonian(**f.config["hamiltonian"]), [f.event]),
+              lambda h, events: h.construct_hamiltonian(events)),
+    Benchmark("solve_classicaly", lambda f: (f.hamiltonian,), lambda h: h.solve_classicaly(),
+              depends=("construct_hamiltonian",)),
+    Benchmark("get_tracks", lambda f: (f.hamiltonian, f.solution, f.event), get_tracks,
+              depends=("construct_hamiltonian", "solve_classicaly")),
+    Benchmark("OneBQF.__init__", lambda f: (f.dense_A, f.hamiltonian.b), OneBQF,
+              depends=("construct_hamiltonian",), dense=True),
+    Benchmark("OneBQF.build_circuit", lambda f: (OneBQF(f.dense_A, f.hamiltonian.b),), lambda q: q.build_circuit(),
+              depends=("OneBQF.__init__",), dense=True),
+    Benchmark("OneBQF.run", lambda f: (f.onebqf,), _onebqf_run, depends=("OneBQF.build_circuit",), dense=True),
+    Benchmark("HHLAlgorithm.build_circuit", lambda f: (HHLAlgorithm(f.dense_A, f.hamiltonian.b),),
+              lambda h: h.build_circuit(), depends=("construct_hamiltonian",), dense=True),
+]
+
+
+def measure(benchmark, fixture, repeats, time_budget, track_memory):
+    """
+    Best and median wall time over up to `repeats` runs (fewer once the budget is spent) and
+    the peak memory of one extra run under tracemalloc, skipped for points over budget.
+    """
+    times = []
+    while len(times) < repeats and sum(times) < time_budget:
+        args = benchmark.setup(fixture)
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.run(*args)
+        times.append(time.perf_counter() - start)
+
+    peak_memory = None
+    if track_memory and min(times) <= time_budget:
+        args = benchmark.setup(fixture)
+        gc.collect()
+        tracemalloc.start()
+        benchmark.run(*args)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"time": min(times), "time_median": float(np.median(times)), "repeats": len(times),
+            "peak_memory": peak_memory}
+
+
+def fit_exponent(sizes, values, floor):
+    """Slope of log(value) against log(size) over the points above `floor`; None with fewer than three."""
+    points = [(s, v) for s, v in zip(sizes, values) if v is not None and v > floor]
+    if len(points) < 3: return None
+    x, y = np.log([p[0] for p in points]), np.log([p[1] for p in points])
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def run_suite(grid, names=None, repeats=3, time_budget=60.0, max_dense_dim=4096, track_memory=True, config=None):
+    config = sweep.merge_config(sweep.DEFAULT_CONFIG, config or {})
+    benchmarks = [b for b in BENCHMARKS if names is None or b.name in names]
+    results = {b.name: {} for b in benchmarks}
+
+    for layers in grid["layers"]:
+        exhausted = set()
+        for n in grid["particles"]:
+            fixture = Fixture(n, layers, config)
+            for benchmark in benchmarks:
+                if benchmark.name in exhausted: continue
+                if any(dep in exhausted for dep in benchmark.depends):
+                    exhausted.add(benchmark.name)
+                    continue
+                if benchmark.dense and fixture.hamiltonian.n_segments > max_dense_dim:
+                    exhausted.add(benchmark.name)
+                    continue
+                point = measure(benchmark, fixture, repeats, time_budget, track_memory)
+                results[benchmark.name].setdefault(f"L{layers}", {})[n] = point
+                print(f"{benchmark.name:28s} L={layers} n={n:5d}  {point['time']:.4g}s"
+                      + (f"  {point['peak_memory'] / 2 ** 20:.1f} MiB" if track_memory else ""))
+                if point["time"] > time_budget:
+                    exhausted.add(benchmark.name)
+
+    exponents = {}
+    for name, by_layers in results.items():
+        for layers, points in by_layers.items():
+            sizes = list(points)
+            exponents.setdefault(name, {})[layers] = {
+                "time": fit_exponent(sizes, [points[n]["time"] for n in sizes], floor=1e-2),
+                "memory": fit_exponent(sizes, [points[n]["peak_memory"] for n in sizes], floor=2 ** 16),
+            }
+
+    return {
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "python": sys.version.split()[0], "numpy": np.__version__, "scipy": scipy.__version__,
+                    "qiskit": qiskit.__version__},
+        "grid": grid,
+        "results": {name: {layers: {str(n): p for n, p in points.items()} for layers, points in by_layers.items()}
+                    for name, by_layers in results.items()},
+        "exponents": exponents,
+    }
+
+
+def compare(current, baseline, threshold=0.25, exponent_threshold=0.2, min_time=1e-2):
+    """
+    Per-point time ratios and exponent deltas against a baseline. Points faster than
+    `min_time` in both runs are reported but never count as regressions.
+    """
+    regressions, lines = [], []
+    for name, by_layers in current["results"].items():
+        for layers, points in by_layers.items():
+            base_points = baseline["results"].get(name, {}).get(layers, {})
+            for n, point in points.items():
+                if n not in base_points: continue
+                base_time = base_points[n]["time"]
+                ratio = point["time"] / base_time
+                flag = ""
+                if ratio > 1 + threshold and max(point["time"], base_time) >= min_time:
+                    flag = "REGRESSION"
+                    regressions.append((name, layers, n, ratio))
+                elif ratio < 1 / (1 + threshold) and max(point["time"], base_time) >= min_time:
+                    flag = "faster"
+                lines.append(f"{name:28s} {layers} n={n:>5s}  {base_time:.4g}s -> {point['time']:.4g}s  x{ratio:.2f}  {flag}")
+
+            exponent = current["exponents"].get(name, {}).get(layers, {}).get("time")
+            base_exponent = baseline.get("exponents", {}).get(name, {}).get(layers, {}).get("time")
+            if exponent is not None and base_exponent is not None:
+                flag = ""
+                if exponent - base_exponent > exponent_threshold:
+                    flag = "REGRESSION"
+                    regressions.append((name, layers, "exponent", exponent - base_exponent))
+                lines.append(f"{name:28s} {layers} exponent  {base_exponent:.2f} -> {exponent:.2f}  {flag}")
+    return regressions, lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the toy-model and OneBQF/HHL hot paths.")
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="quick")
+    parser.add_argument("--benchmarks", nargs="+", help="Subset of benchmark names")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--time-budget", type=float, default=60.0, help="Seconds per point before a benchmark stops growing")
+    parser.add_argument("--max-dense-dim", type=int, default=4096)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--save-baseline", help="Write the results as a baseline JSON")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown per point")
+    parser.add_argument("--exponent-threshold", type=float, default=0.2, help="Allowed growth of a scaling exponent")
+    args = parser.parse_args(argv)
+
+    results = run_suite(GRIDS[args.grid], args.benchmarks, args.repeats, args.time_budget,
+                        args.max_dense_dim, not args.no_memory)
+    for path in filter(None, [args.output, args.save_baseline]):
+        sweep.write_json_atomic(path, results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions, lines = compare(results, baseline, args.threshold, args.exponent_threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond the thresholds.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,12 +4,20 @@ import matplotlib.pyplot as plt
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
 from qiskit.visualization import plot_histogram
 from qiskit_aer import AerSimulator
-from qiskit.circuit.library import QFT, RYGate, UnitaryGate
-from scipy.linalg import expm
+from qiskit.circuit.library import QFT, RYGate, UnitaryGate, DiagonalGate, StatePreparation
+from quantum_algorithms.counts_decoding import counts_to_arrays, decode_counts, postselect
+from toy_model import instrumentation
 
 
 class HHLAlgorithm:
-    def __init__(self, matrix_A, vector_b, num_time_qubits=5, shots=10240, debug=False):
+    def __init__(self, matrix_A, vector_b, num_time_qubits=5, shots=10240, debug=False, inversion="controlled"):
+        """
+        inversion: "controlled" applies one X-flipped multi-controlled RY per time-register value;
+                   "multiplexed" applies a single uniformly controlled RY (2^n RY + 2^n CX), same unitary
+        """
+        if inversion not in ("controlled", "multiplexed"):
+            raise ValueError(f"Unknown eigenvalue inversion '{inversion}', expected 'controlled' or 'multiplexed'.")
+        self.inversion = inversion
         A = matrix_A
         self.original_dim = A.shape[0]
         self.debug = debug
@@ -22,12 +30,9 @@ class HHLAlgorithm:
             A_padded = np.zeros((padded_dim, padded_dim), dtype=complex)
             A_padded[:d, :d] = A
             A = (A_padded + A_padded.conj().T) / 2
+        self.padded_dim = padded_dim
 
-            b_padded = np.zeros(padded_dim, dtype=complex)
-            b_padded[:d] = vector_b
-            vector_b = b_padded
-
-        b_normalized = vector_b / np.linalg.norm(vector_b)
+        b_normalized = self.normalize_vector(vector_b)
 
         self.A_orig = A.copy()
         self.A_norm = np.linalg.norm(A)
@@ -48,9 +53,23 @@ class HHLAlgorithm:
         self.circuit = None
         self.counts = None
 
-        self.t = np.pi / np.max(np.abs(np.linalg.eigvals(A)))
-        self.eigenvalues = np.linalg.eigvals(self.A_orig)
-        self.eigenvalues_scaled = np.linalg.eigvals(self.A)
+        # A is Hermitian: one eigendecomposition A = V diag(w) V^dagger serves every power of U
+        self.eigenvalues_scaled, self.eigenvectors = np.linalg.eigh(self.A)
+        self.eigenvalues = self.eigenvalues_scaled * self.A_norm
+        self.t = np.pi / np.max(np.abs(self.eigenvalues_scaled))
+        self._gate_cache = {}
+        self.simulator = None
+        self.compiled_core = None
+        self._state_prep_cache = {}
+
+    def normalize_vector(self, vector_b):
+        """Zero-pads b to the padded system dimension and normalizes it."""
+        vector_b = np.asarray(vector_b)
+        if self.padded_dim != self.original_dim:
+            b_padded = np.zeros(self.padded_dim, dtype=complex)
+            b_padded[:self.original_dim] = vector_b
+            vector_b = b_padded
+        return vector_b / np.linalg.norm(vector_b)
 
     def get_quantum_only_circuit(self):
         """Return a copy of the circuit with all classical elements and measurements removed."""
@@ -68,15 +87,49 @@ class HHLAlgorithm:
 
         return qc_clean
 
-    def create_input_state(self):
+    def create_input_state(self, vector_b=None):
+        """State preparation of the normalized `vector_b` (self.vector_b by default) on the system register."""
+        # The system register starts in |0>, so a reset-free StatePreparation suffices; Aer executes a
+        # mid-register `initialize` (reset + preparation) orders of magnitude more slowly
+        vector_b = self.vector_b if vector_b is None else vector_b
         qc_b = QuantumCircuit(self.num_system_qubits)
-        qc_b.initialize(self.vector_b, list(range(self.num_system_qubits)))
+        qc_b.append(StatePreparation(vector_b), list(range(self.num_system_qubits)))
         return qc_b
 
-    def apply_controlled_u(self, qc, matrix, control, target, power):
-        U = expm(1j * matrix * self.t * power)
-        controlled_U = UnitaryGate(U).control(1)
-        qc.append(controlled_U, [control] + target)
+    def _cached_gate(self, key, build):
+        if key not in self._gate_cache:
+            self._gate_cache[key] = build()
+        return self._gate_cache[key]
+
+    def eigenbasis_gate(self, inverse=False):
+        """V (eigenbasis -> computational basis), or V^dagger with inverse=True, on the system register."""
+        if inverse:
+            return self._cached_gate(("V", True), lambda: UnitaryGate(self.eigenvectors.conj().T, label="V†"))
+        return self._cached_gate(("V", False), lambda: UnitaryGate(self.eigenvectors, label="V"))
+
+    def controlled_phase_gate(self, power, inverse=False):
+        """
+        Controlled diag(e^{i w t power}) in the eigenbasis, on [*system, control]. The inverse
+        reuses the forward gate.
+        """
+        if inverse:
+            return self._cached_gate(("phase", power, True), lambda: self.controlled_phase_gate(power).inverse())
+        phases = np.exp(1j * self.eigenvalues_scaled * self.t * power)
+        return self._cached_gate(("phase", power, False), lambda: DiagonalGate(
+            np.concatenate([np.ones(self.system_dim), phases]).tolist()))
+
+    def controlled_u_gate(self, power, inverse=False):
+        """Controlled U^power = e^{iAt power} (control first) as (1 x V) controlled-diag (1 x V^dagger), cached."""
+        def build():
+            qc = QuantumCircuit(1 + self.num_system_qubits)
+            qc.append(self.eigenbasis_gate(inverse=True), qc.qubits[1:])
+            qc.append(self.controlled_phase_gate(power, inverse), qc.qubits[1:] + qc.qubits[:1])
+            qc.append(self.eigenbasis_gate(), qc.qubits[1:])
+            return qc.to_gate(label=f"cU^{'-' if inverse else ''}{power}")
+        return self._cached_gate(("cU", power, inverse), build)
+
+    def apply_controlled_u(self, qc, control, target, power, inverse=False):
+        qc.append(self.controlled_u_gate(power, inverse), [control] + target)
         return qc
 
     def inverse_qft(self, n_qubits):
@@ -86,9 +139,12 @@ class HHLAlgorithm:
         for qubit in self.time_qr:
             qc.h(qubit)
 
+        # The controlled powers of U share the eigenbasis, so V^dagger ... V is applied once around them
+        qc.append(self.eigenbasis_gate(inverse=True), self.b_qr[:])
         for i in range(self.num_time_qubits):
             power = 2 ** i
-            self.apply_controlled_u(qc, self.A, self.time_qr[self.num_time_qubits - i - 1], list(self.b_qr), power)
+            qc.append(self.controlled_phase_gate(power), [*self.b_qr, self.time_qr[self.num_time_qubits - i - 1]])
+        qc.append(self.eigenbasis_gate(), self.b_qr[:])
 
         iqft = self.inverse_qft(self.num_time_qubits).to_gate(label="IQFT")
         qc.append(iqft, self.time_qr[:])
@@ -97,9 +153,12 @@ class HHLAlgorithm:
         qft = QFT(self.num_time_qubits, do_swaps=True).to_gate(label="QFT")
         qc.append(qft, self.time_qr[:])
 
+        qc.append(self.eigenbasis_gate(inverse=True), self.b_qr[:])
         for i in reversed(range(self.num_time_qubits)):
             power = 2 ** i
-            self.apply_controlled_u(qc, -self.A, self.time_qr[self.num_time_qubits - i - 1], list(self.b_qr), power)
+            qc.append(self.controlled_phase_gate(power, inverse=True),
+                      [*self.b_qr, self.time_qr[self.num_time_qubits - i - 1]])
+        qc.append(self.eigenbasis_gate(), self.b_qr[:])
 
         for qubit in self.time_qr:
             qc.h(qubit)
@@ -112,83 +171,164 @@ class HHLAlgorithm:
     def WRW_operator(self,qc,ancilla_qubit, target_qubit):
         pass
 
-    def build_circuit(self):
+    def inversion_angles(self, gain=0.3):
+        """
+        Eigenvalue estimate lambda = 2 pi (i / 2^n) / t and RY angle 2 arcsin(min(1, gain / (2 lambda)))
+        for every time-register value i. Values with lambda ~ 0 get angle 0 (no rotation).
+        """
+        #phase = i / (2 ** n_time)
+        #if phase >= 0.5:
+        #    phase = phase - 1.0
+        phases = np.arange(2 ** self.num_time_qubits) / (2 ** self.num_time_qubits)
+        lams = 2 * np.pi * phases / self.t
+        angles = np.zeros(len(lams))
+        valid = np.abs(lams) >= 1e-9  # or abs(lam) > 10.0
+        angles[valid] = 2 * np.arcsin(np.minimum(1.0, gain * (1.0 / lams[valid]) / 2))
+        return lams, angles
+
+    def apply_multiplexed_ry(self, qc, angles):
+        """
+        Uniformly controlled RY on the ancilla, rotating by angles[i] when the time register holds i
+        (time_qr[0] is the most significant bit of i). Gray-code decomposition: RY(alpha_g) followed by
+        a CX from the control whose bit flips between gray(g) and gray(g + 1), for g = 0 .. 2^n - 1,
+        with alpha_g = 2^-n sum_k (-1)^popcount(k & gray(g)) theta_k.
+        """
+        n = self.num_time_qubits
+        k = np.arange(2 ** n)
+        # Multiplexer index k reads time_qr[j] as bit j, which is bit n - 1 - j of i
+        i_of_k = np.zeros_like(k)
+        for j in range(n):
+            i_of_k |= ((k >> j) & 1) << (n - 1 - j)
+        walsh = np.asarray(angles, dtype=float)[i_of_k]
+        for bit in range(n):
+            pairs = walsh.reshape(-1, 2, 2 ** bit)
+            walsh = np.stack([pairs[:, 0] + pairs[:, 1], pairs[:, 0] - pairs[:, 1]], axis=1).reshape(-1)
+        gray = k ^ (k >> 1)
+        alphas = walsh[gray] / 2 ** n
+
+        for g in range(2 ** n):
+            qc.ry(alphas[g], self.ancilla_qr[0])
+            flipped = gray[g] ^ gray[(g + 1) % 2 ** n]
+            qc.cx(self.time_qr[int(flipped).bit_length() - 1], self.ancilla_qr[0])
+
+    def build_core(self):
+        """
+        The part of the circuit that depends only on A: phase estimation, eigenvalue inversion,
+        uncompute and measurements, acting on whatever state the system register is prepared in.
+        """
         qc = QuantumCircuit(self.time_qr, self.b_qr, self.ancilla_qr, self.classical_reg)
 
-        qc.compose(self.create_input_state(), qubits=list(self.b_qr), inplace=True)
-
         self.phase_estimation(qc)
 
-        gain = 0.3
-        #n_time = self.num_time_qubits
-        for i in range(2 ** self.num_time_qubits):
-            #phase = i / (2 ** n_time)
-            #if phase >= 0.5:
-            #    phase = phase - 1.0
+        lams, angles = self.inversion_angles()
+        rotated = np.flatnonzero(np.abs(lams) >= 1e-9)
 
-            phase = i / (2 ** self.num_time_qubits)
-            lam = 2 * np.pi * phase / self.t
-            if abs(lam) < 1e-9:# or abs(lam) > 10.0:
-                continue
+        if self.debug:
+            for i in rotated:
+                bits = format(i, f"0{self.num_time_qubits}b")
+                print(f"Time state |{bits}>: phase = {i / 2 ** self.num_time_qubits:.4f}, ",
+                      f"\u03bb_scaled = {lams[i]:.4f}, \u03bb_true = {lams[i] * self.A_norm:.4f}, ",
+                      f"1/\u03bb = {1.0 / lams[i]:.2f}, Ry angle = {angles[i]:.4f}")
 
-            inv_lam = 1.0 / lam
-            angle = 2 * np.arcsin(min(1.0, gain * inv_lam / 2))
+        if self.inversion == "multiplexed":
+            self.apply_multiplexed_ry(qc, angles)
+        else:
             controls = list(self.time_qr)
-
-            if self.debug:
+            for i in rotated:
                 bits = format(i, f"0{self.num_time_qubits}b")
-                print(f"Time state |{bits}>: phase = {phase:.4f}, ",
-                      f"\u03bb_scaled = {lam:.4f}, \u03bb_true = {lam * self.A_norm:.4f}, ",
-                      f"1/\u03bb = {inv_lam:.2f}, Ry angle = {angle:.4f}")
-
-            bits = format(i, f"0{self.num_time_qubits}b")
-            for j, bit in enumerate(bits):
-                if bit == '0':
-                    qc.x(self.time_qr[j])
+                for j, bit in enumerate(bits):
+                    if bit == '0':
+                        qc.x(self.time_qr[j])
 
-            cry = RYGate(angle).control(num_ctrl_qubits=self.num_time_qubits)
-            qc.append(cry, [*controls, self.ancilla_qr[0]])
+                cry = RYGate(angles[i]).control(num_ctrl_qubits=self.num_time_qubits)
+                qc.append(cry, [*controls, self.ancilla_qr[0]])
 
-            for j, bit in enumerate(bits):
-                if bit == '0':
-                    qc.x(self.time_qr[j])
+                for j, bit in enumerate(bits):
+                    if bit == '0':
+                        qc.x(self.time_qr[j])
 
         self.uncompute_phase_estimation(qc)
 
         qc.measure(self.ancilla_qr[0], self.classical_reg[0])
         qc.measure(self.b_qr, self.classical_reg[1:])
+        return qc
+
+    @instrumentation.traced("hhl.build_circuit")
+    def build_circuit(self):
+        qc = QuantumCircuit(self.time_qr, self.b_qr, self.ancilla_qr, self.classical_reg)
+        qc.compose(self.create_input_state(), qubits=list(self.b_qr), inplace=True)
+        qc.compose(self.build_core(), inplace=True)
 
         self.circuit = qc
+        instrumentation.count("gates_emitted", qc.size())
         return qc
 
+    @instrumentation.traced("hhl.compile_core")
+    def compile_core(self, simulator=None, optimization_level=2):
+        """
+        Builds and transpiles the A-dependent core once, for `run_batch`/`solve_batch`. The state
+        preparations are transpiled separately and prepended, so `simulator` must not impose a
+        coupling map (any layout or routing would not carry over between the two parts).
+        """
+        self.simulator = simulator or self.simulator or AerSimulator()
+        self.compiled_core = transpile(self.build_core(), self.simulator, optimization_level=optimization_level)
+        self._state_prep_cache = {}
+        return self.compiled_core
+
+    def _compiled_state_prep(self, vector_b):
+        vector_b = self.normalize_vector(vector_b)
+        key = vector_b.tobytes()
+        if key not in self._state_prep_cache:
+            qc = QuantumCircuit(self.time_qr, self.b_qr, self.ancilla_qr, self.classical_reg)
+            qc.compose(self.create_input_state(vector_b), qubits=list(self.b_qr), inplace=True)
+            self._state_prep_cache[key] = transpile(qc, self.simulator)
+        return self._state_prep_cache[key]
+
+    @instrumentation.traced("hhl.run_batch")
+    def run_batch(self, vectors_b, shots=None):
+        """
+        Counts for each right-hand side in `vectors_b`, from one simulator job. The core is compiled
+        on first use; per b only its (cached) state preparation is transpiled.
+        """
+        if self.compiled_core is None: self.compile_core()
+        shots = shots or self.shots
+        circuits = [self._compiled_state_prep(b).compose(self.compiled_core) for b in vectors_b]
+        instrumentation.count("shots", shots * len(circuits))
+        with instrumentation.span("hhl.simulate", circuits=len(circuits)):
+            result = self.simulator.run(circuits, shots=shots).result()
+        return [result.get_counts(i) for i in range(len(circuits))]
+
+    def solve_batch(self, vectors_b, shots=None):
+        """`get_solution` for each right-hand side in `vectors_b`, see `run_batch`."""
+        return [self.get_solution(counts) for counts in self.run_batch(vectors_b, shots)]
+
+    @instrumentation.traced("hhl.run")
     def run(self):
+        instrumentation.count("shots", self.shots)
         simulator = AerSimulator()
-        transpiled_circuit = transpile(self.circuit, simulator)
-        job = simulator.run(transpiled_circuit, shots=self.shots)
-        result = job.result()
+        with instrumentation.span("hhl.transpile"):
+            transpiled_circuit = transpile(self.circuit, simulator)
+        with instrumentation.span("hhl.simulate"):
+            job = simulator.run(transpiled_circuit, shots=self.shots)
+            result = job.result()
         self.counts = result.get_counts()
         return self.counts
 
-    def get_solution(self):
-        if self.counts is None:
+    @instrumentation.traced("hhl.decode")
+    def get_solution(self, counts=None):
+        counts = self.counts if counts is None else counts
+        if counts is None:
             raise ValueError("No measurement results available. Run run() first.")
 
-        total_success = 0
-        padded_dim = 2 ** self.num_system_qubits
-        prob_dist = np.zeros(padded_dim)
+        prob_dist, total_success = decode_counts(counts, self.num_system_qubits)
 
-        for outcome, count in self.counts.items():
-            if outcome[-1] == '1':
-                print(f"Outcome: {outcome}, Count: {count}")
-                #print(outcome[:-1])
-                system_bits = outcome[:-1]#[::-1]
-                #print(f"System bits: {system_bits}")
-                index = int(system_bits, 2)
-                prob_dist[index] += count
-                total_success += count
+        if self.debug:
+            for system, count in zip(*postselect(*counts_to_arrays(counts))):
+                print(f"Outcome: b = {format(int(system), f'0{self.num_system_qubits}b')}, ancilla = 1, Count: {count}")
 
         if total_success == 0:
-            print("No valid solution: ancilla was never measured as |1⟩.")
+            if self.debug:
+                print("No valid solution: ancilla was never measured as |1⟩.")
             return None
 
         prob_dist = prob_dist / total_success
@@ -208,27 +348,24 @@ class HHLAlgorithm:
         plt.savefig(filename)
         print(f"Results histogram saved as '{filename}'.")
 
+    @instrumentation.traced("hhl.statevector")
     def simulate_statevector(self):
-        from qiskit_aer import Aer
-        backend = Aer.get_backend("statevector_simulator")
-        job = backend.run(transpile(self.circuit, backend))
-        statevector = job.result().get_statevector()
-        return statevector
+        """Final state of the circuit without its measurements, from AerSimulator(method="statevector")."""
+        if self.circuit is None: self.build_circuit()
+        qc = self.get_quantum_only_circuit()
+        qc.save_statevector()
+        simulator = AerSimulator(method="statevector")
+        result = simulator.run(transpile(qc, simulator)).result()
+        return result.get_statevector()
 
     def extract_postselected_solution(self, statevector):
-        dim = 2 ** (self.num_time_qubits + self.num_system_qubits + 1)
-        total_qubits = self.num_time_qubits + self.num_system_qubits + 1
-        system_qubits = self.num_system_qubits
-        ancilla_index = self.num_time_qubits + self.num_system_qubits
-
-        probs = np.abs(statevector.data) ** 2
-        sol = np.zeros(2 ** system_qubits)
-
-        for i, amp in enumerate(statevector.data):
-            if ((i >> ancilla_index) & 1) == 1:
-                system_state = (i >> 0) & ((1 << system_qubits) - 1)
-                sol[system_state] += np.abs(amp) ** 2
-
-        sol = np.sqrt(sol)
+        """
+        Normalized sqrt of the system-register distribution given ancilla = |1>. The amplitude
+        index is anc * 2^(n_b + n_t) + b * 2^n_t + time, so a (2, system, time) reshape puts
+        the post-selection and the marginalization over the time register on array axes.
+        """
+        amplitudes = np.asarray(getattr(statevector, "data", statevector))
+        probs = np.abs(amplitudes.reshape(2, self.system_dim, 2 ** self.num_time_qubits)) ** 2
+        sol = np.sqrt(probs[1].sum(axis=1))
         sol = sol / np.linalg.norm(sol)
         return sol
@@ -4,11 +4,15 @@ from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
 from qiskit_aer import AerSimulator
 from qiskit.circuit.library import QFT, RXGate
 from qiskit_aer import AerSimulator
-from qiskit_aer.noise import NoiseModel
-from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+from quantum_algorithms.counts_decoding import decode_counts
+from quantum_algorithms.noise_snapshots import load_backend, load_noise_model, compact_noisy_problem
+from quantum_algorithms.adaptive_sampling import run_adaptive
+from toy_model import instrumentation
 
 class OneBQF:
+    @instrumentation.traced("onebqf.init")
     def __init__(self, matrix_A, vector_b, num_time_qubits=1, shots=1024, debug=False):
         A = matrix_A
         self.original_dim = A.shape[0]
@@ -63,6 +67,7 @@ class OneBQF:
         
         rows, cols = np.where(np.triu(B) != 0)
         self.interaction_pairs = list(zip(rows, cols))
+        instrumentation.count("interaction_pairs", len(self.interaction_pairs))
         
         if self.debug:
             print("--- Automated Matrix Analysis ---")
@@ -139,6 +144,7 @@ class OneBQF:
             self.apply_controlled_u(self.circuit, self.time_qr[self.num_time_qubits - 1 - i], list(self.b_qr), power, inverse=True)
         qc.h(self.time_qr)
 
+    @instrumentation.traced("onebqf.build_circuit")
     def build_circuit(self):
         self.circuit = QuantumCircuit(self.time_qr, self.b_qr, self.ancilla_qr, self.classical_reg)
         self.circuit.h(self.b_qr)
@@ -149,61 +155,100 @@ class OneBQF:
         self.uncompute_phase_estimation(self.circuit)
         self.circuit.measure(self.ancilla_qr[0], self.classical_reg[0])
         self.circuit.measure(self.b_qr, self.classical_reg[1:])
+        instrumentation.count("gates_emitted", self.circuit.size())
         return self.circuit
 
-    def run(self, use_noise_model=False, backend_name='ibm_torino'):
+    def simulate_statevector(self):
+        """Ideal final statevector from the structure-aware kernel, without building the circuit."""
+        return OneBQFKernel(self).statevector()
+
+    @instrumentation.traced("onebqf.run")
+    def run(self, use_noise_model=False, backend_name='ibm_torino', use_kernel=False, seed=None, cache=None,
+            offline=False, compact_qubits=True):
         """
         Run the circuit with optional noise model.
         
         Args:
             use_noise_model (bool): If True, uses the noise model from the specified backend
             backend_name (str): Name of the IBM backend to get noise model from
+            use_kernel (bool): If True, samples the noiseless counts from OneBQFKernel instead of Aer
+            seed (int): Sampling seed for the kernel or the Aer simulator
+            cache (TranspileCache): Optional persistent cache for the transpiled circuit
+            offline (bool): If True, never contact IBM Quantum; use local snapshots or bundled fake backends
+            compact_qubits (bool): If True, simulate only the physical qubits the transpiled circuit touches
         """
+        instrumentation.count("shots", self.shots)
+        if use_kernel:
+            with instrumentation.span("onebqf.simulate", method="kernel"):
+                self.counts = OneBQFKernel(self).sample_counts(self.shots, seed=seed)
+            return self.counts
+
         simulator = AerSimulator()
         
         if use_noise_model:
-            # Load your IBM account (make sure you've saved your API token)
-            
-            service = QiskitRuntimeService()
-            backend = service.backend(backend_name)
-            noise_model = NoiseModel.from_backend(backend)
+            # Snapshots are fetched once with your saved IBM account and reused offline afterwards
+            backend = load_backend(backend_name, allow_network=not offline)
+            noise_model = load_noise_model(backend_name, allow_network=not offline)
             basis_gates = noise_model.basis_gates
             
-            print(f"\n--- Using {backend_name} Noise Model ---")
+            print(f"\n--- Using {backend_name} Noise Model ({backend.name}) ---")
             print(f"Basis gates: {basis_gates}")
             print(f"Number of qubits: {backend.num_qubits}")
             
-            pm = generate_preset_pass_manager(
-                optimization_level=3,
-                backend=backend
-            )
-            transpiled_circuit = pm.run(self.circuit)
+            with instrumentation.span("onebqf.transpile", backend=backend_name):
+                if cache is not None:
+                    transpiled_circuit = cache.transpile(self.circuit, backend, optimization_level=3)
+                else:
+                    pm = generate_preset_pass_manager(
+                        optimization_level=3,
+                        backend=backend
+                    )
+                    transpiled_circuit = pm.run(self.circuit)
+
+            if compact_qubits:
+                transpiled_circuit, noise_model = compact_noisy_problem(transpiled_circuit, noise_model)
             
             simulator = AerSimulator(noise_model=noise_model)
-            job = simulator.run(transpiled_circuit, shots=self.shots)
                 
         else:
-            transpiled_circuit = transpile(self.circuit, simulator, optimization_level=3)
-            job = simulator.run(transpiled_circuit, shots=self.shots)
-        
-        result = job.result()
+            with instrumentation.span("onebqf.transpile", backend="aer"):
+                if cache is not None:
+                    transpiled_circuit = cache.transpile(self.circuit, simulator, optimization_level=3)
+                else:
+                    transpiled_circuit = transpile(self.circuit, simulator, optimization_level=3)
+
+        with instrumentation.span("onebqf.simulate", method="aer", num_qubits=transpiled_circuit.num_qubits):
+            job = simulator.run(transpiled_circuit, shots=self.shots, seed_simulator=seed)
+            result = job.result()
         self.counts = result.get_counts()
         return self.counts
 
-    def get_solution(self, counts=None):
+    def run_adaptive(self, **kwargs):
+        """
+        Samples in parallel chunks until the requested confidence intervals are reached.
+        See `adaptive_sampling.run_adaptive` for the options; sets `self.counts` and `self.shots_used`.
+        """
+        return run_adaptive(self, **kwargs)
+
+    @instrumentation.traced("onebqf.decode")
+    def get_solution(self, counts=None, sparse=False):
+        """
+        Post-selects ancilla=|1> and returns the normalized solution and the success count.
+        With sparse=True the solution is returned as (indices, amplitudes) of the observed
+        system states only, which avoids allocating 2^n entries for wide registers.
+        """
         if counts: self.counts = counts
         if not self.counts: raise ValueError("No measurement results available.")
-        total_success, prob_dist = 0, np.zeros(2**self.num_system_qubits)
 
-        for outcome, count in self.counts.items():
-            if outcome[-1] == '1':
-                system_bits = outcome[:-1]#[::-1]
-                index = int(system_bits, 2)
-                prob_dist[index] += count
-                total_success += count
+        if sparse:
+            indices, frequencies, total_success = decode_counts(self.counts, self.num_system_qubits, sparse=True)
+            if total_success == 0: return (indices, frequencies.astype(float)), 0
+            keep = indices < self.original_dim
+            return (indices[keep], np.sqrt(frequencies[keep] / total_success)), total_success
 
+        prob_dist, total_success = decode_counts(self.counts, self.num_system_qubits)
         if total_success == 0: return np.zeros(self.original_dim)
         prob_dist /= np.sum(prob_dist)
         solution_padded = np.sqrt(prob_dist)
         solution_padded /= np.linalg.norm(solution_padded)
-        return solution_padded[:self.original_dim], total_success
\ No newline at end of file
+        return solution_padded[:self.original_dim], total_success
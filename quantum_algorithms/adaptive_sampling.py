@@ -0,0 +1,174 @@
+"""
+Adaptive shot allocation for OneBQF: shots are executed in chunks on worker processes
+with independent seeds, merged incrementally, and sampling stops as soon as the
+requested confidence-interval half-widths on the success rate and on the Hellinger
+fidelity to a reference distribution are reached. With the kernel, the statevector is
+simulated once in the calling process and only its outcome probabilities go to the workers.
+"""
+import os
+import dataclasses
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from scipy.stats import norm
+from qiskit import transpile
+from qiskit_aer import AerSimulator
+from quantum_algorithms.onebqf_kernel import OneBQFKernel, sample_counts
+from quantum_algorithms.counts_decoding import decode_counts
+from quantum_algorithms.noise_snapshots import load_backend, load_noise_model, compact_noisy_problem
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+
+@dataclasses.dataclass
+class AdaptiveSamplingResult:
+    counts: dict
+    shots_used: int
+    n_chunks: int
+    converged: bool
+    success_rate: float
+    success_halfwidth: float
+    fidelity: float = None
+    fidelity_halfwidth: float = None
+
+
+def _sample_aer_chunk(circuit, noise_model, shots, seed):
+    simulator = AerSimulator(noise_model=noise_model, max_parallel_threads=1)
+    return simulator.run(circuit, shots=shots, seed_simulator=seed).result().get_counts()
+
+
+def _sample_kernel_chunk(probabilities, num_system_qubits, shots, seed):
+    return sample_counts(probabilities, num_system_qubits, shots, seed)
+
+
+def wilson_halfwidth(successes, trials, z):
+    """Half-width of the Wilson score interval for a binomial proportion."""
+    if trials == 0: return np.inf
+    p = successes / trials
+    return z * np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2)) / (1 + z ** 2 / trials)
+
+
+def hellinger_fidelity_interval(system_counts, reference, z):
+    """
+    Hellinger fidelity BC^2 (BC = sum_i sqrt(p_i q_i)) of the post-selected distribution to
+    `reference`, with a delta-method half-width. For multinomial sampling of n post-selected
+    shots, Var(BC) ~= (sum_{p_i > 0} q_i - BC^2) / (4 n).
+    """
+    n = np.sum(system_counts)
+    if n == 0: return 0.0, np.inf
+    p = system_counts / n
+    q = reference / np.sum(reference)
+    bc = np.sum(np.sqrt(p * q))
+    var_bc = max(np.sum(q[p > 0]) - bc ** 2, 0.0) / (4 * n)
+    return bc ** 2, z * 2 * bc * np.sqrt(var_bc)
+
+
+def run_adaptive(onebqf, success_halfwidth=None, fidelity_halfwidth=None, reference=None,
+                 chunk_shots=100_000, max_shots=100_000_000, min_shots=None, confidence=0.95,
+                 n_workers=None, seed=None, use_kernel=False, use_noise_model=False,
+                 backend_name='ibm_torino', offline=False, cache=None):
+    """
+    Samples a OneBQF instance in chunks until the requested precision is reached.
+
+    Args:
+        onebqf (OneBQF): Algorithm instance; the circuit is built if needed
+        success_halfwidth (float): Target CI half-width on the ancilla success rate
+        fidelity_halfwidth (float): Target CI half-width on the Hellinger fidelity to `reference`
+        reference (array): Reference post-selected distribution over the padded system states
+        chunk_shots (int): Shots per chunk
+        max_shots (int): Hard upper bound on shots
+        min_shots (int): Shots to take before stopping is considered (defaults to one chunk per worker)
+        confidence (float): Two-sided confidence level of the intervals
+        n_workers (int): Worker processes (defaults to the CPU count)
+        seed (int): Root seed; chunk seeds are spawned from it
+        use_kernel (bool): Sample the noiseless distribution from OneBQFKernel instead of Aer
+        use_noise_model, backend_name, offline, cache: As in `OneBQF.run`
+
+    Returns:
+        AdaptiveSamplingResult: Merged counts and the statistics at the stopping point.
+                                `onebqf.counts` and `onebqf.shots_used` are also set.
+    """
+    if success_halfwidth is None and fidelity_halfwidth is None:
+        raise ValueError("At least one of success_halfwidth or fidelity_halfwidth must be given.")
+    if fidelity_halfwidth is not None and reference is None:
+        raise ValueError("A reference distribution is required for fidelity_halfwidth.")
+
+    n_workers = n_workers or os.cpu_count()
+    min_shots = chunk_shots * n_workers if min_shots is None else min_shots
+    z = norm.ppf(0.5 + confidence / 2)
+
+    if use_kernel:
+        task, payload = _sample_kernel_chunk, (OneBQFKernel(onebqf).probabilities(), onebqf.num_system_qubits)
+    else:
+        if onebqf.circuit is None: onebqf.build_circuit()
+        noise_model = None
+        if use_noise_model:
+            backend = load_backend(backend_name, allow_network=not offline)
+            noise_model = load_noise_model(backend_name, allow_network=not offline)
+        else:
+            backend = AerSimulator()
+        if cache is not None:
+            transpiled = cache.transpile(onebqf.circuit, backend, optimization_level=3)
+        elif use_noise_model:
+            transpiled = generate_preset_pass_manager(optimization_level=3, backend=backend).run(onebqf.circuit)
+        else:
+            transpiled = transpile(onebqf.circuit, backend, optimization_level=3)
+        if use_noise_model:
+            transpiled, noise_model = compact_noisy_problem(transpiled, noise_model)
+        task, payload = _sample_aer_chunk, (transpiled, noise_model)
+
+    seeds = iter(np.random.SeedSequence(seed).generate_state(max_shots // chunk_shots + 1))
+    merged = Counter()
+    system_counts = np.zeros(2 ** onebqf.num_system_qubits)
+    shots_used, successes, n_chunks, submitted = 0, 0, 0, 0
+    converged = False
+    success_hw, fidelity, fidelity_hw = np.inf, None, None
+
+    executor = ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        pending, future_shots = set(), {}
+        while True:
+            # The last chunk is partial when max_shots is not a multiple of chunk_shots
+            while len(pending) < n_workers and submitted < max_shots:
+                shots = min(chunk_shots, max_shots - submitted)
+                future = executor.submit(task, *payload, shots, int(next(seeds)))
+                pending.add(future)
+                future_shots[future] = shots
+                submitted += shots
+            if not pending: break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                counts = future.result()
+                merged.update(counts)
+                chunk_dist, chunk_success = decode_counts(counts, onebqf.num_system_qubits)
+                system_counts += chunk_dist
+                successes += chunk_success
+                shots_used += future_shots.pop(future)
+                n_chunks += 1
+
+            success_hw = wilson_halfwidth(successes, shots_used, z)
+            if reference is not None:
+                fidelity, fidelity_hw = hellinger_fidelity_interval(system_counts, np.asarray(reference), z)
+            if shots_used >= min_shots:
+                converged = ((success_halfwidth is None or success_hw <= success_halfwidth) and
+                             (fidelity_halfwidth is None or fidelity_hw <= fidelity_halfwidth))
+            if converged: break
+    finally:
+        # Queued chunks are dropped; once converged, chunks still running are not waited for
+        executor.shutdown(wait=not converged, cancel_futures=True)
+
+    if onebqf.debug:
+        print(f"Adaptive sampling: {shots_used} shots in {n_chunks} chunks, converged={converged}")
+
+    onebqf.counts = dict(merged)
+    onebqf.shots_used = shots_used
+    return AdaptiveSamplingResult(
+        counts=onebqf.counts,
+        shots_used=shots_used,
+        n_chunks=n_chunks,
+        converged=bool(converged),
+        success_rate=successes / shots_used if shots_used else 0.0,
+        success_halfwidth=float(success_hw),
+        fidelity=None if fidelity is None else float(fidelity),
+        fidelity_halfwidth=None if fidelity_hw is None else float(fidelity_hw),
+    )
@@ -0,0 +1,161 @@
+"""
+Asyncio pipeline overlapping circuit construction, transpilation, simulation and decoding.
+
+Each stage runs a fixed number of workers connected by bounded queues, so a slow stage
+applies backpressure upstream instead of letting work pile up in memory. Building runs on
+a thread pool, in-process, so the algorithm instances are never pickled and keep the state
+`build_circuit` sets; only the built circuits go to the process pool for transpilation.
+Simulation goes through a pluggable `ExecutionBackend` and decoding runs on a thread pool.
+Throughput is therefore set by the slowest stage.
+"""
+import os
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from qiskit_aer import AerSimulator
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+_DONE = object()
+
+
+def _transpile(circuit, target, optimization_level):
+    return generate_preset_pass_manager(optimization_level=optimization_level, backend=target).run(circuit)
+
+
+class ExecutionBackend(ABC):
+    """Interface between the pipeline and whatever executes the transpiled circuits."""
+
+    @property
+    @abstractmethod
+    def target(self):
+        """Picklable Qiskit backend that circuits are transpiled against."""
+        pass
+
+    @abstractmethod
+    async def run(self, circuit, shots):
+        """Executes one transpiled circuit and returns its counts dictionary."""
+        pass
+
+
+class AerBackend(ExecutionBackend):
+    """Local Aer simulator; jobs run on a thread pool since Aer releases the GIL."""
+
+    def __init__(self, max_workers=1, **simulator_options):
+        self.simulator = AerSimulator(**simulator_options)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def target(self):
+        return self.simulator
+
+    def _run(self, circuit, shots):
+        return self.simulator.run(circuit, shots=shots).result().get_counts()
+
+    async def run(self, circuit, shots):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._run, circuit, shots)
+
+
+class MockRemoteBackend(ExecutionBackend):
+    """Stand-in for a remote provider: adds queueing latency around another backend."""
+
+    def __init__(self, backend=None, latency=1.0):
+        self.backend = backend or AerBackend()
+        self.latency = latency
+
+    @property
+    def target(self):
+        return self.backend.target
+
+    async def run(self, circuit, shots):
+        await asyncio.sleep(self.latency)
+        return await self.backend.run(circuit, shots)
+
+
+class AsyncPipeline:
+    def __init__(self, backend=None, build_workers=None, transpile_workers=None, simulate_workers=1,
+                 decode_workers=1, queue_size=2, optimization_level=3):
+        """
+        Args:
+            backend (ExecutionBackend): Defaults to a local AerBackend
+            build_workers (int): Concurrent circuit builds (defaults to half the CPU count)
+            transpile_workers (int): Concurrent transpilations (defaults to half the CPU count)
+            simulate_workers (int): Jobs in flight on the backend
+            decode_workers (int): Concurrent `get_solution` calls
+            queue_size (int): Capacity of each inter-stage queue; bounds work in progress
+            optimization_level (int): Transpiler optimization level
+        """
+        half_cpus = max(1, (os.cpu_count() or 2) // 2)
+        self.backend = backend or AerBackend()
+        self.build_workers = build_workers or half_cpus
+        self.transpile_workers = transpile_workers or half_cpus
+        self.simulate_workers = simulate_workers
+        self.decode_workers = decode_workers
+        self.queue_size = queue_size
+        self.optimization_level = optimization_level
+
+    async def _stage(self, handler, inbox, outbox, n_workers):
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    await inbox.put(_DONE)
+                    return
+                await outbox.put(await handler(item))
+
+        async with asyncio.TaskGroup() as group:
+            for _ in range(n_workers):
+                group.create_task(worker())
+        await outbox.put(_DONE)
+
+    async def run(self, algorithms):
+        """
+        Pushes OneBQF / HHLAlgorithm instances through build -> transpile -> simulate -> decode.
+
+        Returns:
+            list: `get_solution()` of each algorithm, in input order. Each instance also
+                  gets its `circuit` and `counts` attributes set.
+        """
+        algorithms = list(algorithms)
+        loop = asyncio.get_running_loop()
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(4)]
+        results = [None] * len(algorithms)
+        target = self.backend.target
+
+        with ProcessPoolExecutor(max_workers=self.transpile_workers) as processes, \
+                ThreadPoolExecutor(max_workers=self.build_workers) as builders, \
+                ThreadPoolExecutor(max_workers=self.decode_workers) as threads:
+
+            async def build(index):
+                algorithms[index].circuit = await loop.run_in_executor(builders, algorithms[index].build_circuit)
+                return index
+
+            async def transpile(index):
+                transpiled = await loop.run_in_executor(processes, _transpile, algorithms[index].circuit,
+                                                        target, self.optimization_level)
+                return index, transpiled
+
+            async def simulate(item):
+                index, transpiled = item
+                algorithms[index].counts = await self.backend.run(transpiled, algorithms[index].shots)
+                return index
+
+            async def decode(index):
+                results[index] = await loop.run_in_executor(threads, algorithms[index].get_solution)
+
+            async def produce():
+                for index in range(len(algorithms)):
+                    await queues[0].put(index)
+                await queues[0].put(_DONE)
+
+            sink = asyncio.Queue()
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce())
+                group.create_task(self._stage(build, queues[0], queues[1], self.build_workers))
+                group.create_task(self._stage(transpile, queues[1], queues[2], self.transpile_workers))
+                group.create_task(self._stage(simulate, queues[2], queues[3], self.simulate_workers))
+                group.create_task(self._stage(decode, queues[3], sink, self.decode_workers))
+        return results
+
+    def run_sync(self, algorithms):
+        """Blocking wrapper around `run` for scripts and notebooks without a running loop."""
+        return asyncio.run(self.run(algorithms))
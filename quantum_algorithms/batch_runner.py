@@ -0,0 +1,100 @@
+"""
+Batched execution of many OneBQF / HHLAlgorithm instances (or bare circuits) on Aer.
+
+The simulator and preset pass manager are created once per runner, all circuits are
+transpiled together in parallel and submitted as a single multi-experiment job per
+distinct shot count, and each algorithm instance gets its own counts back.
+"""
+from collections import defaultdict
+from qiskit import QuantumCircuit
+from qiskit_aer import AerSimulator
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from toy_model import instrumentation
+
+
+class BatchRunner:
+    def __init__(self, optimization_level=3, max_parallel_experiments=0, max_parallel_threads=0,
+                 num_processes=None, seed_simulator=None, cache=None):
+        """
+        Args:
+            optimization_level (int): Preset pass manager optimization level
+            max_parallel_experiments (int): Experiments Aer runs concurrently (0 = use all cores)
+            max_parallel_threads (int): Total Aer threads (0 = use all cores)
+            num_processes (int): Transpiler worker processes (None = Qiskit default)
+            seed_simulator (int): Optional sampling seed shared by every job
+            cache (TranspileCache): Optional persistent cache consulted before transpiling
+        """
+        self.simulator = AerSimulator(max_parallel_experiments=max_parallel_experiments,
+                                      max_parallel_threads=max_parallel_threads)
+        self.pass_manager = generate_preset_pass_manager(optimization_level=optimization_level,
+                                                         backend=self.simulator)
+        self.optimization_level = optimization_level
+        self.num_processes = num_processes
+        self.seed_simulator = seed_simulator
+        self.cache = cache
+
+    @instrumentation.traced("batch.transpile")
+    def transpile(self, circuits):
+        """Transpiles all circuits together, taking cached ones from `cache` when it is set."""
+        circuits = list(circuits)
+        if self.cache is None:
+            return self.pass_manager.run(circuits, num_processes=self.num_processes)
+
+        keys = [self.cache.key(qc, self.simulator, self.optimization_level) for qc in circuits]
+        transpiled = [self.cache.get(key) for key in keys]
+        missing = [i for i, qc in enumerate(transpiled) if qc is None]
+        if missing:
+            compiled = self.pass_manager.run([circuits[i] for i in missing], num_processes=self.num_processes)
+            for i, qc in zip(missing, compiled):
+                self.cache.put(keys[i], qc)
+                transpiled[i] = qc
+        return transpiled
+
+    @instrumentation.traced("batch.run")
+    def run(self, items, shots=None):
+        """
+        Runs a batch of algorithm instances and/or circuits.
+
+        Args:
+            items (list): OneBQF / HHLAlgorithm instances or QuantumCircuit objects
+            shots (int): Overrides the per-instance shots; required for bare circuits
+
+        Returns:
+            list: One counts dictionary per item, in input order. Algorithm instances
+                  also have their `counts` attribute set.
+        """
+        items = list(items)
+        circuits, item_shots = [], []
+        for item in items:
+            if isinstance(item, QuantumCircuit):
+                if shots is None:
+                    raise ValueError("shots must be given when running bare circuits.")
+                circuits.append(item)
+            else:
+                if item.circuit is None: item.build_circuit()
+                circuits.append(item.circuit)
+            item_shots.append(shots if shots is not None else item.shots)
+
+        transpiled = self.transpile(circuits)
+
+        groups = defaultdict(list)
+        for index, n_shots in enumerate(item_shots):
+            groups[n_shots].append(index)
+
+        all_counts = [None] * len(items)
+        for n_shots, indices in groups.items():
+            job = self.simulator.run([transpiled[i] for i in indices], shots=n_shots,
+                                     seed_simulator=self.seed_simulator)
+            result = job.result()
+            for position, index in enumerate(indices):
+                all_counts[index] = result.get_counts(position)
+
+        for item, counts in zip(items, all_counts):
+            if not isinstance(item, QuantumCircuit):
+                item.counts = counts
+        return all_counts
+
+
+def run_batch(items, shots=None, **runner_options):
+    """Convenience wrapper running `items` on a one-off BatchRunner."""
+    return BatchRunner(**runner_options).run(items, shots=shots)
@@ -0,0 +1,166 @@
+"""
+Component-wise OneBQF execution on the independent sub-blocks of a segment Hamiltonian.
+
+Segments only interact with segments they share a hit with, so A is block-diagonal after
+a permutation, one block per connected component of its off-diagonal nonzeros. Every
+OneBQF step acts on the blocks independently: with the uniform input state, system index
+i of component c ends up with amplitude (f(A_c) 1)_i / sqrt(2^n), whatever else shares
+the register. Components are therefore packed into bins of at most 2^max_system_qubits
+indices, one small OneBQF circuit per bin, and the bins run as one batch.
+
+Reassembly: a bin of 2^n_b padded states gives each of its indices input weight 2^-n_b
+instead of the global 2^-N, so the post-selected frequency of index i in its bin is
+rescaled by 2^n_b / shots_b before the global solution is normalized. Shots are allocated
+proportionally to the number of indices in each bin, which is how a single global circuit
+would spread them.
+
+Usage:
+    solver = ComponentOneBQF(A, b, shots=100_000, max_system_qubits=6)
+    solver.run(seed=0)
+    solution, success = solver.get_solution()
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components as _graph_components
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.batch_runner import BatchRunner
+from quantum_algorithms.counts_decoding import decode_counts
+from toy_model import instrumentation
+
+# 64 indices per bin: with epsilon-sharp couplings most components hold one or two segments,
+# so a budget derived from the largest component would give one tiny circuit per component
+DEFAULT_MAX_SYSTEM_QUBITS = 6
+
+
+def connected_components(matrix_A):
+    """Index arrays of the connected components of A's off-diagonal nonzeros, largest first."""
+    A = sp.coo_matrix(matrix_A)
+    keep = (A.row != A.col) & (A.data != 0)
+    graph = sp.coo_matrix((np.ones(keep.sum()), (A.row[keep], A.col[keep])), shape=A.shape)
+    n_components, labels = _graph_components(graph, directed=False)
+    order = np.argsort(labels, kind="stable")
+    components = np.split(order, np.cumsum(np.bincount(labels, minlength=n_components))[:-1])
+    return sorted(components, key=len, reverse=True)
+
+
+def num_qubits_for(size):
+    """System qubits OneBQF needs for `size` indices (at least one)."""
+    return max(1, int(np.ceil(np.log2(size))))
+
+
+def pack_components(components, max_system_qubits=DEFAULT_MAX_SYSTEM_QUBITS):
+    """
+    First-fit decreasing packing of components into bins of at most 2^max_system_qubits
+    indices; None uses the register of the largest component. A component larger than the
+    budget gets a bin of its own.
+    """
+    components = sorted(components, key=len, reverse=True)
+    if not components: return []
+    if max_system_qubits is None: max_system_qubits = num_qubits_for(len(components[0]))
+    capacity = 2 ** max_system_qubits
+
+    bins, sizes = [], []
+    for component in components:
+        for index, size in enumerate(sizes):
+            if size + len(component) <= capacity:
+                bins[index].append(component)
+                sizes[index] += len(component)
+                break
+        else:
+            bins.append([component])
+            sizes.append(len(component))
+    return [np.concatenate(parts) for parts in bins]
+
+
+def allocate_shots(sizes, shots):
+    """Splits `shots` proportionally to `sizes` (largest remainders), giving every bin at least one shot."""
+    sizes = np.asarray(sizes, dtype=float)
+    exact = shots * sizes / sizes.sum()
+    allocated = np.floor(exact).astype(np.int64)
+    remainder = shots - allocated.sum()
+    if remainder > 0:
+        allocated[np.argsort(allocated - exact, kind="stable")[:remainder]] += 1
+    return np.maximum(allocated, 1)
+
+
+class ComponentOneBQF:
+    def __init__(self, matrix_A, vector_b, num_time_qubits=1, shots=1024, max_system_qubits=DEFAULT_MAX_SYSTEM_QUBITS,
+                 debug=False):
+        """
+        Args:
+            matrix_A: Segment Hamiltonian, dense or scipy.sparse, with a constant diagonal
+            vector_b: Right-hand side (OneBQF prepares the uniform state regardless)
+            num_time_qubits (int): Time-register width of every bin circuit
+            shots (int): Total shots, split over the bins proportionally to their size
+            max_system_qubits (int): Bin budget in system qubits, see `pack_components`
+        """
+        A = sp.csr_matrix(matrix_A)
+        vector_b = np.asarray(vector_b)
+        self.original_dim = A.shape[0]
+        self.shots = shots
+        self.debug = debug
+
+        self.components = connected_components(A)
+        self.blocks = pack_components(self.components, max_system_qubits)
+        self.block_shots = allocate_shots([len(block) for block in self.blocks], shots)
+        instrumentation.count("components", len(self.components))
+
+        diagonal_val = A.diagonal()[0]
+        self.solvers = []
+        for block, block_shots in zip(self.blocks, self.block_shots):
+            A_block = A[block][:, block].toarray()
+            b_block = vector_b[block]
+            if len(block) == 1:
+                # OneBQF needs at least one system qubit; pad like OneBQF pads itself
+                A_block = np.diag([A_block[0, 0], diagonal_val])
+                b_block = np.append(b_block, 1.0)
+            self.solvers.append(OneBQF(A_block, b_block, num_time_qubits=num_time_qubits,
+                                       shots=int(block_shots)))
+
+        self.num_system_qubits = max(solver.num_system_qubits for solver in self.solvers)
+        self.counts = None
+
+        if self.debug:
+            print(f"{len(self.components)} component(s), largest {len(self.components[0])}, "
+                  f"packed into {len(self.blocks)} bin(s) of up to {self.num_system_qubits} system qubits")
+
+    def build_circuit(self):
+        """Builds every bin circuit and returns them."""
+        return [solver.build_circuit() for solver in self.solvers]
+
+    @instrumentation.traced("components.run")
+    def run(self, runner=None, use_kernel=False, seed=None):
+        """
+        Runs all bins, with Aer through one BatchRunner (a default one unless `runner` is given)
+        or sampled from OneBQFKernel with use_kernel=True. Returns the counts per bin.
+        """
+        if use_kernel:
+            rng = np.random.default_rng(seed)
+            self.counts = [solver.run(use_kernel=True, seed=int(rng.integers(2 ** 32))) for solver in self.solvers]
+            return self.counts
+
+        for solver in self.solvers:
+            if solver.circuit is None: solver.build_circuit()
+        runner = runner or BatchRunner(seed_simulator=seed)
+        self.counts = runner.run(self.solvers)
+        return self.counts
+
+    @instrumentation.traced("components.decode")
+    def get_solution(self, counts=None):
+        """
+        Post-selected global solution, normalized over the original indices, and the total
+        success count. Each bin's frequencies are rescaled by its input weight, see the module docstring.
+        """
+        counts = self.counts if counts is None else counts
+        if counts is None: raise ValueError("No measurement results available. Run run() first.")
+
+        weights = np.zeros(self.original_dim)
+        total_success = 0
+        for solver, block, block_counts in zip(self.solvers, self.blocks, counts):
+            prob_dist, success = decode_counts(block_counts, solver.num_system_qubits)
+            total_success += success
+            weights[block] = prob_dist[:len(block)] * solver.system_dim / solver.shots
+
+        if total_success == 0: return np.zeros(self.original_dim), 0
+        solution = np.sqrt(weights / weights.sum())
+        return solution, total_success
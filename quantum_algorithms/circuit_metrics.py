@@ -0,0 +1,212 @@
+"""
+Depth and gate-count metrics for OneBQF circuits, as stored in data/circuit_depth.json.
+
+`analytic_metrics` works directly from the matrix, without building or transpiling a
+circuit. It walks the gate sequence of `OneBQF.build_circuit`, in which each interaction
+pair (i, j) costs 2 (h - 1) CX for the Hamming-distance ladder, X flips on the zero bits
+of the transformed index, and one RX gate with `num_system_qubits` controls. Each distinct
+gate is decomposed into the basis once and cached together with its wire-to-wire longest
+paths, so depths follow from a longest-path pass over the gate sequence.
+
+The numbers describe the unoptimized (optimization_level=0) decomposition: they match a
+level-0 transpile exactly and bound the optimized circuit from above. Routing onto a
+device is not modelled; `exact_metrics` transpiles for real and caches the result on disk.
+"""
+import os
+import json
+import hashlib
+from functools import lru_cache
+import numpy as np
+import scipy.sparse as sp
+import qiskit
+from qiskit import QuantumCircuit, transpile
+from qiskit.circuit.library import QFT, RXGate
+from quantum_algorithms.transpile_cache import circuit_fingerprint, describe_target
+
+DEFAULT_BASIS = ("u", "cx")
+DEFAULT_METRICS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "onebqf", "metrics")
+_UNREACHABLE = -2 ** 40
+
+
+def circuit_metrics(circuit):
+    """Depth and gate-count summary of a transpiled circuit, as stored in circuit_depth.json."""
+    gate_breakdown = {name: int(count) for name, count in circuit.count_ops().items()}
+    one_qubit = sum(1 for inst in circuit.data if inst.operation.num_qubits == 1 and inst.operation.name != "measure")
+    two_qubit = sum(1 for inst in circuit.data if inst.operation.num_qubits == 2)
+    return {
+        "depth": circuit.depth(),
+        "two_qubit_depth": circuit.depth(filter_function=lambda inst: inst.operation.num_qubits == 2),
+        "total_gates": int(sum(gate_breakdown.values())),
+        "num_qubits": circuit.num_qubits,
+        "single_qubit_gates": one_qubit,
+        "two_qubit_gates": two_qubit,
+        "gate_breakdown": gate_breakdown,
+    }
+
+
+def _wire_paths(circuit, weight):
+    """
+    paths[a, b]: longest weighted path from the input of wire a to the output of wire b,
+    counted like `QuantumCircuit.depth` (ops with weight 0 still synchronize their wires).
+    """
+    n = circuit.num_qubits
+    paths = np.full((n, n), _UNREACHABLE, dtype=np.int64)
+    for source in range(n):
+        level = np.full(n, _UNREACHABLE, dtype=np.int64)
+        level[source] = 0
+        for instruction in circuit.data:
+            qubits = [circuit.find_bit(q).index for q in instruction.qubits]
+            top = level[qubits].max()
+            if top > _UNREACHABLE: level[qubits] = top + weight(instruction)
+        paths[source] = level
+    return paths
+
+
+@lru_cache(maxsize=None)
+def _block_cost(name, num_qubits, basis_gates):
+    """Gate counts and wire-to-wire depths of one gate decomposed into `basis_gates`."""
+    if name == "measure":
+        return {"measure": 1}, 0, 0, np.ones((1, 1), dtype=np.int64), np.zeros((1, 1), dtype=np.int64)
+    qc = QuantumCircuit(num_qubits)
+    if name == "mcrx":
+        qc.append(RXGate(0.123).control(num_qubits - 1), range(num_qubits))
+    elif name == "qft":
+        qc.append(QFT(num_qubits, do_swaps=True).to_gate(), range(num_qubits))
+    elif name == "iqft":
+        qc.append(QFT(num_qubits, do_swaps=True).inverse().to_gate(), range(num_qubits))
+    elif name == "p":
+        qc.p(0.123, 0)
+    else:
+        getattr(qc, name)(*range(num_qubits))
+    decomposed = transpile(qc, basis_gates=list(basis_gates), optimization_level=0)
+    metrics = circuit_metrics(decomposed)
+    return (metrics["gate_breakdown"], metrics["single_qubit_gates"], metrics["two_qubit_gates"],
+            _wire_paths(decomposed, lambda inst: 1),
+            _wire_paths(decomposed, lambda inst: int(inst.operation.num_qubits == 2)))
+
+
+def interaction_pairs(matrix_A):
+    """
+    Padded system size and the upper-triangular off-diagonal nonzeros of A in row-major
+    order, i.e. `OneBQF.interaction_pairs` without densifying the matrix.
+    """
+    A = sp.coo_matrix(matrix_A)
+    num_system_qubits = int(np.ceil(np.log2(A.shape[0])))
+    keep = (A.col > A.row) & (A.data != 0)
+    rows, cols = A.row[keep], A.col[keep]
+    order = np.lexsort((cols, rows))
+    return num_system_qubits, rows[order].astype(np.int64), cols[order].astype(np.int64)
+
+
+def _gate_stream(num_system_qubits, num_time_qubits, rows, cols):
+    """Yields (gate, qubits) in the order `OneBQF.build_circuit` appends them."""
+    time = list(range(num_time_qubits))
+    b = list(range(num_time_qubits, num_time_qubits + num_system_qubits))
+    ancilla = num_time_qubits + num_system_qubits
+
+    pair_gates = []
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        differing = [k for k in range(num_system_qubits) if ((i ^ j) >> k) & 1]
+        pivot, rest = differing[0], differing[1:]
+        i_transformed = i
+        for k in rest:
+            if (i_transformed >> pivot) & 1: i_transformed ^= 1 << k
+        flips = [b[k] for k in range(num_system_qubits) if k != pivot and not (i_transformed >> k) & 1]
+        controls = [b[k] for k in range(num_system_qubits) if k != pivot]
+        pair_gates.append((pivot, rest, flips, controls))
+
+    def controlled_u(control):
+        for pivot, rest, flips, controls in pair_gates:
+            for k in rest: yield "cx", (b[pivot], b[k])
+            for q in flips: yield "x", (q,)
+            yield "mcrx", (control, *controls, b[pivot])
+            for q in flips: yield "x", (q,)
+            for k in reversed(rest): yield "cx", (b[pivot], b[k])
+        yield "p", (control,)
+
+    for q in b: yield "h", (q,)
+    for q in time: yield "h", (q,)
+    for i in range(num_time_qubits):
+        yield from controlled_u(time[num_time_qubits - 1 - i])
+    yield "iqft", tuple(time)
+    yield "x", (time[0],)
+    yield "cx", (time[0], ancilla)
+    yield "x", (time[0],)
+    yield "qft", tuple(time)
+    for i in reversed(range(num_time_qubits)):
+        yield from controlled_u(time[num_time_qubits - 1 - i])
+    for q in time: yield "h", (q,)
+    yield "measure", (ancilla,)
+    for q in b: yield "measure", (q,)
+
+
+def backend_basis_gates(backend):
+    """Gate names of a backend's target, without non-unitary instructions."""
+    return tuple(sorted(name for name in backend.target.operation_names
+                        if name not in ("measure", "reset", "delay", "if_else", "while_loop", "for_loop", "switch_case")))
+
+
+def analytic_metrics(matrix_A, num_time_qubits=1, basis_gates=DEFAULT_BASIS):
+    """
+    Circuit metrics of the OneBQF circuit for `matrix_A` (dense or scipy.sparse), without
+    building it. Uses the same layout as `circuit_metrics`, plus "method": "analytic".
+    """
+    num_system_qubits, rows, cols = interaction_pairs(matrix_A)
+    basis_gates = tuple(basis_gates)
+    num_qubits = num_time_qubits + num_system_qubits + 1
+    level = np.zeros(num_qubits, dtype=np.int64)
+    level_2q = np.zeros(num_qubits, dtype=np.int64)
+    gate_breakdown, one_qubit, two_qubit = {}, 0, 0
+
+    for name, qubits in _gate_stream(num_system_qubits, num_time_qubits, rows, cols):
+        breakdown, n1, n2, paths, paths_2q = _block_cost(name, len(qubits), basis_gates)
+        for gate, count in breakdown.items():
+            gate_breakdown[gate] = gate_breakdown.get(gate, 0) + count
+        one_qubit += n1
+        two_qubit += n2
+        qubits = list(qubits)
+        level[qubits] = (level[qubits, None] + paths).max(axis=0)
+        level_2q[qubits] = (level_2q[qubits, None] + paths_2q).max(axis=0)
+
+    return {
+        "depth": int(level.max()),
+        "two_qubit_depth": int(level_2q.max()),
+        "total_gates": int(sum(gate_breakdown.values())),
+        "num_qubits": num_qubits,
+        "single_qubit_gates": one_qubit,
+        "two_qubit_gates": two_qubit,
+        "gate_breakdown": gate_breakdown,
+        "method": "analytic",
+    }
+
+
+def exact_metrics(circuit, backend=None, basis_gates=DEFAULT_BASIS, optimization_level=3, cache_dir=None):
+    """
+    Metrics of `circuit` transpiled for `backend` (or to `basis_gates` when no backend is
+    given). Results are cached as JSON under $ONEBQF_METRICS_DIR or ~/.cache/onebqf/metrics,
+    keyed by the circuit contents, the target, the optimization level and the Qiskit version;
+    pass cache_dir=False to disable the cache.
+    """
+    target = describe_target(backend) if backend is not None else f"basis|{sorted(basis_gates)}"
+    description = "|".join([circuit_fingerprint(circuit), target, str(optimization_level), qiskit.__version__])
+    path = None
+    if cache_dir is not False:
+        cache_dir = cache_dir or os.environ.get("ONEBQF_METRICS_DIR", DEFAULT_METRICS_DIR)
+        path = os.path.join(cache_dir, f"{hashlib.sha256(description.encode()).hexdigest()}.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+
+    if backend is not None:
+        transpiled = transpile(circuit, backend, optimization_level=optimization_level)
+    else:
+        transpiled = transpile(circuit, basis_gates=list(basis_gates), optimization_level=optimization_level)
+    metrics = circuit_metrics(transpiled)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(metrics, f)
+        os.replace(tmp_path, path)
+    return metrics
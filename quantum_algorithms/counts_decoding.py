@@ -0,0 +1,76 @@
+"""
+Vectorized decoding of measurement results into NumPy arrays.
+
+Both OneBQF and HHLAlgorithm measure the ancilla into c[0] and the system register
+into c[1:], so for a classical register value v the ancilla bit is v & 1 and the
+system index is v >> 1. Bitstring keys are parsed in a single pass over a byte
+buffer instead of calling int(..., 2) per outcome.
+"""
+import numpy as np
+
+MAX_INT64_WIDTH = 62
+
+
+def keys_to_values(keys):
+    """Converts bitstring, hex ('0x..') or integer outcome keys to an array of register values."""
+    keys = list(keys)
+    if not keys: return np.zeros(0, dtype=np.int64)
+    first = keys[0]
+    if isinstance(first, (int, np.integer)):
+        return np.array(keys)
+    if first.startswith('0x'):
+        return np.array([int(key, 16) for key in keys])
+    if ' ' in first:
+        keys = [key.replace(' ', '') for key in keys]
+
+    width = len(keys[0])
+    if width > MAX_INT64_WIDTH:
+        return np.array([int(key, 2) for key in keys], dtype=object)
+    bits = np.frombuffer(''.join(keys).encode('ascii'), dtype=np.uint8).reshape(len(keys), width) - ord('0')
+    place_values = np.left_shift(1, np.arange(width - 1, -1, -1, dtype=np.int64))
+    return bits.astype(np.int64) @ place_values
+
+
+def counts_to_arrays(counts):
+    """Returns (register_values, frequencies) arrays for a counts dictionary."""
+    values = keys_to_values(counts.keys())
+    frequencies = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    return values, frequencies
+
+
+def memory_to_arrays(memory):
+    """Returns (register_values, frequencies) arrays for per-shot memory from `result.get_memory()`."""
+    outcomes, frequencies = np.unique(np.asarray(memory), return_counts=True)
+    return keys_to_values(outcomes.tolist()), frequencies.astype(np.int64)
+
+
+def postselect(values, frequencies):
+    """Keeps the outcomes with the ancilla measured as |1> and returns (system_indices, frequencies)."""
+    mask = (values & 1) == 1
+    return values[mask] >> 1, frequencies[mask]
+
+
+def decode_counts(counts, num_system_qubits, sparse=False, memory=False):
+    """
+    Post-selects the ancilla and accumulates the system outcomes.
+
+    Args:
+        counts: Counts dictionary (bitstring, hex or integer keys) or, with memory=True, per-shot memory
+        num_system_qubits (int): Width of the system register
+        sparse (bool): If True, return only the observed system indices instead of a dense 2^n array
+        memory (bool): If True, `counts` is a list of per-shot bitstrings
+
+    Returns:
+        (prob_dist, total_success) for the dense form, where prob_dist holds raw counts per system index,
+        or (system_indices, frequencies, total_success) sorted by index for the sparse form.
+    """
+    values, frequencies = memory_to_arrays(counts) if memory else counts_to_arrays(counts)
+    system, frequencies = postselect(values, frequencies)
+    total_success = int(np.sum(frequencies))
+
+    if sparse:
+        order = np.argsort(system, kind='stable')
+        return system[order], frequencies[order], total_success
+
+    prob_dist = np.bincount(system.astype(np.int64), weights=frequencies, minlength=2 ** num_system_qubits)
+    return prob_dist, total_success
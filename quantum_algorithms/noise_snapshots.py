@@ -0,0 +1,222 @@
+"""
+Offline backend snapshots, cached noise models and active-qubit compaction for noisy runs.
+
+Backends are resolved in order from an in-process cache, a local snapshot directory
+(configuration/properties JSON in the same layout as the bundled fake backends), the
+IBM Quantum service (when network access is allowed; the result is snapshotted), and
+finally, offline only, the bundled `qiskit_ibm_runtime.fake_provider` backends. A failed
+fetch raises instead of silently substituting another device's noise. Noise models built
+from a backend are cached in memory and pickled next to the snapshot. Both caches are keyed
+by name, snapshot directory and source (snapshot or bundled fake), and a fake-derived model
+is never returned to a call that allows network access.
+"""
+import os
+import json
+import pickle
+import datetime
+import qiskit_ibm_runtime.fake_provider as fake_provider
+from qiskit import QuantumCircuit, QuantumRegister
+from qiskit_aer.noise import NoiseModel, QuantumError, ReadoutError
+from qiskit_ibm_runtime import QiskitRuntimeService
+from qiskit_ibm_runtime.fake_provider.fake_backend import FakeBackendV2
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "onebqf", "backends")
+
+_BACKEND_CACHE = {}
+_NOISE_MODEL_CACHE = {}
+_NOISE_ERRORS_CACHE = {}
+
+
+def _snapshot_dir(snapshot_dir=None):
+    return snapshot_dir or os.environ.get("ONEBQF_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, complex):
+        return [value.real, value.imag]
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, default=_json_default)
+    os.replace(tmp_path, path)
+
+
+def save_snapshot(backend, snapshot_dir=None, backend_name=None):
+    """Writes the backend configuration and properties to `conf_<name>.json` / `props_<name>.json`."""
+    snapshot_dir = _snapshot_dir(snapshot_dir)
+    backend_name = backend_name or backend.name
+    os.makedirs(snapshot_dir, exist_ok=True)
+    _write_json(os.path.join(snapshot_dir, f"conf_{backend_name}.json"), backend.configuration().to_dict())
+    _write_json(os.path.join(snapshot_dir, f"props_{backend_name}.json"), backend.properties().to_dict())
+    return snapshot_dir
+
+
+def load_snapshot(backend_name, snapshot_dir=None):
+    """Returns a fake backend built from a local snapshot, or None if no snapshot exists."""
+    snapshot_dir = _snapshot_dir(snapshot_dir)
+    conf_filename, props_filename = f"conf_{backend_name}.json", f"props_{backend_name}.json"
+    if not all(os.path.exists(os.path.join(snapshot_dir, name)) for name in (conf_filename, props_filename)):
+        return None
+    snapshot_class = type(f"Snapshot_{backend_name}", (FakeBackendV2,), {
+        "dirname": snapshot_dir,
+        "conf_filename": conf_filename,
+        "props_filename": props_filename,
+        "backend_name": backend_name,
+    })
+    return snapshot_class()
+
+
+def bundled_fake_backend(backend_name):
+    """Returns the bundled fake backend for e.g. 'ibm_torino' (FakeTorino), or None."""
+    class_name = "Fake" + backend_name.split("_")[-1].capitalize()
+    backend_class = getattr(fake_provider, class_name, None)
+    return backend_class() if backend_class is not None else None
+
+
+def _backend_source(backend_name, snapshot_dir, allow_network):
+    """
+    "snapshot" if a snapshot exists or will be fetched (allow_network), "fake" for the bundled
+    fallback. Cached backends and noise models are keyed by it, so a fake never answers a call
+    that may use the network.
+    """
+    props_path = os.path.join(snapshot_dir, f"props_{backend_name}.json")
+    return "snapshot" if allow_network or os.path.exists(props_path) else "fake"
+
+
+def load_backend(backend_name, snapshot_dir=None, allow_network=True):
+    """
+    Resolves a backend without contacting IBM Quantum whenever a local copy exists.
+
+    Args:
+        backend_name (str): IBM backend name, e.g. 'ibm_torino'
+        snapshot_dir (str): Snapshot directory, defaults to $ONEBQF_SNAPSHOT_DIR or ~/.cache/onebqf/backends
+        allow_network (bool): If True, fetch and snapshot the live backend when no snapshot exists;
+            if False, fall back to the bundled fake backend
+
+    Raises:
+        RuntimeError: If the live backend is needed but cannot be fetched
+    """
+    snapshot_dir = _snapshot_dir(snapshot_dir)
+    key = (backend_name, snapshot_dir, _backend_source(backend_name, snapshot_dir, allow_network))
+    if key in _BACKEND_CACHE:
+        return _BACKEND_CACHE[key]
+
+    backend = load_snapshot(backend_name, snapshot_dir)
+    if backend is None and allow_network:
+        try:
+            live_backend = QiskitRuntimeService().backend(backend_name)
+        except Exception as error:
+            raise RuntimeError(f"Could not fetch {backend_name} from IBM Quantum and no snapshot exists; "
+                               f"use allow_network=False (offline=True) for the bundled fake backend.") from error
+        save_snapshot(live_backend, snapshot_dir, backend_name)
+        backend = load_snapshot(backend_name, snapshot_dir)
+    if backend is None:
+        backend = bundled_fake_backend(backend_name)
+    if backend is None:
+        raise ValueError(f"No snapshot or bundled fake backend available for '{backend_name}'.")
+
+    _BACKEND_CACHE[key] = backend
+    return backend
+
+
+def load_noise_model(backend_name, snapshot_dir=None, allow_network=True):
+    """
+    Returns `NoiseModel.from_backend` for the resolved backend, cached in memory and pickled
+    as noise_<name>_<source>.pkl. A pickle is reused only for the same source and, for
+    snapshots, only if it is newer than the snapshot's properties.
+    """
+    snapshot_dir = _snapshot_dir(snapshot_dir)
+    source = _backend_source(backend_name, snapshot_dir, allow_network)
+    key = (backend_name, snapshot_dir, source)
+    if key in _NOISE_MODEL_CACHE:
+        return _NOISE_MODEL_CACHE[key]
+
+    pickle_path = os.path.join(snapshot_dir, f"noise_{backend_name}_{source}.pkl")
+    props_path = os.path.join(snapshot_dir, f"props_{backend_name}.json")
+    if source == "snapshot" and not os.path.exists(props_path):
+        load_backend(backend_name, snapshot_dir, allow_network)  # fetches the snapshot first
+    props_mtime = os.path.getmtime(props_path) if source == "snapshot" else 0
+
+    noise_model = None
+    if os.path.exists(pickle_path) and os.path.getmtime(pickle_path) >= props_mtime:
+        with open(pickle_path, "rb") as f:
+            pickled = pickle.load(f)
+        if isinstance(pickled, dict) and pickled.get("source") == source:
+            noise_model = pickled["noise_model"]
+    if noise_model is None:
+        noise_model = NoiseModel.from_backend(load_backend(backend_name, snapshot_dir, allow_network))
+        os.makedirs(snapshot_dir, exist_ok=True)
+        tmp_path = f"{pickle_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"source": source, "noise_model": noise_model}, f)
+        os.replace(tmp_path, pickle_path)
+
+    _NOISE_MODEL_CACHE[key] = noise_model
+    return noise_model
+
+
+def active_qubits(circuit):
+    """Sorted indices of the qubits acted on by anything other than barriers and delays."""
+    used = set()
+    for instruction in circuit.data:
+        if instruction.operation.name in ("barrier", "delay"): continue
+        used.update(circuit.find_bit(qubit).index for qubit in instruction.qubits)
+    return sorted(used)
+
+
+def compact_circuit(circuit, qubits):
+    """Copies `circuit` onto len(qubits) qubits, keeping its classical registers."""
+    register = QuantumRegister(len(qubits), "q")
+    mapping = {circuit.qubits[q]: register[i] for i, q in enumerate(qubits)}
+    compact = QuantumCircuit(register, *circuit.cregs)
+    for instruction in circuit.data:
+        if any(qubit not in mapping for qubit in instruction.qubits): continue
+        compact.append(instruction.operation, [mapping[q] for q in instruction.qubits], instruction.clbits)
+    return compact
+
+
+def _noise_errors(noise_model):
+    """`noise_model.to_dict()["errors"]`, kept for models from `load_noise_model` since serializing takes ~1 s."""
+    if not any(model is noise_model for model in _NOISE_MODEL_CACHE.values()):
+        return noise_model.to_dict()["errors"]
+    if id(noise_model) not in _NOISE_ERRORS_CACHE:
+        _NOISE_ERRORS_CACHE[id(noise_model)] = noise_model.to_dict()["errors"]
+    return _NOISE_ERRORS_CACHE[id(noise_model)]
+
+
+def remap_noise_model(noise_model, qubits):
+    """
+    Restricts a noise model to `qubits`, relabelled 0..len(qubits)-1. The errors are read
+    from `NoiseModel.to_dict` and added back with the public add_* methods. Custom noise
+    passes (delay relaxation) are dropped; transpiled OneBQF circuits carry no delays.
+    """
+    mapping = {q: i for i, q in enumerate(qubits)}
+    compact = NoiseModel(basis_gates=noise_model.basis_gates)
+    for entry in _noise_errors(noise_model):
+        local = "gate_qubits" in entry
+        gate_qubits = [[mapping[q] for q in qs] for qs in entry.get("gate_qubits", []) if all(q in mapping for q in qs)]
+        if local and not gate_qubits: continue
+        if entry["type"] == "roerror":
+            error = ReadoutError(entry["probabilities"])
+            if not local:
+                compact.add_all_qubit_readout_error(error, warnings=False)
+            for remapped in gate_qubits:
+                compact.add_readout_error(error, remapped, warnings=False)
+        else:
+            error = QuantumError.from_dict(entry)
+            if not local:
+                compact.add_all_qubit_quantum_error(error, entry["operations"], warnings=False)
+            for remapped in gate_qubits:
+                compact.add_quantum_error(error, entry["operations"], remapped, warnings=False)
+    return compact
+
+
+def compact_noisy_problem(transpiled_circuit, noise_model):
+    """Returns the transpiled circuit and noise model restricted to the physical qubits in use."""
+    qubits = active_qubits(transpiled_circuit)
+    return compact_circuit(transpiled_circuit, qubits), remap_noise_model(noise_model, qubits)
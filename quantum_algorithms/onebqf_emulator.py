@@ -0,0 +1,117 @@
+"""
+Classical emulation of the 1-Bit Quantum Filter with exact evolution, for large sparse Hamiltonians.
+
+With exact evolution U = exp(-i t (2c I - A)), every time-register amplitude of the
+post-selected branch is a trigonometric polynomial in U applied to the uniform state.
+Those powers of U are evaluated with `scipy.sparse.linalg.expm_multiply`, so memory
+stays O(nnz + 2^num_time_qubits * N) and no 2^n statevector is formed.
+
+The circuit does not apply exp(-i t (2c I - A)): it applies one Givens rotation of the same
+angle per interaction pair, in order. Both agree only when the pairs are disjoint and every
+coupling c - A_ij equals 1 (`exact`); otherwise the rotations do not commute, the output
+differs from the circuit's and a RuntimeWarning is raised. `OneBQFKernel` reproduces the
+circuit in all cases.
+"""
+import math
+import warnings
+import numpy as np
+import scipy as sci
+from scipy.sparse.linalg import expm_multiply
+from toy_model import instrumentation
+
+
+class OneBQFEmulator:
+    def __init__(self, matrix_A, num_time_qubits=1):
+        A = sci.sparse.csc_matrix(matrix_A)
+        self.original_dim = A.shape[0]
+
+        diagonal = A.diagonal()
+        if not np.all(diagonal == diagonal[0]):
+            raise ValueError("Matrix A must have a constant diagonal for this scheme.")
+        self.diagonal_val = diagonal[0]
+        self.exact = self.matches_circuit(A, self.diagonal_val)
+        if not self.exact:
+            warnings.warn("Interaction pairs overlap or have couplings other than 1, so the exact evolution differs "
+                          "from the OneBQF circuit; use OneBQFKernel for the circuit output.", RuntimeWarning,
+                          stacklevel=2)
+
+        d = self.original_dim
+        padded_dim = 2 ** math.ceil(np.log2(d))
+        if padded_dim != d:
+            padding = sci.sparse.identity(padded_dim - d, format='csc') * self.diagonal_val
+            A = sci.sparse.block_diag((A, padding), format='csc')
+
+        self.A = A
+        self.num_time_qubits = num_time_qubits
+        self.system_dim = A.shape[0]
+        self.t = np.pi / self.diagonal_val
+        self.amplitudes = None
+
+    @staticmethod
+    def matches_circuit(A, diagonal_val):
+        """True when the circuit's ordered Givens rotations equal exp(-i t (2c I - A)) for A."""
+        couplings = sci.sparse.triu(diagonal_val * sci.sparse.identity(A.shape[0]) - A, k=1).tocoo()
+        couplings.eliminate_zeros()
+        indices = np.concatenate([couplings.row, couplings.col])
+        return bool(np.all(couplings.data == 1) and len(np.unique(indices)) == len(indices))
+
+    def filter_coefficients(self):
+        """
+        Coefficients of the post-selected time-register amplitudes as polynomials in
+        z = exp(-i t (2c - lambda)). Returns an array of shape (2^n_t, 2^(n_t+1) - 1)
+        whose column m holds the coefficient of z^(m - 2^n_t + 1).
+        """
+        n = self.num_time_qubits
+        dim = 2 ** n
+        k = np.arange(dim)
+        powers = np.array([int(format(i, f"0{n}b")[::-1], 2) for i in k])
+
+        qft = np.exp(2j * np.pi * np.outer(k, k) / dim) / np.sqrt(dim)
+        flip = np.diag((k & 1 == 0).astype(float))
+        hadamard = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+        walsh = np.ones((1, 1))
+        for _ in range(n):
+            walsh = np.kron(walsh, hadamard)
+
+        forward = np.zeros((dim, dim), dtype=complex)
+        forward[k, powers] = 1 / np.sqrt(dim)
+        forward = qft @ flip @ qft.conj().T @ forward
+
+        coefficients = np.zeros((dim, 2 * dim - 1), dtype=complex)
+        for row in range(dim):
+            shift = dim - 1 - powers[row]
+            coefficients[row, shift:shift + dim] = forward[row]
+        return walsh @ coefficients
+
+    @instrumentation.traced("emulator.simulate")
+    def simulate(self):
+        """Amplitudes of the ancilla=|1> branch with shape (2^n_t, system_dim)."""
+        dim = 2 ** self.num_time_qubits
+        psi = np.ones(self.system_dim, dtype=complex) / np.sqrt(self.system_dim)
+
+        # exp(i m t A) psi for m = 0 .. dim-1, with the e^{-2imct} phase of z^m restored.
+        m = np.arange(dim)
+        positive = expm_multiply(1j * self.t * self.A, psi, start=0, stop=dim - 1, num=dim, endpoint=True)
+        positive *= np.exp(-2j * m * self.diagonal_val * self.t)[:, None]
+        # A and psi are real, so negative powers are complex conjugates of the positive ones.
+        powers = np.concatenate([positive[:0:-1].conj(), positive])
+
+        self.amplitudes = self.filter_coefficients() @ powers
+        return self.amplitudes
+
+    def probabilities(self):
+        """Joint probability of ancilla=|1> and each system basis state."""
+        if self.amplitudes is None: self.simulate()
+        return np.sum(np.abs(self.amplitudes) ** 2, axis=0)
+
+    def success_probability(self):
+        return float(np.sum(self.probabilities()))
+
+    def get_solution(self):
+        """Returns the normalized post-selected solution and the success probability."""
+        prob_dist = self.probabilities()
+        success_probability = float(np.sum(prob_dist))
+        if success_probability == 0: return np.zeros(self.original_dim), 0.0
+        solution_padded = np.sqrt(prob_dist / success_probability)
+        solution_padded /= np.linalg.norm(solution_padded)
+        return solution_padded[:self.original_dim], success_probability
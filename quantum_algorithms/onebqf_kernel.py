@@ -0,0 +1,161 @@
+"""
+Structure-aware statevector simulation of OneBQF circuits.
+
+Instead of simulating the decomposed multi-controlled gates, every two-level
+(Givens) rotation of `OneBQF._apply_direct_controlled_u` is applied directly to
+the pair of amplitudes it couples, controlled on the time register.
+"""
+import math
+import types
+import numpy as np
+import scipy.sparse as sp
+from toy_model import instrumentation
+
+
+class OneBQFKernel:
+    def __init__(self, onebqf):
+        self.num_time_qubits = onebqf.num_time_qubits
+        self.num_system_qubits = onebqf.num_system_qubits
+        self.original_dim = onebqf.original_dim
+        self.t = onebqf.t
+        self.diagonal_val = onebqf.diagonal_val
+        self.layers = self._schedule_layers(onebqf.interaction_pairs)
+        self.state = None
+
+    @classmethod
+    def from_matrix(cls, matrix_A, num_time_qubits=1):
+        """
+        Kernel of `OneBQF(matrix_A, b, num_time_qubits)` built from a (sparse) symmetric A
+        without densifying it; the interaction pairs keep OneBQF's row-major order.
+        """
+        A = sp.csr_matrix(matrix_A)
+        diagonal = A.diagonal()
+        if not np.all(diagonal == diagonal[0]):
+            raise ValueError("Matrix A must have a constant diagonal for this scheme.")
+        couplings = sp.triu(diagonal[0] * sp.identity(A.shape[0], format="csr") - A, k=1, format="csr")
+        couplings.eliminate_zeros()
+        couplings.sort_indices()
+        couplings = couplings.tocoo()
+        return cls(types.SimpleNamespace(
+            num_time_qubits=num_time_qubits,
+            num_system_qubits=math.ceil(np.log2(A.shape[0])),
+            original_dim=A.shape[0],
+            t=np.pi / diagonal[0],
+            diagonal_val=diagonal[0],
+            interaction_pairs=zip(couplings.row, couplings.col),
+        ))
+
+    @staticmethod
+    def _schedule_layers(interaction_pairs):
+        """
+        Groups the interaction pairs into layers of disjoint pairs. A pair is placed
+        after every earlier pair it shares an index with, so overlapping (non-commuting)
+        rotations keep the order in which the circuit applies them.
+        """
+        depth, layers = {}, []
+        for i, j in interaction_pairs:
+            i, j = int(i), int(j)
+            if i == j: continue
+            level = max(depth.get(i, -1), depth.get(j, -1)) + 1
+            depth[i] = depth[j] = level
+            if level == len(layers):
+                layers.append(([], []))
+            layers[level][0].append(i)
+            layers[level][1].append(j)
+        return [(np.array(rows), np.array(cols)) for rows, cols in layers]
+
+    def _apply_controlled_u(self, state, control, power, inverse=False):
+        """Mirrors `OneBQF._apply_direct_controlled_u` on a (time, ancilla, system) state."""
+        evolution_time = self.t * power
+        theta = 2 * evolution_time
+        if inverse:
+            theta = -theta
+        cos, isin = np.cos(theta / 2), -1j * np.sin(theta / 2)
+
+        controlled = (np.arange(2 ** self.num_time_qubits) >> control) & 1 == 1
+        sub = state[controlled]
+        for rows, cols in self.layers:
+            amp_i, amp_j = sub[..., rows], sub[..., cols]
+            sub[..., rows] = cos * amp_i + isin * amp_j
+            sub[..., cols] = isin * amp_i + cos * amp_j
+
+        phase = -self.diagonal_val * evolution_time
+        if inverse: phase = -phase
+        sub *= np.exp(1j * phase)
+        state[controlled] = sub
+
+    def _qft_matrix(self, inverse=False):
+        dim = 2 ** self.num_time_qubits
+        sign = -1 if inverse else 1
+        k = np.arange(dim)
+        return np.exp(sign * 2j * np.pi * np.outer(k, k) / dim) / np.sqrt(dim)
+
+    def _hadamard_matrix(self):
+        hadamard = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+        walsh = np.ones((1, 1))
+        for _ in range(self.num_time_qubits):
+            walsh = np.kron(walsh, hadamard)
+        return walsh
+
+    @instrumentation.traced("kernel.simulate")
+    def simulate(self):
+        """Evolves the ideal OneBQF state and stores it with shape (time, ancilla, system)."""
+        n_time, n_sys = 2 ** self.num_time_qubits, 2 ** self.num_system_qubits
+        state = np.zeros((n_time, 2, n_sys), dtype=complex)
+        state[:, 0, :] = 1 / np.sqrt(n_time * n_sys)
+
+        for i in range(self.num_time_qubits):
+            self._apply_controlled_u(state, self.num_time_qubits - 1 - i, 2 ** i)
+        state = np.einsum('kt,tas->kas', self._qft_matrix(inverse=True), state)
+
+        flip = np.arange(n_time) & 1 == 0
+        state[flip] = state[flip][:, ::-1, :]
+
+        state = np.einsum('kt,tas->kas', self._qft_matrix(), state)
+        for i in reversed(range(self.num_time_qubits)):
+            self._apply_controlled_u(state, self.num_time_qubits - 1 - i, 2 ** i, inverse=True)
+        state = np.einsum('kt,tas->kas', self._hadamard_matrix(), state)
+
+        self.state = state
+        return state
+
+    def statevector(self):
+        """Returns the final state as a flat array in Qiskit's little-endian ordering."""
+        if self.state is None: self.simulate()
+        return self.state.transpose(1, 2, 0).reshape(-1)
+
+    def probabilities(self):
+        """Returns the measured distribution with shape (ancilla, system)."""
+        if self.state is None: self.simulate()
+        return np.sum(np.abs(self.state) ** 2, axis=0)
+
+    def success_probability(self):
+        return float(np.sum(self.probabilities()[1]))
+
+    def sample_counts(self, shots, seed=None):
+        """Samples a counts dictionary in the same format as `AerSimulator` results."""
+        return sample_counts(self.probabilities(), self.num_system_qubits, shots, seed)
+
+    def get_solution(self):
+        """Returns the ideal post-selected solution and the success probability."""
+        prob_dist = self.probabilities()[1]
+        success_probability = float(np.sum(prob_dist))
+        if success_probability == 0: return np.zeros(self.original_dim), 0.0
+        solution_padded = np.sqrt(prob_dist / success_probability)
+        solution_padded /= np.linalg.norm(solution_padded)
+        return solution_padded[:self.original_dim], success_probability
+
+
+def sample_counts(probabilities, num_system_qubits, shots, seed=None):
+    """
+    Counts dictionary in `AerSimulator` format sampled from `OneBQFKernel.probabilities()`
+    (shape (ancilla, system)), for sampling without the kernel itself, e.g. in workers.
+    """
+    probs = np.asarray(probabilities).ravel()
+    samples = np.random.default_rng(seed).multinomial(shots, probs / np.sum(probs))
+    n_sys = 2 ** num_system_qubits
+    counts = {}
+    for flat_index in np.flatnonzero(samples):
+        ancilla, system = divmod(int(flat_index), n_sys)
+        counts[format(system, f"0{num_system_qubits}b") + str(ancilla)] = int(samples[flat_index])
+    return counts
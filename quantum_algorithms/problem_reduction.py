@@ -0,0 +1,129 @@
+"""
+Problem reduction and minimal padding before the OneBQF encoding.
+
+OneBQF prepares the uniform state, so the output at index i is (f(A) 1)_i up to the
+input weight, and two exact shortcuts apply:
+
+  * Decoupled indices (rows of A that only hold the diagonal) are eigenvectors with
+    eigenvalue c, so their post-selected probability per unit input weight is a
+    constant of (c, num_time_qubits), computed once from the 1x1 problem.
+  * Connected components with identical submatrices (in index order) produce identical
+    outputs, so one representative per class is encoded and its output copied.
+
+The reduced matrix is the block-diagonal of the representatives, padded only to the
+next power of two of its own size. `index_map` scatters the reduced output back to the
+full segment list: entry i is the reduced index of segment i, or -1 for a decoupled one.
+
+Usage:
+    reduction = ReducedProblem(A, b, num_time_qubits=1)
+    onebqf = reduction.make_onebqf(shots=100_000)
+    onebqf.build_circuit(); onebqf.run()
+    solution, success_probability = reduction.solution_from_counts(onebqf.counts)
+"""
+import math
+import numpy as np
+import scipy.sparse as sp
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.onebqf_emulator import OneBQFEmulator
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+from quantum_algorithms.block_decomposition import connected_components
+from quantum_algorithms.counts_decoding import decode_counts
+from toy_model import instrumentation
+
+
+def isolated_response(diagonal_val, num_time_qubits=1):
+    """Post-selected probability per unit input weight of a decoupled index."""
+    return OneBQFEmulator(np.array([[diagonal_val]]), num_time_qubits).success_probability()
+
+
+def _component_key(A, component):
+    block = A[component][:, component].tocsr()
+    block.sort_indices()
+    return len(component), block.indptr.tobytes(), block.indices.tobytes(), block.data.tobytes()
+
+
+class ReducedProblem:
+    @instrumentation.traced("reduction.init")
+    def __init__(self, matrix_A, vector_b=None, num_time_qubits=1, merge_equivalent=True):
+        """
+        Args:
+            matrix_A: Segment Hamiltonian, dense or scipy.sparse, with a constant diagonal
+            vector_b: Right-hand side, restricted to the representatives (ones by default)
+            num_time_qubits (int): Time-register width the reduced problem will be run with
+            merge_equivalent (bool): Encode one representative per class of identical components
+        """
+        A = sp.csr_matrix(matrix_A)
+        diagonal = A.diagonal()
+        if not np.all(diagonal == diagonal[0]):
+            raise ValueError("Matrix A must have a constant diagonal for this scheme.")
+        self.diagonal_val = diagonal[0]
+        self.original_dim = A.shape[0]
+        self.num_time_qubits = num_time_qubits
+        vector_b = np.ones(self.original_dim) if vector_b is None else np.asarray(vector_b)
+
+        self.index_map = np.full(self.original_dim, -1, dtype=np.int64)
+        representatives, classes, offset = [], {}, 0
+        for component in connected_components(A):
+            if len(component) == 1: continue
+            key = _component_key(A, component) if merge_equivalent else len(representatives)
+            if key not in classes:
+                classes[key] = offset
+                representatives.append(component)
+                offset += len(component)
+            self.index_map[component] = classes[key] + np.arange(len(component))
+
+        self.representatives = representatives
+        self.reduced_dim = offset
+        self.num_decoupled = int(np.sum(self.index_map < 0))
+        if representatives:
+            order = np.concatenate(representatives)
+            self.A = A[order][:, order]
+            self.b = vector_b[order]
+        else:
+            self.A = sp.csr_matrix((0, 0))
+            self.b = np.zeros(0)
+        self.num_system_qubits = max(1, math.ceil(np.log2(self.reduced_dim))) if self.reduced_dim else 0
+        self.padded_dim = 2 ** self.num_system_qubits if self.reduced_dim else 0
+        self.decoupled_response = isolated_response(self.diagonal_val, num_time_qubits)
+        instrumentation.count("reduction_removed", self.original_dim - self.reduced_dim)
+
+    def make_onebqf(self, **kwargs):
+        """OneBQF instance for the reduced problem; kwargs are passed to OneBQF."""
+        if self.reduced_dim == 0:
+            raise ValueError("Every index is decoupled; the solution is known without a circuit.")
+        kwargs.setdefault("num_time_qubits", self.num_time_qubits)
+        if kwargs["num_time_qubits"] != self.num_time_qubits:
+            raise ValueError("num_time_qubits must match the one the reduction was built for.")
+        return OneBQF(self.A.toarray(), self.b, **kwargs)
+
+    def expand(self, reduced_probabilities):
+        """
+        Per-unit-weight response of every original index, from the joint probabilities of
+        ancilla=|1> and each reduced system index (at least `reduced_dim` entries).
+        """
+        response = np.full(self.original_dim, self.decoupled_response)
+        coupled = self.index_map >= 0
+        if np.any(coupled):
+            response[coupled] = np.asarray(reduced_probabilities)[self.index_map[coupled]] * self.padded_dim
+        return response
+
+    def solution_from_probabilities(self, reduced_probabilities=None):
+        """
+        Normalized post-selected solution over the original indices and the success probability
+        of the unreduced problem (padded to 2^ceil(log2 N) like OneBQF). Without probabilities
+        the reduced problem's circuit is simulated with OneBQFKernel.
+        """
+        if reduced_probabilities is None:
+            reduced_probabilities = (OneBQFKernel.from_matrix(self.A, self.num_time_qubits).probabilities()[1]
+                                     if self.reduced_dim else np.zeros(0))
+        response = self.expand(reduced_probabilities)
+        original_padded = 2 ** math.ceil(np.log2(self.original_dim))
+        success_probability = (response.sum() + (original_padded - self.original_dim) * self.decoupled_response) \
+            / original_padded
+        if response.sum() == 0: return np.zeros(self.original_dim), 0.0
+        return np.sqrt(response / response.sum()), float(success_probability)
+
+    def solution_from_counts(self, counts):
+        """`solution_from_probabilities` with probabilities estimated from the reduced problem's counts."""
+        prob_dist, _ = decode_counts(counts, self.num_system_qubits)
+        return self.solution_from_probabilities(prob_dist / sum(counts.values()))
@@ -0,0 +1,179 @@
+"""
+Geometric sector decomposition of large events with overlap stitching.
+
+Hits are binned by azimuth phi = atan2(y, x) and radial slope r / z, which a straight
+track from the beam line keeps constant from layer to layer. Every sector is widened
+by `overlap` (a fraction of its width) on each side, a SimpleHamiltonian is built and
+solved on the hits inside it, and the per-sector solutions are stitched back onto the
+segments of the full event. A segment between hits that share no sector is never
+built and stays inactive, so the overlap sets the accuracy/throughput trade-off.
+
+Each sector solution is turned into activations in [0, 1] (solution / max) and an
+active mask (solution above its minimum, as in `get_tracks`). Segments covered by
+several sectors are resolved by `policy`:
+    "agreement": active only if every covering sector marks it active, value = mean activation
+    "max":       active if any covering sector does, value = max activation over the sectors
+                 that mark it active (an inactive sector's activation is ignored)
+The stitched vector holds the value for active segments and 0 otherwise, in the
+segment order of `SimpleHamiltonian.construct_segments` on the full event, so it can
+be passed to `get_tracks` directly.
+
+Usage:
+    solution = solve_by_sectors(event, {"epsilon": 1e-7, "alpha": 2.0, "beta": 1.0},
+                                n_phi=8, n_slope=2, overlap=0.1, workers=8)
+    hamiltonian.construct_segments(event)
+    tracks = get_tracks(hamiltonian, solution, event)
+"""
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from toy_model import state_event_model as em
+from toy_model.simple_hamiltonian import SimpleHamiltonian
+from quantum_algorithms.block_decomposition import DEFAULT_MAX_SYSTEM_QUBITS, ComponentOneBQF
+from toy_model import instrumentation
+
+POLICIES = ("agreement", "max")
+SOLVERS = ("classical", "onebqf")
+
+
+@dataclasses.dataclass
+class Sector:
+    index: tuple
+    hit_indices: list  # per module, positions into event.modules[m].hits
+
+
+def hit_coordinates(event):
+    """Per module, arrays of hit azimuth and radial slope r / z."""
+    coordinates = []
+    for module in event.modules:
+        xyz = np.array([(hit.x, hit.y, hit.z) for hit in module.hits], dtype=float).reshape(-1, 3)
+        coordinates.append((np.arctan2(xyz[:, 1], xyz[:, 0]), np.hypot(xyz[:, 0], xyz[:, 1]) / xyz[:, 2]))
+    return coordinates
+
+
+def make_sectors(event, n_phi=4, n_slope=1, overlap=0.1):
+    """
+    n_phi x n_slope overlapping sectors. Azimuth sectors are equal-width; slope bins take
+    quantile edges over all hits so that sectors carry similar numbers of hits.
+    """
+    coordinates = hit_coordinates(event)
+    all_slopes = np.concatenate([slope for _, slope in coordinates]) if coordinates else np.zeros(0)
+    quantiles = np.quantile(all_slopes, np.linspace(0, 1, n_slope + 1)) if len(all_slopes) else np.zeros(n_slope + 1)
+    edges = quantiles.copy()
+    edges[0], edges[-1] = -np.inf, np.inf
+    half_width = np.pi / n_phi * (1 + 2 * overlap)
+
+    sectors = []
+    for i in range(n_phi):
+        center = -np.pi + (i + 0.5) * 2 * np.pi / n_phi
+        for j in range(n_slope):
+            lo, hi = edges[j], edges[j + 1]
+            margin = overlap * (quantiles[j + 1] - quantiles[j])
+            hit_indices = []
+            for phi, slope in coordinates:
+                in_phi = np.abs((phi - center + np.pi) % (2 * np.pi) - np.pi) <= half_width
+                in_slope = (slope >= lo - margin) & (slope <= hi + margin)
+                hit_indices.append(np.flatnonzero(in_phi & in_slope))
+            sectors.append(Sector((i, j), hit_indices))
+    return sectors
+
+
+def sector_event(event, sector):
+    """Event restricted to the sector's hits; the Hit objects are shared with `event`."""
+    modules = [em.Module(module.module_id, module.z, module.lx, module.ly, [module.hits[k] for k in indices])
+               for module, indices in zip(event.modules, sector.hit_indices)]
+    hits = [hit for module in modules for hit in module.hits]
+    return em.Event(event.detector_geometry, [], hits, [], modules)
+
+
+def solve_sector(event, hamiltonian_params, solver="classical", solver_options=None):
+    """Solves the SimpleHamiltonian of one (sector) event; returns the raw solution vector."""
+    solver_options = solver_options or {}
+    hamiltonian = SimpleHamiltonian(**hamiltonian_params)
+    hamiltonian.construct_segments(event)
+    if hamiltonian.n_segments == 0: return np.zeros(0)
+    A, b = hamiltonian.construct_hamiltonian(event)
+    if solver == "classical":
+        return hamiltonian.solve_classicaly()
+
+    onebqf = ComponentOneBQF(A, b, num_time_qubits=solver_options.get("num_time_qubits", 1),
+                             shots=solver_options.get("shots", 100_000),
+                             max_system_qubits=solver_options.get("max_system_qubits", DEFAULT_MAX_SYSTEM_QUBITS))
+    onebqf.run(use_kernel=solver_options.get("use_kernel", True), seed=solver_options.get("seed"))
+    return onebqf.get_solution()[0]
+
+
+def _solve_sector_task(args):
+    return solve_sector(*args)
+
+
+def segment_offsets(event):
+    """Start of each layer pair's segments in the `construct_segments` order of the full event."""
+    sizes = [len(module.hits) for module in event.modules]
+    pairs = [a * b for a, b in zip(sizes[:-1], sizes[1:])]
+    return np.concatenate([[0], np.cumsum(pairs)]).astype(np.int64)
+
+
+def global_segment_indices(event, sector):
+    """Full-event segment index of every segment of the sector, in the sector's own order."""
+    offsets = segment_offsets(event)
+    indices = []
+    for layer in range(len(event.modules) - 1):
+        from_hits, to_hits = sector.hit_indices[layer], sector.hit_indices[layer + 1]
+        n_to = len(event.modules[layer + 1].hits)
+        indices.append((offsets[layer] + from_hits[:, None] * n_to + to_hits[None, :]).reshape(-1))
+    return np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+
+
+def stitch(event, sectors, solutions, policy="agreement"):
+    """Combines per-sector solutions into one vector over the full event's segments, see the module docstring."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown stitching policy '{policy}', expected one of {POLICIES}.")
+    n_segments = segment_offsets(event)[-1]
+    covered = np.zeros(n_segments, dtype=np.int64)
+    active = np.zeros(n_segments, dtype=np.int64)
+    value = np.zeros(n_segments)
+
+    for sector, solution in zip(sectors, solutions):
+        if len(solution) == 0: continue
+        indices = global_segment_indices(event, sector)
+        solution = np.asarray(solution, dtype=float)
+        activation = solution / np.max(np.abs(solution)) if np.any(solution) else solution
+        is_active = solution > np.min(solution)
+        np.add.at(covered, indices, 1)
+        np.add.at(active, indices, is_active)
+        if policy == "max":
+            np.maximum.at(value, indices[is_active], activation[is_active])
+        else:
+            np.add.at(value, indices, activation)
+
+    if policy == "max":
+        keep = active > 0
+    else:
+        keep = (covered > 0) & (active == covered)
+        value[covered > 0] /= covered[covered > 0]
+    return np.where(keep, value, 0.0)
+
+
+@instrumentation.traced("sectors.solve")
+def solve_by_sectors(event, hamiltonian_params, n_phi=4, n_slope=1, overlap=0.1, solver="classical",
+                     policy="agreement", workers=1, solver_options=None):
+    """
+    Decomposes `event` into sectors, solves them (in `workers` processes when workers != 1;
+    None uses all cores) and returns the stitched solution over the full event's segments.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown sector solver '{solver}', expected one of {SOLVERS}.")
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown stitching policy '{policy}', expected one of {POLICIES}.")
+    if hamiltonian_params.get("segment_filter") is not None:
+        raise ValueError("Stitching maps onto the full candidate segment list; a segment_filter is not supported.")
+    sectors = make_sectors(event, n_phi, n_slope, overlap)
+    instrumentation.count("sectors", len(sectors))
+    tasks = [(sector_event(event, sector), hamiltonian_params, solver, solver_options) for sector in sectors]
+    if workers == 1:
+        solutions = [_solve_sector_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            solutions = list(executor.map(_solve_sector_task, tasks))
+    return stitch(event, sectors, solutions, policy)
@@ -0,0 +1,416 @@
+"""
+Checkpointed, resumable sweep executor producing the files in data/.
+
+Every (problem size, run, backend) combination is an independent task executed on a
+process pool. Each finished task is written atomically to its own checkpoint file, so
+an interrupted sweep resumes by skipping the keys already on disk. Once all tasks are
+done the checkpoints are merged into circuit_depth.json, success_counts.json and
+fidelity_results.json using the existing schemas. Every task carries a hash of the
+config entries its result depends on (`config_hash`), so after a config change the
+old checkpoints are neither reused nor merged.
+
+Usage:
+    python -m quantum_algorithms.sweep --config sweep.json --workers 32
+"""
+import os
+import json
+import copy
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from toy_model.state_event_generator import StateEventGenerator
+from toy_model.state_event_model import PlaneGeometry
+from toy_model.simple_hamiltonian import SimpleHamiltonian, PointingFilter
+from toy_model.chunked_hamiltonian import assemble_hamiltonian
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.onebqf_emulator import OneBQFEmulator
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+from quantum_algorithms.counts_decoding import decode_counts
+from quantum_algorithms.noise_snapshots import load_backend
+from quantum_algorithms.circuit_metrics import analytic_metrics, exact_metrics, backend_basis_gates
+
+DEFAULT_CONFIG = {
+    "particles": [2, 4, 8, 16, 32, 64, 128, 256, 512, 1024],
+    "layers": [3, 5],
+    "repeats": 5,
+    "hamiltonian": {"epsilon": 1e-7, "alpha": 2.0, "beta": 1.0},
+    "segment_filter": None,
+    "assembly": {"method": "chunked", "workers": 1},
+    "detector": {"layer_spacing": 20.0, "lx": 33.0, "ly": 33.0},
+    "generator": {"measurement_error": 0.0, "collision_noise": 0.0},
+    "num_time_qubits": 1,
+    "seed": 0,
+    "tasks": ["circuit_depth", "success_counts"],
+    "success_counts": {"shots": 100_000_000, "simulator": "kernel"},
+    "circuit_depth": {"hardware_backend": "ibm_torino", "max_particles": 256, "method": "exact"},
+    "fidelity": {"particles": [2, 4, 8], "layers": [3, 5], "backends": ["ibm_torino", "ibm_fez"],
+                 "runs": 10, "shots": 10_000, "config_label": "1BIT_2bin_2level"},
+    "checkpoint_dir": "runs/sweep/checkpoints",
+    "output_dir": "runs/sweep/data",
+}
+
+BACKEND_LABELS = {"ideal": "Qiskit-Ideal"}
+
+# Config entries a task's result depends on, beyond its own task fields; keys of a nested
+# section map to None (whole section) or to the tuple of its keys that matter
+RESULT_CONFIG = {
+    "common": {"seed": None, "num_time_qubits": None, "hamiltonian": None, "segment_filter": None,
+               "detector": None, "generator": None, "assembly": ("method",)},
+    "circuit_depth": {"circuit_depth": ("hardware_backend",)},
+    "success_counts": {"success_counts": None},
+    "fidelity": {"fidelity": ("shots",)},
+}
+
+
+def backend_label(backend_name):
+    return BACKEND_LABELS.get(backend_name, "Qiskit-" + backend_name.split("_")[-1].capitalize())
+
+
+def merge_config(base, overrides):
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def make_generator(n_particles, layers, config, seed):
+    """Seeded StateEventGenerator with `n_particles` particles in front of `layers` detector planes."""
+    detector = config["detector"]
+    geometry = PlaneGeometry(
+        module_id=list(range(layers)),
+        lx=[detector["lx"]] * layers,
+        ly=[detector["ly"]] * layers,
+        z=[detector["layer_spacing"] * (i + 1) for i in range(layers)],
+    )
+    generator = StateEventGenerator(geometry, events=1, n_particles=[n_particles], **config["generator"])
+    generator.rng = np.random.default_rng(seed)
+    np.random.seed(seed % 2 ** 32)
+    generator.generate_random_primary_vertices({"z": 0.0})
+    generator.generate_particles([[{"type": "MIP", "mass": 0.511, "q": 1}] * n_particles])
+    return generator
+
+
+def generate_event(n_particles, layers, config, seed):
+    """Generates one seeded event with `n_particles` tracks through `layers` detector planes."""
+    return make_generator(n_particles, layers, config, seed).generate_complete_events()
+
+
+def build_hamiltonian(n_particles, layers, config, seed):
+    """
+    Segment Hamiltonian of one seeded event. A "segment_filter" config entry (PointingFilter.from_generator
+    options, e.g. {"max_distance": 0.5, "angle_tolerance": 0.01}) pre-filters the segment candidates.
+    "assembly": {"method": "chunked"} builds the same matrix with `chunked_hamiltonian`, in chunks on
+    "workers" processes and through on-disk shards, for events too large for SimpleHamiltonian.
+    """
+    generator = make_generator(n_particles, layers, config, seed)
+    event = generator.generate_complete_events()
+    assembly = config.get("assembly") or {"method": "simple"}
+    if assembly["method"] == "chunked":
+        if config.get("segment_filter") is not None:
+            raise ValueError("segment_filter is only supported with the simple assembly method.")
+        options = {key: value for key, value in assembly.items() if key != "method"}
+        return assemble_hamiltonian(event, **config["hamiltonian"], **options)
+
+    segment_filter = None
+    if config.get("segment_filter") is not None:
+        segment_filter = PointingFilter.from_generator(generator, **config["segment_filter"])
+    hamiltonian = SimpleHamiltonian(**config["hamiltonian"], segment_filter=segment_filter)
+    A, b = hamiltonian.construct_hamiltonian(event)
+    return A, b
+
+
+def problem_size(n_particles, layers, matrix_size, num_time_qubits):
+    return {
+        "n_particles": n_particles,
+        "layers": layers,
+        "matrix_size": int(matrix_size),
+        "qubits_needed": int(np.ceil(np.log2(matrix_size))) + num_time_qubits + 1,
+    }
+
+
+def task_seed(config, *key):
+    """Seed derived from the sweep seed and a task key; (n, layers) seeds the event, adding the run seeds sampling."""
+    return int(np.random.SeedSequence([config["seed"], *key]).generate_state(1)[0])
+
+
+def run_circuit_depth(task, config):
+    """
+    method "exact" transpiles the circuit (metrics cached on disk); "analytic" counts the
+    level-0 decomposition from the matrix without building a circuit, in the hardware
+    backend's basis but without routing. The record states the method, optimization level
+    and whether it was routed, and analytic records are merged into their own file.
+    """
+    n, layers = task["n_particles"], task["layers"]
+    A, b = build_hamiltonian(n, layers, config, task_seed(config, n, layers))
+    backend_name = config["circuit_depth"]["hardware_backend"]
+    backend = load_backend(backend_name, allow_network=False)
+
+    method = task.get("method", "exact")
+    if method == "analytic":
+        optimization_level = 0
+        qiskit_metrics = analytic_metrics(A, config["num_time_qubits"])
+        hardware_metrics = analytic_metrics(A, config["num_time_qubits"], backend_basis_gates(backend))
+    else:
+        optimization_level = 3
+        onebqf = OneBQF(A.toarray(), b, num_time_qubits=config["num_time_qubits"])
+        circuit = onebqf.build_circuit()
+        qiskit_metrics = exact_metrics(circuit, basis_gates=["u", "cx"], optimization_level=optimization_level)
+        hardware_metrics = exact_metrics(circuit, backend, optimization_level=optimization_level)
+    hardware_metrics["backend"] = backend_name
+
+    return {
+        "problem_size": problem_size(n, layers, A.shape[0], config["num_time_qubits"]),
+        "method": method,
+        "optimization_level": optimization_level,
+        "routed": method == "exact",
+        "standard": {"qiskit": qiskit_metrics, f"hardware_{backend_name.split('_')[-1]}": hardware_metrics},
+    }
+
+
+def run_success_counts(task, config):
+    """
+    simulator "kernel" (default) evolves the circuit's state with OneBQFKernel from the sparse
+    matrix and samples the success count from its probability; "aer" runs the circuit; "emulator"
+    uses exact evolution, which equals the circuit only when the interaction pairs are disjoint.
+    """
+    n, layers, run_index = task["n_particles"], task["layers"], task["run_index"]
+    options = config["success_counts"]
+    shots = options["shots"]
+    A, b = build_hamiltonian(n, layers, config, task_seed(config, n, layers))
+    seed = task_seed(config, n, layers, run_index)
+
+    if options["simulator"] in ("kernel", "emulator"):
+        if options["simulator"] == "emulator":
+            if not OneBQFEmulator.matches_circuit(A, A.diagonal()[0]):
+                raise ValueError(f"Interaction pairs overlap for {n} particles / {layers} layers; the emulator "
+                                 f"does not reproduce the circuit there, use the 'kernel' simulator.")
+            model = OneBQFEmulator(A, num_time_qubits=config["num_time_qubits"])
+        else:
+            model = OneBQFKernel.from_matrix(A, num_time_qubits=config["num_time_qubits"])
+        probability = model.success_probability()
+        success = int(np.random.default_rng(seed).binomial(shots, min(probability, 1.0)))
+    elif options["simulator"] == "aer":
+        onebqf = OneBQF(A.toarray(), b, num_time_qubits=config["num_time_qubits"], shots=shots)
+        onebqf.build_circuit()
+        counts = onebqf.run(seed=seed)
+        success = decode_counts(counts, onebqf.num_system_qubits)[1]
+    else:
+        raise ValueError(f"Unknown simulator '{options['simulator']}', expected 'kernel', 'aer' or 'emulator'.")
+
+    return {
+        "problem_size": problem_size(n, layers, A.shape[0], config["num_time_qubits"]),
+        "measurement_stats": {"total_shots": shots, "success_counts": success, "success_rate": success / shots},
+        "run_index": run_index,
+        "standard": {},
+    }
+
+
+def run_fidelity(task, config):
+    n, layers, backend_name = task["n_particles"], task["layers"], task["backend"]
+    options = config["fidelity"]
+    A, b = build_hamiltonian(n, layers, config, task_seed(config, n, layers))
+    onebqf = OneBQF(A.toarray(), b, num_time_qubits=config["num_time_qubits"], shots=options["shots"])
+    onebqf.build_circuit()
+    seed = task_seed(config, n, layers, task["run_index"])
+    if backend_name == "ideal":
+        counts = onebqf.run(seed=seed)
+    else:
+        counts = onebqf.run(use_noise_model=True, backend_name=backend_name, offline=True, seed=seed)
+    return {"counts": counts, "num_system_qubits": onebqf.num_system_qubits}
+
+
+TASK_RUNNERS = {
+    "circuit_depth": run_circuit_depth,
+    "success_counts": run_success_counts,
+    "fidelity": run_fidelity,
+}
+
+
+def config_hash(config, kind):
+    """Short hash of the config entries that `kind` results depend on, see RESULT_CONFIG."""
+    relevant = {}
+    for name, keys in {**RESULT_CONFIG["common"], **RESULT_CONFIG[kind]}.items():
+        value = config.get(name)
+        if keys is not None and isinstance(value, dict):
+            value = {key: value.get(key) for key in keys}
+        relevant[name] = value
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def task_key(task):
+    parts = [task["kind"], f"n{task['n_particles']}", f"L{task['layers']}"]
+    if "method" in task: parts.append(task["method"])
+    if "backend" in task: parts.append(task["backend"])
+    if "run_index" in task: parts.append(f"r{task['run_index']}")
+    if "config" in task: parts.append(task["config"])
+    return "_".join(parts)
+
+
+def enumerate_tasks(config):
+    tasks = []
+    if "circuit_depth" in config["tasks"]:
+        method = config["circuit_depth"].get("method", "exact")
+        if method not in ("exact", "analytic"):
+            raise ValueError(f"Unknown circuit depth method '{method}', expected 'exact' or 'analytic'.")
+        for n in config["particles"]:
+            if method == "exact" and n > config["circuit_depth"]["max_particles"]: continue
+            for layers in config["layers"]:
+                task = {"kind": "circuit_depth", "n_particles": n, "layers": layers}
+                # Analytic (level-0, unrouted) results are keyed and stored apart from the transpiled ones
+                if method == "analytic": task["method"] = method
+                tasks.append(task)
+    if "success_counts" in config["tasks"]:
+        for n in config["particles"]:
+            for layers in config["layers"]:
+                for run_index in range(config["repeats"]):
+                    tasks.append({"kind": "success_counts", "n_particles": n, "layers": layers, "run_index": run_index})
+    if "fidelity" in config["tasks"]:
+        options = config["fidelity"]
+        for n in options["particles"]:
+            for layers in options["layers"]:
+                for backend in options["backends"]:
+                    for run_index in range(options["runs"]):
+                        tasks.append({"kind": "fidelity", "n_particles": n, "layers": layers,
+                                      "backend": backend, "run_index": run_index})
+    for task in tasks:
+        task["config"] = config_hash(config, task["kind"])
+    return tasks
+
+
+def write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def checkpoint_path(config, key):
+    return os.path.join(config["checkpoint_dir"], f"{key}.json")
+
+
+def execute_task(task, config):
+    """Runs one task and checkpoints it; executed inside the worker process."""
+    result = TASK_RUNNERS[task["kind"]](task, config)
+    write_json_atomic(checkpoint_path(config, task_key(task)), {"task": task, "result": result})
+    return task_key(task)
+
+
+def load_checkpoints(config):
+    results = []
+    if not os.path.isdir(config["checkpoint_dir"]): return results
+    for name in sorted(os.listdir(config["checkpoint_dir"])):
+        if not name.endswith(".json"): continue
+        with open(os.path.join(config["checkpoint_dir"], name)) as f:
+            results.append(json.load(f))
+    return results
+
+
+def summarize_fidelity_runs(runs, num_system_qubits):
+    """Aggregates per-run counts into the normalized_vectors / raw_counts / total_counts schema."""
+    labels = [format(i, f"0{num_system_qubits}b") + "1" for i in range(2 ** num_system_qubits)]
+    raw = np.array([decode_counts(counts, num_system_qubits)[0] for counts in runs])
+    totals = raw.sum(axis=1)
+    normalized = raw / np.where(totals == 0, 1, totals)[:, None]
+    return {
+        "state_labels": labels,
+        "normalized_vectors": {"mean": normalized.mean(axis=0).tolist(), "std": normalized.std(axis=0).tolist()},
+        "raw_counts": {"mean": dict(zip(labels, raw.mean(axis=0).tolist())),
+                       "std": dict(zip(labels, raw.std(axis=0).tolist()))},
+        "total_counts": {"mean": float(totals.mean()), "std": float(totals.std())},
+    }
+
+
+def merge_results(config, checkpoints):
+    """
+    Assembles the checkpoints into the data/*.json layouts and writes them to `output_dir`.
+    Checkpoints computed under another config (see `config_hash`) are skipped.
+    """
+    by_kind = {kind: [] for kind in TASK_RUNNERS}
+    stale = 0
+    for checkpoint in checkpoints:
+        kind = checkpoint["task"]["kind"]
+        if checkpoint["task"].get("config") != config_hash(config, kind):
+            stale += 1
+            continue
+        by_kind[kind].append(checkpoint)
+    if stale:
+        print(f"Skipped {stale} checkpoints computed with a different config.")
+
+    outputs = {}
+    for method, filename in (("exact", "circuit_depth.json"), ("analytic", "circuit_depth_analytic.json")):
+        entries = [c["result"] for c in by_kind["circuit_depth"] if c["result"].get("method", "exact") == method]
+        if entries:
+            outputs[filename] = sorted(
+                entries, key=lambda e: (e["problem_size"]["n_particles"], e["problem_size"]["layers"]))
+    if by_kind["success_counts"]:
+        entries = [c["result"] for c in by_kind["success_counts"]]
+        outputs["success_counts.json"] = sorted(
+            entries, key=lambda e: (e["problem_size"]["n_particles"], e["problem_size"]["layers"], e["run_index"]))
+    if by_kind["fidelity"]:
+        grouped = {}
+        for c in by_kind["fidelity"]:
+            task = c["task"]
+            group = (task["layers"], task["n_particles"], task["backend"])
+            grouped.setdefault(group, []).append(c["result"])
+        fidelity = {}
+        for (layers, n, backend), runs in sorted(grouped.items()):
+            summary = summarize_fidelity_runs([r["counts"] for r in runs], runs[0]["num_system_qubits"])
+            fidelity.setdefault(f"{layers}L_{n}T", {})[backend_label(backend)] = {
+                config["fidelity"]["config_label"]: summary}
+        outputs["fidelity_results.json"] = fidelity
+
+    for filename, data in outputs.items():
+        write_json_atomic(os.path.join(config["output_dir"], filename), data)
+    return outputs
+
+
+def run_sweep(config, workers=None):
+    """Runs all tasks that have no checkpoint yet, then merges every checkpoint into the output files."""
+    tasks = enumerate_tasks(config)
+    pending = [task for task in tasks if not os.path.exists(checkpoint_path(config, task_key(task)))]
+    print(f"{len(tasks) - len(pending)} of {len(tasks)} tasks already checkpointed; running {len(pending)}.")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(execute_task, task, config): task for task in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    key = future.result()
+                except Exception as error:
+                    print(f"[{done}/{len(pending)}] {task_key(futures[future])} failed: {error!r}")
+                else:
+                    print(f"[{done}/{len(pending)}] {key} done")
+
+    return merge_results(config, load_checkpoints(config))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the OneBQF parameter sweep with checkpointing.")
+    parser.add_argument("--config", help="JSON file overriding DEFAULT_CONFIG")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--tasks", nargs="+", choices=sorted(TASK_RUNNERS), help="Task kinds to run")
+    parser.add_argument("--output-dir", help="Directory for the merged JSON files")
+    parser.add_argument("--checkpoint-dir", help="Directory for per-task checkpoints")
+    parser.add_argument("--merge-only", action="store_true", help="Only merge existing checkpoints")
+    args = parser.parse_args(argv)
+
+    config = DEFAULT_CONFIG
+    if args.config:
+        with open(args.config) as f:
+            config = merge_config(config, json.load(f))
+    for option, key in ((args.tasks, "tasks"), (args.output_dir, "output_dir"), (args.checkpoint_dir, "checkpoint_dir")):
+        if option: config = merge_config(config, {key: option})
+
+    if args.merge_only:
+        merge_results(config, load_checkpoints(config))
+    else:
+        run_sweep(config, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
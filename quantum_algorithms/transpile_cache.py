@@ -0,0 +1,157 @@
+"""
+Persistent, content-addressed cache of transpiled circuits.
+
+Entries are keyed by a hash of the circuit contents, a description of the target
+backend, the optimization level, the transpiler seed and the Qiskit version, and are
+stored as QPY files. The directory is bounded in size with least-recently-used
+eviction, using file modification times as the access clock.
+"""
+import os
+import io
+import hashlib
+import tempfile
+import numpy as np
+import qiskit
+from qiskit import qpy
+from qiskit.circuit import ControlledGate
+from qiskit.circuit.library import get_standard_gate_name_mapping
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from toy_model import instrumentation
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "onebqf", "transpile")
+STANDARD_GATES = set(get_standard_gate_name_mapping())
+
+
+def _hash_param(digest, param):
+    if isinstance(param, np.ndarray):
+        digest.update(str(param.shape).encode())
+        digest.update(np.ascontiguousarray(param).tobytes())
+    elif isinstance(param, (int, float, complex, np.number)):
+        digest.update(repr(complex(param)).encode())
+    else:
+        digest.update(repr(param).encode())
+
+
+def _hash_operation(digest, operation):
+    digest.update(f"{operation.name}/{operation.num_qubits}/{operation.num_clbits};".encode())
+    if isinstance(operation, ControlledGate):
+        digest.update(f"ctrl{operation.num_ctrl_qubits}/{operation.ctrl_state};".encode())
+        _hash_operation(digest, operation.base_gate)
+        return
+    for param in operation.params:
+        _hash_param(digest, param)
+    definition = getattr(operation, "definition", None)
+    if operation.name not in STANDARD_GATES and definition is not None and not operation.params:
+        _hash_circuit(digest, definition)
+
+
+def _hash_circuit(digest, circuit):
+    digest.update(f"q{circuit.num_qubits}c{circuit.num_clbits};".encode())
+    for instruction in circuit.data:
+        _hash_operation(digest, instruction.operation)
+        qubits = [circuit.find_bit(q).index for q in instruction.qubits]
+        clbits = [circuit.find_bit(c).index for c in instruction.clbits]
+        digest.update(f"{qubits}{clbits};".encode())
+
+
+def circuit_fingerprint(circuit):
+    """
+    Content hash of a circuit. QPY output embeds generated gate names, so the hash is
+    computed from the instruction stream (names, parameters, qubit and clbit indices).
+    """
+    digest = hashlib.sha256()
+    _hash_circuit(digest, circuit)
+    return digest.hexdigest()
+
+
+def describe_target(backend):
+    """Stable description of a backend's target: name, qubit count, operations and coupling map."""
+    target = backend.target
+    coupling_map = target.build_coupling_map()
+    coupling = sorted(coupling_map.get_edges()) if coupling_map is not None else []
+    return f"{backend.name}|{target.num_qubits}|{sorted(target.operation_names)}|{coupling}"
+
+
+class TranspileCache:
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 ** 2):
+        """
+        Args:
+            cache_dir (str): Cache directory, defaults to $ONEBQF_CACHE_DIR or ~/.cache/onebqf/transpile
+            max_bytes (int): Size bound of the directory, enforced by LRU eviction after each write
+        """
+        self.cache_dir = cache_dir or os.environ.get("ONEBQF_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, circuit, backend, optimization_level=3, seed_transpiler=None):
+        description = "|".join([circuit_fingerprint(circuit), describe_target(backend),
+                                str(optimization_level), str(seed_transpiler), qiskit.__version__])
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.qpy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                circuit = qpy.load(f)[0]
+        except (FileNotFoundError, EOFError, qpy.QpyError):
+            self.misses += 1
+            instrumentation.count("transpile_cache.misses")
+            return None
+        os.utime(path)
+        self.hits += 1
+        instrumentation.count("transpile_cache.hits")
+        return circuit
+
+    def put(self, key, circuit):
+        buffer = io.BytesIO()
+        qpy.dump(circuit, buffer)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".qpy"): continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes: break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            self.evictions += 1
+
+    def transpile(self, circuit, backend, optimization_level=3, seed_transpiler=None):
+        """Returns the transpiled circuit from the cache, transpiling and storing it on a miss."""
+        key = self.key(circuit, backend, optimization_level, seed_transpiler)
+        transpiled = self.get(key)
+        if transpiled is None:
+            pm = generate_preset_pass_manager(optimization_level=optimization_level, backend=backend,
+                                              seed_transpiler=seed_transpiler)
+            transpiled = pm.run(circuit)
+            self.put(key, transpiled)
+        return transpiled
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".qpy"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": sum(1 for name in os.listdir(self.cache_dir) if name.endswith(".qpy")),
+        }
@@ -0,0 +1,450 @@
+"""
+Lease-based work queue for spreading a sweep over several machines.
+
+The queue holds the tasks of a `quantum_algorithms.sweep` configuration. Workers on any
+node claim a task by taking a time-limited lease, renew it with heartbeats while the task
+runs, and write the result when done. Leases whose holder stopped heartbeating expire and
+are reclaimed by the next worker. A task that fails (or whose lease expires) `max_attempts`
+times is marked failed and no longer claimed. A result is only committed by the worker that
+still holds the task's lease, so a task reclaimed from a stalled worker is never committed
+twice. Workers keep polling while other workers hold leases, so a lease left by a crashed
+worker is always reclaimed. Two storage layouts are available:
+
+    DirectoryWorkQueue  a directory on a shared filesystem (NFS, Lustre, ...); leases are
+                        created with O_CREAT|O_EXCL and reclaimed with an atomic rename
+    SQLiteWorkQueue     a single SQLite file, for one machine or as a stand-in
+
+Node clocks are assumed to be synchronized (NTP), since lease expiry is wall-clock based.
+
+Usage:
+    python -m quantum_algorithms.work_queue init   --queue /shared/q --config sweep.json
+    python -m quantum_algorithms.work_queue worker --queue /shared/q --processes 16
+    python -m quantum_algorithms.work_queue status --queue /shared/q
+    python -m quantum_algorithms.work_queue merge  --queue /shared/q --output-dir data
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from abc import ABC, abstractmethod
+from contextlib import closing
+from quantum_algorithms import sweep
+
+
+class WorkQueue(ABC):
+    def __init__(self, max_attempts=3):
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def initialize(self, config, tasks):
+        """Stores the sweep configuration and adds the tasks that are not queued yet."""
+        pass
+
+    @abstractmethod
+    def config(self):
+        pass
+
+    @abstractmethod
+    def claim(self, worker_id, lease_seconds):
+        """Leases one pending or expired task and returns it, or None if nothing is claimable."""
+        pass
+
+    @abstractmethod
+    def heartbeat(self, key, worker_id, lease_seconds):
+        """Extends the lease; returns False if the lease is no longer held by `worker_id`."""
+        pass
+
+    @abstractmethod
+    def complete(self, key, worker_id, result):
+        """Stores the result if `worker_id` still holds the lease; returns False (result dropped) otherwise."""
+        pass
+
+    @abstractmethod
+    def release(self, key, worker_id):
+        """Gives a lease back without a result."""
+        pass
+
+    @abstractmethod
+    def fail(self, key, worker_id, error):
+        """Gives a lease back after a failure; marks the task failed once it used `max_attempts` claims."""
+        pass
+
+    @abstractmethod
+    def results(self):
+        """Returns the finished tasks as [{"task": ..., "result": ...}], the sweep checkpoint layout."""
+        pass
+
+    @abstractmethod
+    def status(self):
+        pass
+
+
+class DirectoryWorkQueue(WorkQueue):
+    def __init__(self, root, max_attempts=3):
+        super().__init__(max_attempts)
+        self.root = root
+        self.dirs = {name: os.path.join(root, name) for name in ("tasks", "leases", "results", "attempts", "failed")}
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        with open(path) as f:
+            return json.load(f)
+
+    def _path(self, kind, key):
+        return os.path.join(self.dirs[kind], f"{key}.json")
+
+    def initialize(self, config, tasks):
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+        self._write_atomic(os.path.join(self.root, "config.json"), config)
+        for task in tasks:
+            path = self._path("tasks", sweep.task_key(task))
+            if not os.path.exists(path):
+                self._write_atomic(path, task)
+
+    def config(self):
+        return self._read(os.path.join(self.root, "config.json"))
+
+    def _try_lease(self, key, worker_id, lease_seconds):
+        lease_path = self._path("leases", key)
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                lease = self._read(lease_path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return False
+            if lease["expires"] > time.time():
+                return False
+            # Expired: move it aside atomically so that exactly one worker reclaims it.
+            expired_path = f"{lease_path}.{uuid.uuid4().hex}.expired"
+            try:
+                os.rename(lease_path, expired_path)
+            except FileNotFoundError:
+                return False
+            try:
+                fresh = self._read(expired_path)["expires"] > time.time()
+            except json.JSONDecodeError:
+                fresh = True  # being rewritten by a heartbeat
+            if fresh:
+                # Another worker reclaimed it first and we moved its fresh lease: put it back.
+                try:
+                    os.link(expired_path, lease_path)
+                except FileExistsError:
+                    pass
+                os.remove(expired_path)
+                return False
+            os.remove(expired_path)
+            return self._try_lease(key, worker_id, lease_seconds)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"worker": worker_id, "expires": time.time() + lease_seconds}, f)
+        return True
+
+    def _finished(self, key):
+        return os.path.exists(self._path("results", key)) or os.path.exists(self._path("failed", key))
+
+    def _attempts(self, key):
+        try:
+            return len(os.listdir(os.path.join(self.dirs["attempts"], key)))
+        except FileNotFoundError:
+            return 0
+
+    def _mark_failed(self, key, worker_id, error):
+        os.makedirs(self.dirs["failed"], exist_ok=True)
+        self._write_atomic(self._path("failed", key), {"task": self._read(self._path("tasks", key)),
+                                                      "error": error, "attempts": self._attempts(key),
+                                                      "worker": worker_id})
+
+    def claim(self, worker_id, lease_seconds):
+        for name in sorted(os.listdir(self.dirs["tasks"])):
+            key = name[:-len(".json")]
+            if self._finished(key): continue
+            if self._try_lease(key, worker_id, lease_seconds):
+                if self._finished(key):
+                    self.release(key, worker_id)
+                    continue
+                if self._attempts(key) >= self.max_attempts:
+                    # Every earlier holder failed or let its lease expire
+                    self._mark_failed(key, worker_id, "lease expired")
+                    self.release(key, worker_id)
+                    continue
+                # One uniquely named file per claim, so concurrent claims never lose a count
+                attempts_dir = os.path.join(self.dirs["attempts"], key)
+                os.makedirs(attempts_dir, exist_ok=True)
+                open(os.path.join(attempts_dir, f"{uuid.uuid4().hex}-{worker_id}"), "w").close()
+                return self._read(self._path("tasks", key))
+        return None
+
+    def heartbeat(self, key, worker_id, lease_seconds):
+        # The lease is read and rewritten through one descriptor, so only the file that was checked
+        # is updated: a lease reclaimed in between (moved aside, replaced by a new file) is never
+        # overwritten, and the final inode check reports it as lost.
+        lease_path = self._path("leases", key)
+        try:
+            fd = os.open(lease_path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            try:
+                if json.loads(os.pread(fd, 1 << 16, 0))["worker"] != worker_id: return False
+            except json.JSONDecodeError:
+                return False
+            data = json.dumps({"worker": worker_id, "expires": time.time() + lease_seconds}).encode()
+            os.pwrite(fd, data, 0)
+            os.ftruncate(fd, len(data))
+            try:
+                return os.stat(lease_path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                return False
+        finally:
+            os.close(fd)
+
+    def complete(self, key, worker_id, result):
+        # Only an unexpired lease is safe to commit under: an expired one may be being reclaimed right now
+        lease_path = self._path("leases", key)
+        try:
+            fd = os.open(lease_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            try:
+                lease = json.loads(os.pread(fd, 1 << 16, 0))
+            except json.JSONDecodeError:
+                return False
+            if lease["worker"] != worker_id or lease["expires"] <= time.time(): return False
+            try:
+                if os.stat(lease_path).st_ino != os.fstat(fd).st_ino: return False
+            except FileNotFoundError:
+                return False
+            self._write_atomic(self._path("results", key), {"task": self._read(self._path("tasks", key)),
+                                                           "result": result, "worker": worker_id})
+        finally:
+            os.close(fd)
+        self.release(key, worker_id)
+        return True
+
+    def release(self, key, worker_id):
+        try:
+            if self._read(self._path("leases", key))["worker"] == worker_id:
+                os.remove(self._path("leases", key))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def fail(self, key, worker_id, error):
+        if self._attempts(key) >= self.max_attempts:
+            self._mark_failed(key, worker_id, error)
+        self.release(key, worker_id)
+
+    def results(self):
+        return [self._read(os.path.join(self.dirs["results"], name))
+                for name in sorted(os.listdir(self.dirs["results"])) if name.endswith(".json")]
+
+    def status(self):
+        now = time.time()
+        total = sum(1 for name in os.listdir(self.dirs["tasks"]) if name.endswith(".json"))
+        done = sum(1 for name in os.listdir(self.dirs["results"]) if name.endswith(".json"))
+        failed = sum(1 for name in os.listdir(self.dirs["failed"]) if name.endswith(".json")) \
+            if os.path.isdir(self.dirs["failed"]) else 0
+        leased = expired = 0
+        for name in os.listdir(self.dirs["leases"]):
+            if not name.endswith(".json") or self._finished(name[:-len(".json")]): continue
+            try:
+                lease = self._read(os.path.join(self.dirs["leases"], name))
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            if lease["expires"] > now: leased += 1
+            else: expired += 1
+        return {"total": total, "done": done, "failed": failed, "leased": leased, "expired": expired,
+                "pending": total - done - failed - leased - expired}
+
+
+class SQLiteWorkQueue(WorkQueue):
+    def __init__(self, path, max_attempts=3):
+        super().__init__(max_attempts)
+        self.path = path
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def initialize(self, config, tasks):
+        with closing(self._connect()) as db:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS tasks (key TEXT PRIMARY KEY, task TEXT, status TEXT, "
+                       "worker TEXT, expires REAL, attempts INTEGER DEFAULT 0, result TEXT)")
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?)", (json.dumps(config),))
+            db.executemany("INSERT OR IGNORE INTO tasks (key, task, status) VALUES (?, ?, 'pending')",
+                           [(sweep.task_key(task), json.dumps(task)) for task in tasks])
+
+    def config(self):
+        with closing(self._connect()) as db:
+            return json.loads(db.execute("SELECT value FROM meta WHERE name = 'config'").fetchone()[0])
+
+    def claim(self, worker_id, lease_seconds):
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            db.execute("UPDATE tasks SET status = 'failed', worker = NULL, expires = NULL, result = ? "
+                       "WHERE status = 'leased' AND expires < ? AND attempts >= ?",
+                       (json.dumps({"error": "lease expired"}), now, self.max_attempts))
+            row = db.execute("SELECT key, task FROM tasks WHERE status = 'pending' OR "
+                             "(status = 'leased' AND expires < ?) ORDER BY key LIMIT 1", (now,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE tasks SET status = 'leased', worker = ?, expires = ?, attempts = attempts + 1 "
+                           "WHERE key = ?", (worker_id, now + lease_seconds, row[0]))
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        return json.loads(row[1]) if row is not None else None
+
+    def heartbeat(self, key, worker_id, lease_seconds):
+        with closing(self._connect()) as db:
+            cursor = db.execute("UPDATE tasks SET expires = ? WHERE key = ? AND worker = ? AND status = 'leased'",
+                                (time.time() + lease_seconds, key, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, key, worker_id, result):
+        with closing(self._connect()) as db:
+            cursor = db.execute("UPDATE tasks SET status = 'done', result = ? "
+                                "WHERE key = ? AND worker = ? AND status = 'leased'",
+                                (json.dumps(result), key, worker_id))
+            return cursor.rowcount == 1
+
+    def release(self, key, worker_id):
+        with closing(self._connect()) as db:
+            db.execute("UPDATE tasks SET status = 'pending', worker = NULL, expires = NULL "
+                       "WHERE key = ? AND worker = ? AND status = 'leased'", (key, worker_id))
+
+    def fail(self, key, worker_id, error):
+        with closing(self._connect()) as db:
+            db.execute("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                       "worker = NULL, expires = NULL, result = ? WHERE key = ? AND worker = ? AND status = 'leased'",
+                       (self.max_attempts, json.dumps({"error": error}), key, worker_id))
+
+    def results(self):
+        with closing(self._connect()) as db:
+            rows = db.execute("SELECT task, result FROM tasks WHERE status = 'done' ORDER BY key").fetchall()
+        return [{"task": json.loads(task), "result": json.loads(result)} for task, result in rows]
+
+    def status(self):
+        now = time.time()
+        with closing(self._connect()) as db:
+            rows = db.execute("SELECT status, expires FROM tasks").fetchall()
+        counts = {"total": len(rows), "done": 0, "failed": 0, "leased": 0, "expired": 0, "pending": 0}
+        for status, expires in rows:
+            if status == "leased":
+                counts["leased" if expires > now else "expired"] += 1
+            else:
+                counts[status] += 1
+        return counts
+
+
+def open_queue(path, max_attempts=3):
+    """SQLite files (*.db, *.sqlite) use SQLiteWorkQueue; any other path is a DirectoryWorkQueue."""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteWorkQueue(path, max_attempts)
+    return DirectoryWorkQueue(path, max_attempts)
+
+
+def run_worker(queue_path, worker_id=None, lease_seconds=600, heartbeat_interval=60, max_tasks=None,
+               max_attempts=3, poll_interval=None):
+    """
+    Claims and executes tasks until every task is done or failed. While other workers hold
+    leases it polls every `poll_interval` seconds (default: the heartbeat interval), so that
+    it reclaims their tasks if they stop heartbeating.
+    """
+    queue = open_queue(queue_path, max_attempts)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    poll_interval = heartbeat_interval if poll_interval is None else poll_interval
+    config = queue.config()
+    completed = 0
+
+    while max_tasks is None or completed < max_tasks:
+        task = queue.claim(worker_id, lease_seconds)
+        if task is None:
+            status = queue.status()
+            if status["pending"] + status["leased"] + status["expired"] == 0: break
+            time.sleep(poll_interval)
+            continue
+        key = sweep.task_key(task)
+
+        stop, lost = threading.Event(), threading.Event()
+        def beat():
+            while not stop.wait(heartbeat_interval):
+                if not queue.heartbeat(key, worker_id, lease_seconds):
+                    print(f"{worker_id}: lost lease on {key}")
+                    lost.set()
+                    return
+        heartbeat_thread = threading.Thread(target=beat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            result = sweep.TASK_RUNNERS[task["kind"]](task, config)
+        except Exception as error:
+            print(f"{worker_id}: {key} failed: {error!r}")
+            queue.fail(key, worker_id, repr(error))
+            continue
+        finally:
+            stop.set()
+            heartbeat_thread.join()
+        # A lost lease means the task may have been reclaimed; its new holder commits the result
+        if lost.is_set() or not queue.complete(key, worker_id, result):
+            print(f"{worker_id}: {key} result dropped, the lease is no longer held")
+            continue
+        completed += 1
+        print(f"{worker_id}: {key} done")
+    return completed
+
+
+def run_workers(queue_path, processes, **worker_options):
+    """Starts `processes` local worker processes against the same queue and waits for them."""
+    workers = [multiprocessing.Process(target=run_worker, args=(queue_path,), kwargs=worker_options)
+               for _ in range(processes)]
+    for worker in workers: worker.start()
+    for worker in workers: worker.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed work queue for OneBQF sweeps.")
+    parser.add_argument("command", choices=["init", "worker", "status", "merge"])
+    parser.add_argument("--queue", required=True, help="Shared directory or SQLite file (*.db)")
+    parser.add_argument("--config", help="Sweep config JSON (init)")
+    parser.add_argument("--processes", type=int, default=1, help="Local worker processes (worker)")
+    parser.add_argument("--lease-seconds", type=float, default=600)
+    parser.add_argument("--heartbeat-interval", type=float, default=60)
+    parser.add_argument("--max-attempts", type=int, default=3, help="Claims per task before it is marked failed")
+    parser.add_argument("--output-dir", help="Directory for the merged JSON files (merge)")
+    args = parser.parse_args(argv)
+
+    queue = open_queue(args.queue)
+    if args.command == "init":
+        config = sweep.DEFAULT_CONFIG
+        if args.config:
+            with open(args.config) as f:
+                config = sweep.merge_config(config, json.load(f))
+        queue.initialize(config, sweep.enumerate_tasks(config))
+        print(queue.status())
+    elif args.command == "worker":
+        run_workers(args.queue, args.processes, lease_seconds=args.lease_seconds,
+                    heartbeat_interval=args.heartbeat_interval, max_attempts=args.max_attempts)
+    elif args.command == "status":
+        print(queue.status())
+    elif args.command == "merge":
+        config = queue.config()
+        if args.output_dir: config["output_dir"] = args.output_dir
+        sweep.merge_results(config, queue.results())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quantum_algorithms.sweep import DEFAULT_CONFIG, build_hamiltonian, generate_event, task_seed  # noqa: E402
+
+
+@pytest.fixture
+def hamiltonian():
+    """Seeded sweep Hamiltonian (A as sparse matrix, b) of an event with `n` particles and `layers` planes."""
+    def build(n, layers, **overrides):
+        config = {**DEFAULT_CONFIG, **overrides}
+        return build_hamiltonian(n, layers, config, task_seed(config, n, layers))
+    return build
+
+
+@pytest.fixture
+def event():
+    """Seeded sweep event with `n` particles and `layers` planes."""
+    def generate(n, layers):
+        return generate_event(n, layers, DEFAULT_CONFIG, task_seed(DEFAULT_CONFIG, n, layers))
+    return generate
@@ -0,0 +1,45 @@
+import numpy as np
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.adaptive_sampling import _sample_kernel_chunk, run_adaptive, wilson_halfwidth
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+
+
+def test_partial_last_chunk_is_sampled(hamiltonian):
+    A, b = hamiltonian(2, 3)
+    onebqf = OneBQF(A.toarray(), b)
+    result = run_adaptive(onebqf, success_halfwidth=1e-9, chunk_shots=1000, max_shots=2500, n_workers=1,
+                          seed=3, use_kernel=True)
+    assert not result.converged
+    assert result.shots_used == 2500 and result.n_chunks == 3
+    assert sum(result.counts.values()) == 2500 == onebqf.shots_used
+
+
+def test_stops_once_converged(hamiltonian):
+    A, b = hamiltonian(2, 3)
+    onebqf = OneBQF(A.toarray(), b)
+    result = run_adaptive(onebqf, success_halfwidth=0.01, chunk_shots=2000, max_shots=1_000_000, n_workers=1,
+                          seed=3, use_kernel=True)
+    assert result.converged and result.shots_used < 1_000_000
+    assert result.success_halfwidth <= 0.01
+    assert abs(result.success_rate - 0.125) < 3 * result.success_halfwidth
+
+
+def test_wilson_halfwidth_shrinks_with_trials():
+    assert np.isinf(wilson_halfwidth(0, 0, 1.96))
+    assert wilson_halfwidth(500, 1000, 1.96) > wilson_halfwidth(5000, 10000, 1.96)
+
+
+def test_kernel_chunks_sample_precomputed_probabilities(hamiltonian):
+    A, b = hamiltonian(2, 5)
+    kernel = OneBQFKernel(OneBQF(A.toarray(), b))
+    probabilities = kernel.probabilities()
+    assert _sample_kernel_chunk(probabilities, kernel.num_system_qubits, 5000, 11) == kernel.sample_counts(5000, 11)
+
+
+def test_converged_run_counts_only_finished_chunks(hamiltonian):
+    A, b = hamiltonian(2, 3)
+    onebqf = OneBQF(A.toarray(), b)
+    result = run_adaptive(onebqf, success_halfwidth=0.05, chunk_shots=1000, max_shots=10_000_000, n_workers=4,
+                          seed=5, use_kernel=True)
+    assert result.converged
+    assert result.shots_used == 1000 * result.n_chunks == sum(result.counts.values())
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.async_pipeline import AerBackend, AsyncPipeline, ExecutionBackend, MockRemoteBackend
+
+
+SHOTS = (300, 500, 700)
+
+
+def problems(hamiltonian):
+    return [(A.toarray(), b) for A, b in (hamiltonian(2, 3), hamiltonian(2, 5), hamiltonian(4, 3))]
+
+
+def instances(hamiltonian):
+    return [OneBQF(A, b, shots=shots) for (A, b), shots in zip(problems(hamiltonian), SHOTS)]
+
+
+def test_pipeline_matches_serial_runs(hamiltonian):
+    pipeline = AsyncPipeline(MockRemoteBackend(AerBackend(seed_simulator=7), latency=0.01),
+                             build_workers=2, transpile_workers=2, simulate_workers=2)
+    algorithms = instances(hamiltonian)
+    solutions = pipeline.run_sync(algorithms)
+
+    for (A, b), shots, algorithm, solution in zip(problems(hamiltonian), SHOTS, algorithms, solutions):
+        serial = OneBQF(A, b, shots=shots)
+        serial.build_circuit()
+        assert serial.run(seed=7) == algorithm.counts
+        np.testing.assert_array_equal(solution[0], serial.get_solution()[0])
+
+
+class FailingBackend(ExecutionBackend):
+    def __init__(self):
+        self.backend = AerBackend()
+
+    @property
+    def target(self):
+        return self.backend.target
+
+    async def run(self, circuit, shots):
+        if shots == 500: raise RuntimeError("job rejected")
+        return await self.backend.run(circuit, shots)
+
+
+def test_stage_errors_propagate(hamiltonian):
+    pipeline = AsyncPipeline(FailingBackend(), build_workers=1, transpile_workers=1)
+    with pytest.raises(ExceptionGroup) as raised:
+        pipeline.run_sync(instances(hamiltonian))
+    assert raised.value.subgroup(RuntimeError) is not None
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from toy_model.batch_hamiltonian import BatchHamiltonian
+from toy_model.simple_hamiltonian import SimpleHamiltonian
+
+PARAMS = {"epsilon": 1e-7, "alpha": 2.0, "beta": 1.0}
+
+
+def simple_system(event, convolution=False):
+    hamiltonian = SimpleHamiltonian(**PARAMS)
+    A, b = hamiltonian.construct_hamiltonian(event, convolution=convolution)
+    return hamiltonian, A.tocsr(), b
+
+
+@pytest.mark.parametrize("convolution", [False, True])
+def test_blocks_equal_simple_hamiltonian(event, convolution):
+    events = [event(2, 3), event(4, 5), event(8, 3)]
+    # A small chunk_elements splits every layer triple into several middle-hit chunks
+    batch = BatchHamiltonian(**PARAMS, convolution=convolution, chunk_elements=8)
+    A, b = batch.construct_hamiltonian(events)
+    assert batch.n_events == 3 and A.shape[0] == batch.offsets[-1] == len(b)
+    for k, ev in enumerate(events):
+        _, A_simple, b_simple = simple_system(ev, convolution)
+        A_block, b_block = batch.block(k)
+        # Dense and NaN-aware: both builders take arccos of cosines that round to just above 1
+        np.testing.assert_array_equal(A_block.toarray(), A_simple.toarray())
+        np.testing.assert_array_equal(b_block, b_simple)
+
+
+def test_solve_matches_per_event_solutions(event):
+    events = [event(2, 3), event(4, 5)]
+    batch = BatchHamiltonian(**PARAMS)
+    batch.construct_hamiltonian(events)
+    for method in ("direct", "cg"):
+        for ev, solution in zip(events, batch.solve(method)):
+            hamiltonian, _, _ = simple_system(ev)
+            np.testing.assert_allclose(solution, hamiltonian.solve_classicaly(), atol=1e-4)
+
+
+def test_unknown_solve_method_raises(event):
+    batch = BatchHamiltonian(**PARAMS)
+    batch.construct_hamiltonian([event(2, 3)])
+    with pytest.raises(ValueError, match="Unknown solve method"):
+        batch.solve("lu")
@@ -0,0 +1,40 @@
+import numpy as np
+from qiskit import QuantumCircuit
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.batch_runner import BatchRunner
+from quantum_algorithms.transpile_cache import TranspileCache
+
+
+def bell(flip=False):
+    qc = QuantumCircuit(2, 2)
+    qc.h(0)
+    qc.cx(0, 1)
+    if flip: qc.x(1)
+    qc.measure([0, 1], [0, 1])
+    return qc
+
+
+def test_transpile_single_miss_returns_circuits(tmp_path):
+    runner = BatchRunner(cache=TranspileCache(str(tmp_path)))
+    transpiled = runner.transpile([bell()])
+    assert len(transpiled) == 1 and isinstance(transpiled[0], QuantumCircuit)
+
+
+def test_mixed_hit_and_miss_batch(tmp_path):
+    cache = TranspileCache(str(tmp_path))
+    BatchRunner(cache=cache).transpile([bell()])
+
+    runner = BatchRunner(cache=cache, seed_simulator=7)
+    counts = runner.run([bell(), bell(flip=True)], shots=200)
+    assert cache.hits == 1 and cache.misses == 2
+    assert set(counts[0]) <= {"00", "11"} and set(counts[1]) <= {"01", "10"}
+    assert all(sum(c.values()) == 200 for c in counts)
+
+
+def test_run_sets_counts_on_instances(hamiltonian):
+    A, b = hamiltonian(2, 3)
+    items = [OneBQF(A.toarray(), b, shots=100), OneBQF(A.toarray(), b, shots=300)]
+    counts = BatchRunner(seed_simulator=1).run(items)
+    assert [sum(c.values()) for c in counts] == [100, 300]
+    assert all(item.counts is c for item, c in zip(items, counts))
+    np.testing.assert_allclose(np.linalg.norm(items[1].get_solution()[0]), 1.0)
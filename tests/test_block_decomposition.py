@@ -0,0 +1,46 @@
+import numpy as np
+from quantum_algorithms.block_decomposition import (ComponentOneBQF, allocate_shots, connected_components,
+                                                    pack_components)
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+
+
+def test_components_cover_every_index_once(hamiltonian):
+    A, _ = hamiltonian(8, 5)
+    components = connected_components(A)
+    np.testing.assert_array_equal(np.sort(np.concatenate(components)), np.arange(A.shape[0]))
+    assert [len(c) for c in components] == sorted((len(c) for c in components), reverse=True)
+
+
+def test_default_budget_packs_small_components_together(hamiltonian):
+    A, _ = hamiltonian(8, 5)
+    components = connected_components(A)
+    bins = pack_components(components)
+    assert len(bins) < len(components) / 8
+    assert all(len(block) <= 64 for block in bins)
+    np.testing.assert_array_equal(np.sort(np.concatenate(bins)), np.arange(A.shape[0]))
+
+
+def test_allocate_shots_is_proportional():
+    np.testing.assert_array_equal(allocate_shots([3, 1], 1000), [750, 250])
+    assert allocate_shots([5, 3, 1], 100).sum() == 100
+
+
+def test_bin_responses_equal_the_full_circuit(hamiltonian):
+    # Per-index response 2^n_b p_b(i) of each bin circuit equals 2^N p(i) of the full one
+    A, b = hamiltonian(4, 5)
+    solver = ComponentOneBQF(A, b, max_system_qubits=3)
+    assert len(solver.solvers) > 1
+    full = OneBQFKernel.from_matrix(A).probabilities()[1] * 2 ** int(np.ceil(np.log2(A.shape[0])))
+    for block_solver, block in zip(solver.solvers, solver.blocks):
+        response = OneBQFKernel(block_solver).probabilities()[1][:len(block)] * block_solver.system_dim
+        np.testing.assert_allclose(response, full[block], atol=1e-12)
+
+
+def test_reassembled_solution_matches_kernel(hamiltonian):
+    A, b = hamiltonian(4, 5)
+    solver = ComponentOneBQF(A, b, shots=2_000_000)
+    solver.run(use_kernel=True, seed=0)
+    solution, success = solver.get_solution()
+    expected, _ = OneBQFKernel.from_matrix(A).get_solution()
+    assert success > 0
+    np.testing.assert_allclose(solution, expected, atol=5e-3)
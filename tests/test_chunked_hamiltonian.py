@@ -0,0 +1,39 @@
+import os
+import numpy as np
+import pytest
+from toy_model.batch_hamiltonian import module_hit_arrays
+from toy_model.chunked_hamiltonian import _init_worker, _write_shard, assemble_hamiltonian, chunk_tasks, merge_shards
+from toy_model.simple_hamiltonian import SimpleHamiltonian
+
+PARAMS = {"epsilon": 1e-7, "alpha": 2.0, "beta": 1.0}
+
+
+@pytest.mark.parametrize("n, layers", [(2, 3), (4, 5), (8, 3)])
+@pytest.mark.parametrize("chunk_elements", [1, 16, 2 ** 22])
+def test_assembly_equals_simple_hamiltonian(event, n, layers, chunk_elements):
+    ev = event(n, layers)
+    A_simple, b_simple = SimpleHamiltonian(**PARAMS).construct_hamiltonian(ev)
+    A, b = assemble_hamiltonian(ev, **PARAMS, workers=1, chunk_elements=chunk_elements)
+    assert A.format == "csr" and A.has_sorted_indices
+    assert (A != A_simple.tocsr()).nnz == 0
+    np.testing.assert_array_equal(b, b_simple)
+
+
+def test_process_pool_assembly_cleans_up_shards(event, tmp_path):
+    ev = event(4, 5)
+    A_simple, _ = SimpleHamiltonian(**PARAMS).construct_hamiltonian(ev)
+    A, _ = assemble_hamiltonian(ev, **PARAMS, workers=2, chunk_elements=16, shard_dir=str(tmp_path))
+    assert (A != A_simple.tocsr()).nnz == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_merge_shards_block_size_does_not_change_the_matrix(event, tmp_path):
+    ev = event(8, 3)
+    hit_arrays = module_hit_arrays(ev)
+    _init_worker(hit_arrays, PARAMS["epsilon"], False, 1e-4)
+    shards = [_write_shard(task, str(tmp_path / f"shard_{i}.npy")) for i, task in enumerate(chunk_tasks(hit_arrays, 16))]
+    paths = [path for path, count in shards if count]
+    n = SimpleHamiltonian(**PARAMS).construct_hamiltonian(ev)[0].shape[0]
+    reference = merge_shards(paths, n, 3.0)
+    for block_size in (1, 3):
+        assert (merge_shards(paths, n, 3.0, block_size=block_size) != reference).nnz == 0
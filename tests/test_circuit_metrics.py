@@ -0,0 +1,25 @@
+import pytest
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.circuit_metrics import analytic_metrics, exact_metrics
+from quantum_algorithms.sweep import DEFAULT_CONFIG, merge_config, run_sweep
+
+KEYS = ("depth", "two_qubit_depth", "total_gates", "single_qubit_gates", "two_qubit_gates", "gate_breakdown")
+
+
+@pytest.mark.parametrize("n, layers, num_time_qubits", [(2, 3, 1), (2, 5, 1), (2, 3, 2)])
+def test_analytic_matches_level_0_transpile(hamiltonian, n, layers, num_time_qubits):
+    A, b = hamiltonian(n, layers)
+    circuit = OneBQF(A.toarray(), b, num_time_qubits=num_time_qubits).build_circuit()
+    exact = exact_metrics(circuit, optimization_level=0, cache_dir=False)
+    analytic = analytic_metrics(A, num_time_qubits)
+    assert {key: analytic[key] for key in KEYS} == {key: exact[key] for key in KEYS}
+
+
+def test_analytic_records_are_tagged_and_kept_apart(tmp_path):
+    config = merge_config(DEFAULT_CONFIG, {
+        "particles": [2], "layers": [3], "tasks": ["circuit_depth"], "circuit_depth": {"method": "analytic"},
+        "checkpoint_dir": str(tmp_path / "checkpoints"), "output_dir": str(tmp_path / "data")})
+    outputs = run_sweep(config, workers=1)
+    assert "circuit_depth.json" not in outputs
+    (record,) = outputs["circuit_depth_analytic.json"]
+    assert (record["method"], record["optimization_level"], record["routed"]) == ("analytic", 0, False)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from quantum_algorithms.counts_decoding import decode_counts, keys_to_values, memory_to_arrays, postselect
+from quantum_algorithms.HHL import HHLAlgorithm
+
+
+def test_key_formats_agree():
+    expected = [0b101, 0b010, 0b111]
+    np.testing.assert_array_equal(keys_to_values(["101", "010", "111"]), expected)
+    np.testing.assert_array_equal(keys_to_values(["1 01", "0 10", "1 11"]), expected)
+    np.testing.assert_array_equal(keys_to_values([hex(v) for v in expected]), expected)
+    np.testing.assert_array_equal(keys_to_values(expected), expected)
+    assert len(keys_to_values([])) == 0
+
+
+def test_wide_keys_fall_back_to_python_ints():
+    keys = ["1" + "0" * 69 + "1", "0" * 70 + "1"]
+    values = keys_to_values(keys)
+    assert values.dtype == object and list(values) == [2 ** 70 + 1, 1]
+    system, frequencies = postselect(values, np.array([3, 4]))
+    assert list(system) == [2 ** 69, 0] and list(frequencies) == [3, 4]
+
+
+def test_postselect_keeps_ancilla_one():
+    system, frequencies = postselect(np.array([0b101, 0b100, 0b011, 0b001]), np.array([5, 6, 7, 8]))
+    np.testing.assert_array_equal(system, [0b10, 0b01, 0b00])
+    np.testing.assert_array_equal(frequencies, [5, 7, 8])
+
+
+def test_decode_counts_dense_sparse_and_memory():
+    counts = {"101": 5, "100": 6, "011": 7, "001": 8}
+    prob_dist, success = decode_counts(counts, 2)
+    np.testing.assert_array_equal(prob_dist, [8, 7, 5, 0])
+    assert success == 20
+    indices, frequencies, _ = decode_counts(counts, 2, sparse=True)
+    np.testing.assert_array_equal(indices, [0, 1, 2])
+    np.testing.assert_array_equal(frequencies, [8, 7, 5])
+
+    memory = [key for key, n in counts.items() for _ in range(n)]
+    values, frequencies = memory_to_arrays(memory)
+    assert dict(zip(values.tolist(), frequencies.tolist())) == {0b101: 5, 0b100: 6, 0b011: 7, 0b001: 8}
+
+
+@pytest.mark.parametrize("key", [lambda v: format(v, "02b"), hex, int])
+def test_hhl_debug_decoding_accepts_every_key_format(capsys, key):
+    hhl = HHLAlgorithm(np.array([[2.0, -1.0], [-1.0, 2.0]]), np.array([1.0, 0.0]), num_time_qubits=2, debug=True)
+    solution = hhl.get_solution({key(0b11): 30, key(0b01): 10, key(0b10): 60})
+    np.testing.assert_allclose(solution, np.sqrt([0.25, 0.75]))
+    out = capsys.readouterr().out
+    assert "b = 1, ancilla = 1, Count: 30" in out and "b = 0, ancilla = 1, Count: 10" in out
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+from scipy.linalg import expm
+from qiskit import QuantumCircuit
+from qiskit.circuit.library import QFT, RYGate, UnitaryGate
+from qiskit.quantum_info import Operator, Statevector
+from quantum_algorithms.HHL import HHLAlgorithm
+from toy_model import instrumentation
+
+
+def reference_state(hhl):
+    """
+    Final state of the original HHL construction (controlled expm(iAt 2^i) gates and one
+    X-flipped multi-controlled RY per eigenvalue estimate) without measurements.
+    """
+    n = hhl.num_time_qubits
+    qc = QuantumCircuit(hhl.time_qr, hhl.b_qr, hhl.ancilla_qr)
+    qc.initialize(hhl.vector_b, hhl.b_qr)
+
+    def controlled_u(matrix, i):
+        gate = UnitaryGate(expm(1j * matrix * hhl.t * 2 ** i)).control(1)
+        qc.append(gate, [hhl.time_qr[n - i - 1]] + list(hhl.b_qr))
+
+    qc.h(hhl.time_qr)
+    for i in range(n):
+        controlled_u(hhl.A, i)
+    qc.append(QFT(n, do_swaps=True).inverse().to_gate(), hhl.time_qr[:])
+
+    for i in range(1, 2 ** n):
+        lam = 2 * np.pi * (i / 2 ** n) / hhl.t
+        bits = format(i, f"0{n}b")
+        zeros = [hhl.time_qr[j] for j, bit in enumerate(bits) if bit == "0"]
+        if zeros: qc.x(zeros)
+        angle = 2 * np.arcsin(min(1.0, 0.3 / lam / 2))
+        qc.append(RYGate(angle).control(n), [*hhl.time_qr, hhl.ancilla_qr[0]])
+        if zeros: qc.x(zeros)
+
+    qc.append(QFT(n, do_swaps=True).to_gate(), hhl.time_qr[:])
+    for i in reversed(range(n)):
+        controlled_u(-hhl.A, i)
+    qc.h(hhl.time_qr)
+    return Statevector(qc).data
+
+
+@pytest.fixture
+def system(hamiltonian):
+    A, b = hamiltonian(2, 3)
+    return A.toarray()[:6, :6], b[:6]
+
+
+def test_controlled_u_matches_matrix_exponential(system):
+    hhl = HHLAlgorithm(*system, num_time_qubits=3)
+    for power in (1, 2, 4):
+        expected = Operator(UnitaryGate(expm(1j * hhl.A * hhl.t * power)).control(1))
+        # Qiskit puts the control on qubit 0 of a controlled gate; the gate here is [control, *system]
+        np.testing.assert_allclose(Operator(hhl.controlled_u_gate(power)).data, expected.data, atol=1e-13)
+
+
+def test_circuit_matches_reference_construction(system):
+    hhl = HHLAlgorithm(*system, num_time_qubits=3)
+    hhl.build_circuit()
+    state = Statevector(hhl.get_quantum_only_circuit()).data
+    np.testing.assert_allclose(state, reference_state(hhl), atol=1e-13)
+
+
+def test_multiplexed_inversion_matches_controlled(system):
+    states = []
+    for inversion in ("controlled", "multiplexed"):
+        hhl = HHLAlgorithm(*system, num_time_qubits=3, inversion=inversion)
+        hhl.build_circuit()
+        states.append(Statevector(hhl.get_quantum_only_circuit()).data)
+    np.testing.assert_allclose(states[1], states[0], atol=1e-13)
+
+
+def test_unknown_inversion_raises(system):
+    with pytest.raises(ValueError, match="Unknown eigenvalue inversion"):
+        HHLAlgorithm(*system, inversion="gray")
+
+
+def test_build_circuit_is_traced(system):
+    hhl = HHLAlgorithm(*system, num_time_qubits=3, inversion="multiplexed")
+    with instrumentation.recording() as recorder:
+        hhl.build_circuit()
+    assert recorder.summary()["hhl.build_circuit"]["calls"] == 1
+    assert recorder.counters["gates_emitted"] == hhl.circuit.size()
+
+
+def test_simulate_statevector_drops_measurements(system):
+    hhl = HHLAlgorithm(*system, num_time_qubits=3)
+    state = np.asarray(hhl.simulate_statevector())
+    assert "measure" not in hhl.get_quantum_only_circuit().count_ops()
+    np.testing.assert_allclose(state, reference_state(hhl), atol=1e-13)
+
+
+def test_postselected_solution_reads_system_bits(system):
+    hhl = HHLAlgorithm(*system, num_time_qubits=3)
+    state = reference_state(hhl)
+    sol = np.zeros(hhl.system_dim)
+    for index, amplitude in enumerate(state):
+        if (index >> (hhl.num_time_qubits + hhl.num_system_qubits)) & 1:
+            sol[(index >> hhl.num_time_qubits) % hhl.system_dim] += abs(amplitude) ** 2
+    np.testing.assert_allclose(hhl.extract_postselected_solution(state), np.sqrt(sol) / np.linalg.norm(np.sqrt(sol)),
+                               atol=1e-13)
+
+
+def test_batch_circuits_match_single_builds(system):
+    A, b = system
+    vectors = [b, 2 * b, np.arange(1.0, 7.0)]
+    hhl = HHLAlgorithm(A, b, num_time_qubits=3)
+    hhl.compile_core()
+    for vector in vectors:
+        batched = hhl._compiled_state_prep(vector).compose(hhl.compiled_core).remove_final_measurements(inplace=False)
+        single = HHLAlgorithm(A, vector, num_time_qubits=3)
+        single.build_circuit()
+        np.testing.assert_allclose(Statevector(batched).data, reference_state(single), atol=1e-10)
+    # b and 2b normalize to the same state preparation
+    assert len(hhl._state_prep_cache) == 2
+
+
+def test_solve_batch_returns_one_solution_per_rhs(system):
+    A, b = system
+    solutions = HHLAlgorithm(A, b, num_time_qubits=3).solve_batch([b, 2 * b, np.arange(1.0, 7.0)], shots=2000)
+    assert len(solutions) == 3
+    assert all(len(sol) == 6 and np.isclose(np.linalg.norm(sol), 1.0) for sol in solutions)
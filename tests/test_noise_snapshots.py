@@ -0,0 +1,58 @@
+import pytest
+from qiskit_aer.noise import NoiseModel
+from qiskit_ibm_runtime.fake_provider import FakeManilaV2
+import quantum_algorithms.noise_snapshots as noise_snapshots
+
+
+@pytest.fixture
+def empty_caches(monkeypatch):
+    monkeypatch.setattr(noise_snapshots, "_BACKEND_CACHE", {})
+    monkeypatch.setattr(noise_snapshots, "_NOISE_MODEL_CACHE", {})
+
+
+def test_failed_fetch_raises(tmp_path, monkeypatch, empty_caches):
+    def unavailable():
+        raise ConnectionError("no account")
+    monkeypatch.setattr(noise_snapshots, "QiskitRuntimeService", unavailable)
+    with pytest.raises(RuntimeError, match="ibm_torino"):
+        noise_snapshots.load_backend("ibm_torino", snapshot_dir=str(tmp_path))
+
+
+def test_offline_uses_bundled_fake_backend(tmp_path, empty_caches):
+    backend = noise_snapshots.load_backend("ibm_torino", snapshot_dir=str(tmp_path), allow_network=False)
+    assert backend.name == "fake_torino"
+
+
+def test_remap_noise_model_keeps_errors():
+    noise_model = NoiseModel.from_backend(FakeManilaV2())
+    assert noise_snapshots.remap_noise_model(noise_model, list(range(5))) == noise_model
+
+    compact = noise_snapshots.remap_noise_model(noise_model, [3, 4])
+    assert compact.noise_qubits == [0, 1]
+    assert compact.basis_gates == noise_model.basis_gates
+
+
+def test_offline_fake_is_not_reused_online(tmp_path, monkeypatch, empty_caches):
+    fake_model = noise_snapshots.load_noise_model("ibm_perth", snapshot_dir=str(tmp_path), allow_network=False)
+    assert (tmp_path / "noise_ibm_perth_fake.pkl").exists()
+
+    fetched = []
+    class Service:
+        def backend(self, name):
+            fetched.append(name)
+            return FakeManilaV2()
+    monkeypatch.setattr(noise_snapshots, "QiskitRuntimeService", Service)
+    noise_model = noise_snapshots.load_noise_model("ibm_perth", snapshot_dir=str(tmp_path))
+    assert fetched == ["ibm_perth"]
+    assert noise_model is not fake_model and max(noise_model.noise_qubits) == 4
+    assert noise_snapshots.load_backend("ibm_perth", snapshot_dir=str(tmp_path)).num_qubits == 5
+
+    noise_snapshots._NOISE_MODEL_CACHE.clear()
+    assert max(noise_snapshots.load_noise_model("ibm_perth", str(tmp_path), allow_network=False).noise_qubits) == 4
+
+
+def test_offline_prefers_snapshot_once_it_exists(tmp_path, empty_caches):
+    fake = noise_snapshots.load_backend("ibm_perth", snapshot_dir=str(tmp_path), allow_network=False)
+    noise_snapshots.save_snapshot(FakeManilaV2(), str(tmp_path), "ibm_perth")
+    snapshot = noise_snapshots.load_backend("ibm_perth", snapshot_dir=str(tmp_path), allow_network=False)
+    assert fake.num_qubits == 7 and snapshot.num_qubits == 5
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.onebqf_emulator import OneBQFEmulator
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+
+
+@pytest.mark.parametrize("num_time_qubits", [1, 2])
+def test_emulator_matches_kernel_for_disjoint_pairs(hamiltonian, num_time_qubits):
+    A, b = hamiltonian(2, 3)
+    emulator = OneBQFEmulator(A, num_time_qubits=num_time_qubits)
+    assert emulator.exact
+    kernel = OneBQFKernel(OneBQF(A.toarray(), b, num_time_qubits=num_time_qubits))
+    np.testing.assert_allclose(emulator.probabilities(), kernel.probabilities()[1], atol=1e-10)
+
+
+def test_emulator_warns_when_pairs_overlap(hamiltonian):
+    A, b = hamiltonian(2, 5)
+    with pytest.warns(RuntimeWarning, match="OneBQFKernel"):
+        emulator = OneBQFEmulator(A)
+    assert not emulator.exact
+    # The exact evolution is not what the circuit does here
+    kernel = OneBQFKernel(OneBQF(A.toarray(), b))
+    assert abs(emulator.success_probability() - kernel.success_probability()) > 1e-3
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from qiskit.quantum_info import Statevector
+from quantum_algorithms.OneBQF import OneBQF
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+
+
+@pytest.mark.parametrize("n, layers, num_time_qubits", [(2, 3, 1), (2, 5, 1), (2, 5, 2), (4, 3, 1)])
+def test_kernel_matches_circuit_statevector(hamiltonian, n, layers, num_time_qubits):
+    A, b = hamiltonian(n, layers)
+    onebqf = OneBQF(A.toarray(), b, num_time_qubits=num_time_qubits)
+    circuit = onebqf.build_circuit()
+    circuit.remove_final_measurements()
+
+    expected = Statevector(circuit).data
+    np.testing.assert_allclose(OneBQFKernel(onebqf).statevector(), expected, atol=1e-12)
+
+
+def test_kernel_keeps_order_of_overlapping_pairs():
+    # A path 0-1-2: the two rotations share index 1 and must be applied in circuit order
+    A = 3 * np.identity(4)
+    A[0, 1] = A[1, 0] = A[1, 2] = A[2, 1] = -1
+    onebqf = OneBQF(A, np.ones(4))
+    assert [len(rows) for rows, _ in OneBQFKernel(onebqf).layers] == [1, 1]
+
+    circuit = onebqf.build_circuit()
+    circuit.remove_final_measurements()
+    np.testing.assert_allclose(OneBQFKernel(onebqf).statevector(), Statevector(circuit).data, atol=1e-12)
+
+
+def test_sample_counts_format():
+    A = 3 * np.identity(4)
+    A[0, 1] = A[1, 0] = -1
+    onebqf = OneBQF(A, np.ones(4))
+    counts = OneBQFKernel(onebqf).sample_counts(1000, seed=1)
+    assert sum(counts.values()) == 1000
+    assert all(len(key) == onebqf.num_system_qubits + 1 for key in counts)
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+from quantum_algorithms.onebqf_kernel import OneBQFKernel
+from quantum_algorithms.problem_reduction import ReducedProblem
+
+
+@pytest.mark.parametrize("n, layers, num_time_qubits", [(2, 3, 1), (4, 5, 1), (4, 5, 2), (8, 3, 1)])
+def test_reduced_solution_matches_unreduced_circuit(hamiltonian, n, layers, num_time_qubits):
+    A, b = hamiltonian(n, layers)
+    reduction = ReducedProblem(A, b, num_time_qubits=num_time_qubits)
+    assert reduction.reduced_dim < A.shape[0]
+
+    solution, success_probability = reduction.solution_from_probabilities()
+    expected, expected_probability = OneBQFKernel.from_matrix(A, num_time_qubits).get_solution()
+    np.testing.assert_allclose(solution, expected, atol=1e-14)
+    assert success_probability == pytest.approx(expected_probability, abs=1e-14)
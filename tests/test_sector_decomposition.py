@@ -0,0 +1,33 @@
+import numpy as np
+from quantum_algorithms.sector_decomposition import Sector, segment_offsets, stitch
+
+
+def full_sector(event, index):
+    return Sector(index, [np.arange(len(module.hits)) for module in event.modules])
+
+
+def test_max_ignores_sectors_where_the_segment_is_inactive(event):
+    ev = event(2, 3)
+    n_segments = segment_offsets(ev)[-1]
+    sectors = [full_sector(ev, (0, 0)), full_sector(ev, (1, 0))]
+    # Segment 0 sits at the first sector's minimum (inactive, activation 0.9) and is active at 0.5 in the second
+    first = np.full(n_segments, 0.9)
+    first[1] = 1.0
+    second = np.zeros(n_segments)
+    second[:2] = [0.5, 1.0]
+
+    stitched = stitch(ev, sectors, [first, second], policy="max")
+    assert stitched[0] == 0.5 and stitched[1] == 1.0
+    assert not np.any(stitched[2:])
+
+
+def test_agreement_requires_every_covering_sector(event):
+    ev = event(2, 3)
+    n_segments = segment_offsets(ev)[-1]
+    sectors = [full_sector(ev, (0, 0)), full_sector(ev, (1, 0))]
+    first, second = np.zeros(n_segments), np.zeros(n_segments)
+    first[:2] = 1.0
+    second[1:3] = [0.5, 1.0]
+
+    stitched = stitch(ev, sectors, [first, second], policy="agreement")
+    assert stitched[1] == 0.75 and not np.any(np.delete(stitched, 1))
@@ -0,0 +1,55 @@
+import numpy as np
+from quantum_algorithms.sweep import DEFAULT_CONFIG, make_generator, task_seed
+from toy_model.simple_hamiltonian import PointingFilter, SimpleHamiltonian
+
+PARAMS = {"epsilon": 1e-7, "alpha": 2.0, "beta": 1.0}
+
+
+def filtered_event(n, layers, **options):
+    generator = make_generator(n, layers, DEFAULT_CONFIG, task_seed(DEFAULT_CONFIG, n, layers))
+    event = generator.generate_complete_events()
+    return event, PointingFilter.from_generator(generator, **options)
+
+
+def test_off_pointing_and_out_of_window_pairs_are_rejected():
+    segment_filter = PointingFilter(np.zeros((1, 3)), max_distance=0.5, tx_range=(-0.15, 0.15))
+    from_xyz = np.array([[1.0, 0.0, 10.0], [2.0, 0.0, 10.0]])
+    to_xyz = np.array([[2.0, 0.0, 20.0], [3.0, 0.0, 20.0], [4.0, 0.0, 20.0]])
+    # (1,0,10)->(2,0,20) points at the vertex, ->(3,0,20) misses it by 1; (2,0,10)->(4,0,20) points
+    # at it but its slope 0.2 is outside the window, and without the window it is kept
+    np.testing.assert_array_equal(segment_filter.mask(from_xyz, to_xyz), [[True, False, False],
+                                                                          [False, False, False]])
+    segment_filter.tx_range = (-np.inf, np.inf)
+    assert segment_filter.mask(from_xyz, to_xyz)[1, 2]
+
+
+def test_true_segments_survive_and_report_adds_up():
+    event, segment_filter = filtered_event(32, 5, max_distance=0.5, angle_tolerance=0.01)
+    hamiltonian = SimpleHamiltonian(**PARAMS, segment_filter=segment_filter)
+    hamiltonian.construct_segments(event)
+    report = hamiltonian.filter_report
+
+    kept = {(id(s.hits[0]), id(s.hits[1])) for s in hamiltonian.segments}
+    n_true = 0
+    for from_module, to_module in zip(event.modules[:-1], event.modules[1:]):
+        for from_hit in from_module.hits:
+            for to_hit in to_module.hits:
+                if from_hit.track_id >= 0 and from_hit.track_id == to_hit.track_id:
+                    n_true += 1
+                    assert (id(from_hit), id(to_hit)) in kept
+    sizes = [len(module.hits) for module in event.modules]
+    assert report["candidates"] == sum(a * b for a, b in zip(sizes[:-1], sizes[1:]))
+    assert report["removed"] == report["candidates"] - hamiltonian.n_segments > 0
+    assert report["true_candidates"] == n_true and report["true_lost"] == 0
+
+
+def test_filtered_matrix_is_the_restriction_of_the_full_one():
+    event, segment_filter = filtered_event(8, 5, max_distance=0.5, angle_tolerance=0.01)
+    full = SimpleHamiltonian(**PARAMS)
+    A_full, _ = full.construct_hamiltonian(event)
+    filtered = SimpleHamiltonian(**PARAMS, segment_filter=segment_filter)
+    A_filtered, _ = filtered.construct_hamiltonian(event)
+
+    position = {(id(s.hits[0]), id(s.hits[1])): s.segment_id for s in full.segments}
+    kept = [position[(id(s.hits[0]), id(s.hits[1]))] for s in filtered.segments]
+    np.testing.assert_array_equal(A_filtered.toarray(), A_full.toarray()[np.ix_(kept, kept)])
@@ -0,0 +1,56 @@
+import json
+import os
+import numpy as np
+import pytest
+from quantum_algorithms.sweep import DEFAULT_CONFIG, config_hash, merge_config, run_sweep, run_success_counts
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def test_default_assembly_matches_simple(hamiltonian):
+    A, b = hamiltonian(4, 5)
+    A_simple, b_simple = hamiltonian(4, 5, assembly={"method": "simple"})
+    assert (A != A_simple).nnz == 0
+    np.testing.assert_array_equal(b, b_simple)
+
+
+@pytest.mark.parametrize("n, layers", [(2, 3), (2, 5), (4, 5)])
+def test_default_success_rate_matches_paper_data(n, layers):
+    with open(os.path.join(DATA_DIR, "success_counts.json")) as f:
+        recorded = [entry["measurement_stats"]["success_rate"] for entry in json.load(f)
+                    if (entry["problem_size"]["n_particles"], entry["problem_size"]["layers"]) == (n, layers)]
+    result = run_success_counts({"n_particles": n, "layers": layers, "run_index": 0}, DEFAULT_CONFIG)
+    assert abs(result["measurement_stats"]["success_rate"] - np.mean(recorded)) < 1e-3
+
+
+def test_emulator_rejected_when_pairs_overlap():
+    config = merge_config(DEFAULT_CONFIG, {"success_counts": {"simulator": "emulator"}})
+    run_success_counts({"n_particles": 2, "layers": 3, "run_index": 0}, config)
+    with pytest.raises(ValueError, match="overlap"):
+        run_success_counts({"n_particles": 2, "layers": 5, "run_index": 0}, config)
+
+
+def test_sweep_resumes_from_checkpoints(tmp_path):
+    config = merge_config(DEFAULT_CONFIG, {
+        "particles": [2], "layers": [3], "repeats": 2, "tasks": ["success_counts"],
+        "checkpoint_dir": str(tmp_path / "checkpoints"), "output_dir": str(tmp_path / "data")})
+    first = run_sweep(config, workers=1)["success_counts.json"]
+    os.remove(next((tmp_path / "checkpoints").glob("success_counts_n2_L3_r1_*.json")))
+    second = run_sweep(config, workers=1)["success_counts.json"]
+    assert [entry["run_index"] for entry in second] == [0, 1]
+    assert first == second
+
+
+def test_config_change_invalidates_checkpoints(tmp_path):
+    config = merge_config(DEFAULT_CONFIG, {
+        "particles": [2], "layers": [3], "repeats": 1, "tasks": ["success_counts"],
+        "checkpoint_dir": str(tmp_path / "checkpoints"), "output_dir": str(tmp_path / "data")})
+    run_sweep(config, workers=1)
+    changed = merge_config(config, {"success_counts": {"shots": 1000}})
+    assert config_hash(changed, "success_counts") != config_hash(config, "success_counts")
+    assert config_hash(merge_config(config, {"assembly": {"workers": 8}}), "success_counts") \
+        == config_hash(config, "success_counts")
+
+    entries = run_sweep(changed, workers=1)["success_counts.json"]
+    assert [entry["measurement_stats"]["total_shots"] for entry in entries] == [1000]
+    assert len(os.listdir(tmp_path / "checkpoints")) == 2
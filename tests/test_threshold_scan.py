@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from toy_model.threshold_scan import roc_curve
+from toy_model.utils import solution_statistics
+
+
+def brute_force(values, labels, threshold):
+    predicted = values > threshold
+    return int(np.sum(predicted & labels)), int(np.sum(predicted & ~labels))
+
+
+@pytest.fixture
+def scores():
+    rng = np.random.default_rng(1)
+    # Rounded to two decimals so that many values tie, across both classes
+    values = np.round(rng.random(500), 2)
+    labels = rng.random(500) < values
+    return values, labels
+
+
+def test_curve_matches_brute_force_at_every_threshold(scores):
+    values, labels = scores
+    curve = roc_curve(values, labels)
+    assert len(curve.thresholds) == len(np.unique(values)) + 1
+    for threshold, tp, fp in zip(curve.thresholds, curve.tp, curve.fp):
+        assert (tp, fp) == brute_force(values, labels, threshold)
+
+
+def test_at_matches_brute_force_between_ties_and_beyond_the_range(scores):
+    values, labels = scores
+    curve = roc_curve(values, labels)
+    thresholds = [-1.0, 0.0, 0.25, 0.255, 0.5, values.max() - 1e-9, values.max(), 2.0]
+    for point, threshold in zip(curve.at(thresholds), thresholds):
+        assert point["threshold"] == threshold
+        assert (point["tp"], point["fp"]) == brute_force(values, labels, threshold)
+        assert point["tpr"] == brute_force(values, labels, threshold)[0] / labels.sum()
+
+
+def test_best_maximizes_the_brute_force_score(scores):
+    values, labels = scores
+    curve = roc_curve(values, labels)
+    candidates = np.r_[np.unique(values), -np.inf]
+    for criterion in ("youden", "f1", "accuracy"):
+        def score(threshold):
+            tp, fp = brute_force(values, labels, threshold)
+            fn, tn = labels.sum() - tp, (~labels).sum() - fp
+            return {"youden": tp / labels.sum() - fp / (~labels).sum(), "f1": 2 * tp / (2 * tp + fp + fn),
+                    "accuracy": (tp + tn) / len(values)}[criterion]
+        assert score(curve.best(criterion)["threshold"]) == pytest.approx(max(score(t) for t in candidates))
+    with pytest.raises(ValueError, match="Unknown criterion"):
+        curve.best("recall")
+
+
+def test_pooled_events_and_auc():
+    curve = roc_curve([np.array([0.9, 0.1]), np.array([0.8, 0.2, 0.2])],
+                      [np.array([True, False]), np.array([True, False, True])])
+    assert (curve.n_positive, curve.n_negative) == (3, 2)
+    # The tied 0.2 pair counts half
+    assert curve.auc() == pytest.approx(5.5 / 6)
+    assert roc_curve(np.array([1.0, 0.0]), np.array([True, False])).auc() == 1.0
+
+
+def test_solution_statistics_reads_the_curve(capsys):
+    solution_statistics(np.array([0.9, 0.8, 0.3, 0.1]), np.array([1, 1, 0, 0]), 0.5)
+    out = capsys.readouterr().out
+    assert "Elements above threshold: 2" in out and "TPR: 1.0000, FPR: 0.0000" in out
+
+    solution_statistics(np.array([0.9, 0.8, 0.3, 0.1]), np.array([1, 1, 0, 0]))
+    assert "Threshold: 0.3 (best tpr - fpr)" in capsys.readouterr().out
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from toy_model.track_metrics import evaluate, segments_to_arrays
+
+
+def reco_arrays(tracks):
+    """(track, hit) index arrays of a list of hit lists."""
+    track_index = np.array([i for i, hits in enumerate(tracks) for _ in hits], dtype=np.int64)
+    hit_index = np.array([hit for hits in tracks for hit in hits], dtype=np.int64)
+    return track_index, hit_index
+
+
+# Tracks 0 and 1 have three hits, track 2 only two (not reconstructible); hit 6 is a ghost hit
+TRUTH = np.array([0, 0, 0, 1, 1, 1, -1, 2, 2])
+RECO = [
+    [0, 1, 2],      # track 0, purity 1
+    [0, 1, 6],      # purity 2/3 < 0.7: ghost
+    [3, 4, 5, 6],   # track 1, purity 3/4
+    [3, 4],         # track 1 again: clone
+    [6, 7],         # purity 1/2: ghost
+]
+
+
+def test_efficiency_ghosts_clones_and_purity():
+    metrics = evaluate([TRUTH], [reco_arrays(RECO)])
+    assert (metrics["n_reconstructed"], metrics["n_matched"], metrics["n_ghosts"]) == (5, 3, 2)
+    assert (metrics["n_true"], metrics["n_reconstructible"], metrics["n_found"], metrics["n_clones"]) == (3, 2, 2, 1)
+    assert metrics["efficiency"] == 1.0
+    assert metrics["ghost_rate"] == pytest.approx(2 / 5)
+    assert metrics["clone_rate"] == pytest.approx(1 / 3)
+    assert metrics["hit_purity"] == pytest.approx((1 + 3 / 4 + 1) / 3)
+    assert metrics["hit_efficiency"] == pytest.approx((1 + 1 + 2 / 3) / 3)
+
+
+def test_events_are_kept_apart():
+    # The second event's true track is never reconstructed; its hit ids must not match the first event's
+    metrics = evaluate([TRUTH, np.array([0, 0, 0])], [reco_arrays(RECO), reco_arrays([])])
+    np.testing.assert_allclose(metrics["per_event"]["efficiency"], [1.0, 0.0])
+    np.testing.assert_array_equal(metrics["per_event"]["n_reconstructible"], [2, 1])
+    assert metrics["efficiency"] == pytest.approx(2 / 3)
+
+
+def test_event_without_true_tracks():
+    metrics = evaluate([np.array([-1, -1, -1])], [reco_arrays([[0, 1]])])
+    assert (metrics["n_true"], metrics["n_ghosts"]) == (0, 1)
+    assert metrics["ghost_rate"] == 1.0 and metrics["efficiency"] == 0.0 and metrics["hit_efficiency"] == 0.0
+
+
+def test_segments_join_into_tracks():
+    track_index, hit_index = segments_to_arrays(6, [0, 1, 3, 4], [1, 2, 4, 5], [True, True, True, False])
+    np.testing.assert_array_equal(hit_index, [0, 1, 2, 3, 4])
+    np.testing.assert_array_equal(track_index, [0, 0, 0, 1, 1])
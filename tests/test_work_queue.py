@@ -0,0 +1,120 @@
+import json
+import time
+import pytest
+from quantum_algorithms import sweep
+from quantum_algorithms.work_queue import DirectoryWorkQueue, open_queue, run_worker, run_workers
+
+TASKS = [{"kind": "success_counts", "n_particles": n, "layers": 3, "run_index": 0} for n in (2, 4)]
+
+
+@pytest.fixture(params=["directory", "sqlite"])
+def queue_path(request, tmp_path):
+    path = str(tmp_path / ("queue" if request.param == "directory" else "queue.db"))
+    open_queue(path).initialize({"name": "test"}, TASKS)
+    return path
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    """Replaces the success_counts runner; `calls` records the keys it ran."""
+    calls = []
+    def run(task, config):
+        calls.append(sweep.task_key(task))
+        if task["n_particles"] in run.failing: raise RuntimeError("boom")
+        return {"n": task["n_particles"]}
+    run.failing, run.calls = set(), calls
+    monkeypatch.setitem(sweep.TASK_RUNNERS, "success_counts", run)
+    return run
+
+
+def test_worker_completes_all_tasks(queue_path, runner):
+    assert run_worker(queue_path, heartbeat_interval=0.05) == 2
+    queue = open_queue(queue_path)
+    assert [entry["result"] for entry in queue.results()] == [{"n": 2}, {"n": 4}]
+    assert queue.status()["done"] == 2 and queue.status()["pending"] == 0
+
+
+def test_failing_task_stops_after_max_attempts(queue_path, runner):
+    runner.failing.add(2)
+    assert run_worker(queue_path, heartbeat_interval=0.05, max_attempts=2) == 1
+    assert runner.calls.count("success_counts_n2_L3_r0") == 2
+    status = open_queue(queue_path).status()
+    assert status["failed"] == 1 and status["done"] == 1 and status["pending"] == 0
+
+
+def test_worker_waits_for_and_reclaims_expired_lease(queue_path, runner):
+    queue = open_queue(queue_path)
+    crashed = queue.claim("crashed-worker", lease_seconds=0.3)
+    assert crashed is not None
+    started = time.time()
+    assert run_worker(queue_path, heartbeat_interval=0.05) == 2
+    assert time.time() - started >= 0.3
+    assert queue.status()["done"] == 2
+
+
+def test_expired_lease_counts_as_attempt(queue_path, runner):
+    queue = open_queue(queue_path, max_attempts=1)
+    queue.claim("crashed-worker", lease_seconds=0)
+    time.sleep(0.01)
+    assert sweep.task_key(queue.claim("other", lease_seconds=60)) == "success_counts_n4_L3_r0"
+    assert queue.status()["failed"] == 1
+
+
+def test_heartbeat_does_not_overwrite_reclaimed_lease(tmp_path):
+    queue = DirectoryWorkQueue(str(tmp_path / "queue"))
+    queue.initialize({}, TASKS[:1])
+    key = sweep.task_key(TASKS[0])
+    assert queue.claim("a", lease_seconds=0) is not None
+    time.sleep(0.01)
+    assert queue.claim("b", lease_seconds=60) is not None
+
+    assert not queue.heartbeat(key, "a", lease_seconds=60)
+    with open(queue._path("leases", key)) as f:
+        assert json.load(f)["worker"] == "b"
+    assert queue.heartbeat(key, "b", lease_seconds=60)
+
+
+def test_complete_is_rejected_after_lease_is_reclaimed(queue_path, runner):
+    queue = open_queue(queue_path)
+    key = sweep.task_key(queue.claim("a", lease_seconds=0))
+    time.sleep(0.01)
+    assert sweep.task_key(queue.claim("b", lease_seconds=60)) == key
+
+    assert not queue.complete(key, "a", {"worker": "a"})
+    assert queue.complete(key, "b", {"worker": "b"})
+    assert [entry["result"] for entry in queue.results()] == [{"worker": "b"}]
+
+
+@pytest.mark.parametrize("name", ["queue", "queue.db"])
+def test_worker_drops_result_of_task_reclaimed_while_running(tmp_path, monkeypatch, name):
+    queue_path = str(tmp_path / name)
+    queue = open_queue(queue_path)
+    queue.initialize({}, TASKS[:1])
+    def run(task, config):
+        # The lease expires before the first heartbeat and another worker takes the task over
+        time.sleep(0.2)
+        key = sweep.task_key(task)
+        if sweep.task_key(queue.claim("thief", lease_seconds=60)) == key:
+            assert queue.complete(key, "thief", {"worker": "thief"})
+        return {"worker": "slow"}
+    monkeypatch.setitem(sweep.TASK_RUNNERS, "success_counts", run)
+
+    assert run_worker(queue_path, worker_id="slow", lease_seconds=0.1, heartbeat_interval=10, poll_interval=0.05,
+                      max_tasks=1) == 0
+    assert [entry["result"] for entry in queue.results()] == [{"worker": "thief"}]
+
+
+def test_run_workers_executes_each_task_once(queue_path, tmp_path, monkeypatch):
+    log = tmp_path / "calls.log"
+    def run(task, config):
+        with open(log, "a") as f:
+            f.write(sweep.task_key(task) + "\n")
+        time.sleep(0.1)
+        return {"n": task["n_particles"]}
+    monkeypatch.setitem(sweep.TASK_RUNNERS, "success_counts", run)
+
+    run_workers(queue_path, 3, heartbeat_interval=0.05)
+    queue = open_queue(queue_path)
+    assert [entry["result"] for entry in queue.results()] == [{"n": 2}, {"n": 4}]
+    assert queue.status()["done"] == 2
+    assert sorted(log.read_text().split()) == ["success_counts_n2_L3_r0", "success_counts_n4_L3_r0"]
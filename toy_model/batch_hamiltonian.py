@@ -0,0 +1,156 @@
+"""
+Batched, vectorized construction of SimpleHamiltonian systems for many events.
+
+For every event, segments are indexed in the order of `SimpleHamiltonian.construct_segments`:
+layer pair l holds n_l x n_{l+1} segments, segment (a, b) at offset_l + a n_{l+1} + b. Two
+segments couple when they share the middle hit b of three consecutive modules, so all
+couplings of layers (l, l+1, l+2) follow from one (a, b, c) cosine tensor, evaluated in
+chunks of middle hits to bound memory. Events are stacked into one block-diagonal CSR
+matrix with per-event offsets, solved together and split back out.
+
+Usage:
+    batch = BatchHamiltonian(epsilon=1e-7, alpha=2.0, beta=1.0)
+    A, b = batch.construct_hamiltonian(events)
+    solutions = batch.solve()                  # one array per event, aligned with SimpleHamiltonian.segments
+"""
+import numpy as np
+import scipy as sci
+import scipy.sparse as sp
+from scipy.special import erf
+import toy_model.instrumentation as instrumentation
+
+DEFAULT_CHUNK_ELEMENTS = 2 ** 22
+
+
+def module_hit_arrays(event):
+    """(n_hits, 3) coordinate array per module, in `module.hits` order."""
+    return [np.array([(hit.x, hit.y, hit.z) for hit in module.hits], dtype=float).reshape(-1, 3)
+            for module in event.modules]
+
+
+def segment_offsets(hit_arrays):
+    """Start of each layer pair's segments; the last entry is the number of segments."""
+    sizes = [len(hits) for hits in hit_arrays]
+    return np.concatenate([[0], np.cumsum([a * b for a, b in zip(sizes[:-1], sizes[1:])])]).astype(np.int64)
+
+
+def _directions(from_hits, to_hits):
+    """Segment vectors (n_from, n_to, 3) and their norms, as in Segment.to_vect / Segment.__mul__."""
+    vectors = to_hits[None, :, :] - from_hits[:, None, :]
+    norms = (vectors[..., 0] ** 2 + vectors[..., 1] ** 2 + vectors[..., 2] ** 2) ** 0.5
+    return vectors, norms
+
+
+def layer_couplings(left, middle, right, epsilon, convolution=False, theta_d=1e-4, middle_range=None):
+    """
+    Couplings between segments (a -> b) of layer pair (left, middle) and (b -> c) of
+    (middle, right), for middle hits b in `middle_range`. Returns local (a, b, c) index
+    arrays and the coupling values: 1 where |cos - 1| < epsilon, or the erf-convolved step.
+    """
+    start, stop = middle_range if middle_range is not None else (0, len(middle))
+    middle = middle[start:stop]
+    v1, n1 = _directions(left, middle)       # (a, b)
+    v2, n2 = _directions(middle, right)      # (b, c)
+    dot = (v1[:, :, None, 0] * v2[None, :, :, 0] + v1[:, :, None, 1] * v2[None, :, :, 1]
+           + v1[:, :, None, 2] * v2[None, :, :, 2])
+    cosine = dot / (n1[:, :, None] * n2[None, :, :])
+    if convolution:
+        values = 1 + erf((epsilon - np.abs(np.arccos(cosine))) / (theta_d * np.sqrt(2)))
+        a, b, c = np.nonzero(values)
+        values = values[a, b, c]
+    else:
+        a, b, c = np.nonzero(np.abs(cosine - 1) < epsilon)
+        values = np.ones(len(a))
+    return a, b + start, c, values
+
+
+def event_triplets(hit_arrays, epsilon, convolution=False, theta_d=1e-4, chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """Off-diagonal COO (rows, cols, values) of one event's coupling matrix C, both triangles."""
+    offsets = segment_offsets(hit_arrays)
+    rows, cols, values = [], [], []
+    for layer in range(len(hit_arrays) - 2):
+        left, middle, right = hit_arrays[layer:layer + 3]
+        if len(left) == 0 or len(middle) == 0 or len(right) == 0: continue
+        step = max(1, chunk_elements // (len(left) * len(right)))
+        for start in range(0, len(middle), step):
+            a, b, c, v = layer_couplings(left, middle, right, epsilon, convolution, theta_d,
+                                         (start, min(start + step, len(middle))))
+            seg_i = offsets[layer] + a * len(middle) + b
+            seg_j = offsets[layer + 1] + b * len(right) + c
+            rows += [seg_i, seg_j]
+            cols += [seg_j, seg_i]
+            values += [v, v]
+    if not rows: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+class BatchHamiltonian:
+
+    def __init__(self, epsilon, alpha, beta, theta_d=1e-4, convolution=False, chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+        self.epsilon = epsilon
+        self.gamma = alpha
+        self.delta = beta
+        self.theta_d = theta_d
+        self.convolution = convolution
+        self.chunk_elements = chunk_elements
+        self.A = None
+        self.b = None
+        self.offsets = None
+
+    @instrumentation.traced("hamiltonian.batch_assemble")
+    def construct_hamiltonian(self, events):
+        """
+        Block-diagonal A and stacked b for a list or stream of events; event k owns rows
+        offsets[k]:offsets[k + 1]. Each block equals SimpleHamiltonian(...).construct_hamiltonian(event).
+        """
+        rows, cols, values, offsets = [], [], [], [0]
+        for event in events:
+            hit_arrays = module_hit_arrays(event)
+            r, c, v = event_triplets(hit_arrays, self.epsilon, self.convolution, self.theta_d, self.chunk_elements)
+            rows.append(r + offsets[-1])
+            cols.append(c + offsets[-1])
+            values.append(v)
+            offsets.append(offsets[-1] + int(segment_offsets(hit_arrays)[-1]))
+
+        n = offsets[-1]
+        coupling = sp.coo_matrix((np.concatenate(values) if values else np.zeros(0),
+                                  (np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64),
+                                   np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64))),
+                                 shape=(n, n)).tocsr()
+        self.A = (sp.identity(n, format="csr") * (self.delta + self.gamma) - coupling).tocsr()
+        self.b = np.ones(n) * self.delta
+        self.offsets = np.array(offsets, dtype=np.int64)
+        instrumentation.count("segments_built", n)
+        instrumentation.count("hamiltonian_nnz", self.A.nnz)
+        return self.A, self.b
+
+    @property
+    def n_events(self):
+        return 0 if self.offsets is None else len(self.offsets) - 1
+
+    def split(self, vector):
+        """Splits a stacked vector into one array per event."""
+        return np.split(np.asarray(vector), self.offsets[1:-1])
+
+    def block(self, k):
+        """A and b of event k."""
+        start, stop = self.offsets[k], self.offsets[k + 1]
+        return self.A[start:stop, start:stop], self.b[start:stop]
+
+    @instrumentation.traced("hamiltonian.batch_solve")
+    def solve(self, method="direct"):
+        """
+        Solves all events at once and returns one solution per event. "direct" factorizes the
+        block-diagonal matrix; "cg" runs conjugate gradients as SimpleHamiltonian.solve_classicaly,
+        with the tolerance relative to the whole batch.
+        """
+        if self.A is None:
+            raise Exception("Not initialised")
+        if self.A.shape[0] == 0: return [np.zeros(0) for _ in range(self.n_events)]
+        if method == "direct":
+            solution = sci.sparse.linalg.spsolve(self.A.tocsc(), self.b)
+        elif method == "cg":
+            solution, _ = sci.sparse.linalg.cg(self.A, self.b, atol=0)
+        else:
+            raise ValueError(f"Unknown solve method '{method}', expected 'direct' or 'cg'.")
+        return self.split(solution)
@@ -0,0 +1,148 @@
+"""
+Chunked, multi-core, out-of-core assembly of the SimpleHamiltonian matrix for very large events.
+
+The segment-pair space of each layer triple (l, l+1, l+2) is tiled into chunks of middle hits
+(at most `chunk_elements` hit triples each, see `batch_hamiltonian.layer_couplings`). Chunks are
+processed on a process pool; each worker streams its upper-triangle COO triplets into a
+memory-mapped .npy shard and returns only the shard path. The shards are then merged into a
+CSR matrix with a two-pass counting sort that reads them back in blocks, so at no point are
+all triplets held in RAM: pass one counts the entries per row, pass two scatters column
+indices and values into their row slots.
+
+Usage:
+    A, b = assemble_hamiltonian(event, epsilon=1e-7, alpha=2.0, beta=1.0, workers=64)
+
+The result equals `SimpleHamiltonian.construct_hamiltonian(event)` (as CSR, with the same
+segment order) without creating Segment objects.
+"""
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+import toy_model.instrumentation as instrumentation
+from toy_model.batch_hamiltonian import DEFAULT_CHUNK_ELEMENTS, layer_couplings, module_hit_arrays, segment_offsets
+
+TRIPLET_DTYPE = np.dtype([("row", "<i8"), ("col", "<i8"), ("value", "<f8")])
+
+_worker_state = {}
+
+
+def _init_worker(hit_arrays, epsilon, convolution, theta_d):
+    _worker_state.update(hit_arrays=hit_arrays, epsilon=epsilon, convolution=convolution, theta_d=theta_d)
+
+
+def chunk_tasks(hit_arrays, chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """(layer, start, stop) middle-hit ranges covering every layer triple."""
+    tasks = []
+    for layer in range(len(hit_arrays) - 2):
+        n_left, n_middle, n_right = (len(hits) for hits in hit_arrays[layer:layer + 3])
+        if n_left == 0 or n_middle == 0 or n_right == 0: continue
+        step = max(1, chunk_elements // (n_left * n_right))
+        tasks += [(layer, start, min(start + step, n_middle)) for start in range(0, n_middle, step)]
+    return tasks
+
+
+def _write_shard(task, shard_path):
+    """Computes one chunk and writes its triplets (seg_i < seg_j only) to `shard_path`."""
+    layer, start, stop = task
+    hit_arrays = _worker_state["hit_arrays"]
+    left, middle, right = hit_arrays[layer:layer + 3]
+    offsets = segment_offsets(hit_arrays)
+    a, b, c, values = layer_couplings(left, middle, right, _worker_state["epsilon"], _worker_state["convolution"],
+                                      _worker_state["theta_d"], (start, stop))
+    if len(a) == 0: return None, 0
+    shard = np.lib.format.open_memmap(shard_path, mode="w+", dtype=TRIPLET_DTYPE, shape=(len(a),))
+    shard["row"] = offsets[layer] + a * len(middle) + b
+    shard["col"] = offsets[layer + 1] + b * len(right) + c
+    shard["value"] = values
+    shard.flush()
+    del shard
+    return shard_path, len(a)
+
+
+def _write_shard_task(args):
+    return _write_shard(*args)
+
+
+def _blocks(shard_paths, block_size):
+    for path in shard_paths:
+        shard = np.load(path, mmap_mode="r")
+        for start in range(0, len(shard), block_size):
+            yield np.array(shard[start:start + block_size])
+        del shard
+
+
+def merge_shards(shard_paths, n, diagonal_value, block_size=DEFAULT_CHUNK_ELEMENTS):
+    """
+    CSR of diagonal_value * I - C from upper-triangle shards of C, reading `block_size` triplets
+    at a time. Each triplet is stored in both (row, col) and (col, row).
+    """
+    counts = np.ones(n, dtype=np.int64)  # the diagonal
+    for block in _blocks(shard_paths, block_size):
+        counts += np.bincount(block["row"], minlength=n) + np.bincount(block["col"], minlength=n)
+
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    index_dtype = np.int32 if indptr[-1] < 2 ** 31 and n < 2 ** 31 else np.int64
+    indices = np.empty(indptr[-1], dtype=index_dtype)
+    data = np.empty(indptr[-1], dtype=float)
+    indices[indptr[:-1]] = np.arange(n)
+    data[indptr[:-1]] = diagonal_value
+    cursor = indptr[:-1] + 1
+
+    for block in _blocks(shard_paths, block_size):
+        rows = np.concatenate([block["row"], block["col"]])
+        cols = np.concatenate([block["col"], block["row"]])
+        values = np.concatenate([block["value"], block["value"]])
+        order = np.argsort(rows, kind="stable")
+        rows, cols, values = rows[order], cols[order], values[order]
+        first = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        run_lengths = np.diff(np.r_[first, len(rows)])
+        rank = np.arange(len(rows)) - np.repeat(first, run_lengths)
+        positions = cursor[rows] + rank
+        indices[positions] = cols
+        data[positions] = -values
+        cursor[rows[first]] += run_lengths
+
+    A = sp.csr_matrix((data, indices, indptr), shape=(n, n))
+    A.sort_indices()
+    return A
+
+
+@instrumentation.traced("hamiltonian.chunked_assemble")
+def assemble_hamiltonian(event, epsilon, alpha, beta, theta_d=1e-4, convolution=False, workers=None,
+                         chunk_elements=DEFAULT_CHUNK_ELEMENTS, shard_dir=None):
+    """
+    A (CSR) and b of `SimpleHamiltonian.construct_hamiltonian(event)`, assembled in chunks on
+    `workers` processes (None: all cores, 1: in this process). Shards go to `shard_dir`
+    (a temporary directory by default) and are deleted after the merge.
+    """
+    hit_arrays = module_hit_arrays(event)
+    n = int(segment_offsets(hit_arrays)[-1])
+    tasks = chunk_tasks(hit_arrays, chunk_elements)
+    own_dir = shard_dir is None
+    shard_dir = tempfile.mkdtemp(prefix="onebqf-shards-") if own_dir else shard_dir
+    os.makedirs(shard_dir, exist_ok=True)
+    jobs = [(task, os.path.join(shard_dir, f"shard_{i:06d}.npy")) for i, task in enumerate(tasks)]
+
+    try:
+        with instrumentation.span("hamiltonian.chunks", chunks=len(tasks)):
+            if workers == 1:
+                _init_worker(hit_arrays, epsilon, convolution, theta_d)
+                written = [_write_shard_task(job) for job in jobs]
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(hit_arrays, epsilon, convolution, theta_d)) as executor:
+                    written = list(executor.map(_write_shard_task, jobs, chunksize=max(1, len(jobs) // 256)))
+        shard_paths = [path for path, count in written if count]
+        with instrumentation.span("hamiltonian.merge", shards=len(shard_paths)):
+            A = merge_shards(shard_paths, n, alpha + beta, chunk_elements)
+    finally:
+        for _, path in jobs:
+            if os.path.exists(path): os.remove(path)
+        if own_dir: shutil.rmtree(shard_dir, ignore_errors=True)
+
+    instrumentation.count("segments_built", n)
+    instrumentation.count("hamiltonian_nnz", A.nnz)
+    return A, np.ones(n) * beta
@@ -0,0 +1,194 @@
+"""
+Lightweight spans and counters for profiling runs of the toy model and the quantum algorithms.
+
+Instrumentation is off by default. While it is off, `span` returns a shared no-op context
+manager, `count` returns immediately and `traced` functions call straight through, so
+instrumented code pays one global lookup per call. Enable it around a run and export:
+
+    from toy_model import instrumentation
+
+    with instrumentation.recording() as recorder:
+        ...
+    recorder.export_json("profile.json")            # spans, counters and per-stage summary
+    recorder.export_chrome_trace("profile.trace.json")  # chrome://tracing or ui.perfetto.dev
+
+Setting ONEBQF_TRACE=<path> enables recording for the whole process and exports at exit;
+paths ending in ".trace.json" get the Chrome format, and "{pid}" in the path is replaced by
+the process id so that worker processes do not overwrite each other.
+"""
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+
+_recorder = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "attrs", "start")
+
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder._add_span(self.name, self.start, time.perf_counter_ns() - self.start, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """Attaches attributes that are only known inside the span, e.g. output sizes."""
+        self.attrs.update(attrs)
+
+
+class Recorder:
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+        self.counter_events = []
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _add_span(self, name, start, duration, attrs):
+        with self._lock:
+            self.spans.append((name, start, duration, threading.get_ident(), attrs))
+
+    def _count(self, name, value):
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.counter_events.append((name, time.perf_counter_ns(), total))
+
+    def summary(self):
+        """Per span name: number of calls and total, mean and max duration in seconds."""
+        stages = {}
+        for name, _, duration, _, _ in self.spans:
+            stage = stages.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0})
+            stage["calls"] += 1
+            stage["total"] += duration / 1e9
+            stage["max"] = max(stage["max"], duration / 1e9)
+        for stage in stages.values():
+            stage["mean"] = stage["total"] / stage["calls"]
+        return dict(sorted(stages.items(), key=lambda item: -item[1]["total"]))
+
+    def to_dict(self):
+        return {
+            "pid": self.pid,
+            "spans": [{"name": name, "start": (start - self.origin) / 1e9, "duration": duration / 1e9,
+                       "thread": thread, "attrs": attrs}
+                      for name, start, duration, thread, attrs in self.spans],
+            "counters": dict(self.counters),
+            "summary": self.summary(),
+        }
+
+    def to_chrome_trace(self):
+        events = [{"name": name, "cat": name.split(".")[0], "ph": "X", "ts": (start - self.origin) / 1e3,
+                   "dur": duration / 1e3, "pid": self.pid, "tid": thread, "args": attrs}
+                  for name, start, duration, thread, attrs in self.spans]
+        events += [{"name": name, "ph": "C", "ts": (timestamp - self.origin) / 1e3, "pid": self.pid,
+                    "args": {name: total}}
+                   for name, timestamp, total in self.counter_events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+    def export_json(self, path):
+        self._write(path, self.to_dict())
+
+    def export_chrome_trace(self, path):
+        self._write(path, self.to_chrome_trace())
+
+    def export(self, path):
+        """Chrome trace for paths ending in ".trace.json", structured JSON otherwise."""
+        path = path.replace("{pid}", str(os.getpid()))
+        if path.endswith(".trace.json"): self.export_chrome_trace(path)
+        else: self.export_json(path)
+
+
+def span(name, **attrs):
+    """Context manager timing the enclosed block as stage `name`; a no-op while disabled."""
+    if _recorder is None: return _NULL_SPAN
+    return _Span(_recorder, name, attrs)
+
+
+def traced(name):
+    """Decorator recording each call of the function as a span; one extra call while disabled."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None: return func(*args, **kwargs)
+            with _Span(_recorder, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Adds `value` to counter `name`; a no-op while disabled."""
+    if _recorder is None: return
+    _recorder._count(name, value)
+
+
+def enabled():
+    return _recorder is not None
+
+
+def enable(recorder=None):
+    """Starts recording into `recorder` (a new Recorder by default) and returns it."""
+    global _recorder
+    _recorder = recorder or Recorder()
+    return _recorder
+
+
+def disable():
+    """Stops recording and returns the recorder that was active, if any."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+class recording:
+    """Context manager enabling instrumentation for its body; yields the Recorder."""
+
+    def __init__(self, recorder=None):
+        self.recorder = recorder or Recorder()
+
+    def __enter__(self):
+        self.previous = _recorder
+        return enable(self.recorder)
+
+    def __exit__(self, *exc):
+        global _recorder
+        _recorder = self.previous
+        return False
+
+
+if os.environ.get("ONEBQF_TRACE"):
+    _env_recorder = enable()
+    atexit.register(lambda: _env_recorder.export(os.environ["ONEBQF_TRACE"]))
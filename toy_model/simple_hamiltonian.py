@@ -3,56 +3,119 @@ from toy_model.state_event_generator import StateEventGenerator
 from toy_model.state_event_model import Segment
 from toy_model.hamiltonian import Hamiltonian
 from toy_model.state_event_model import Track
+import toy_model.instrumentation as instrumentation
 
 from itertools import product, count
 from scipy.special import erf 
 from copy import deepcopy
+import dataclasses
 import random
 import scipy as sci
 import numpy as np
 
 
+@dataclasses.dataclass
+class PointingFilter:
+    """
+    Segment candidate pre-filter: a segment is kept when its slopes tx = dx/dz, ty = dy/dz lie
+    in the acceptance window and its straight-line extrapolation to the z of some primary
+    vertex passes within `max_distance` of it in x and y.
+    """
+    vertices: np.ndarray          # (n_vertices, 3)
+    max_distance: float = 1.0
+    tx_range: tuple = (-np.inf, np.inf)
+    ty_range: tuple = (-np.inf, np.inf)
+
+    @classmethod
+    def from_generator(cls, generator: StateEventGenerator, max_distance=1.0, angle_tolerance=0.0):
+        """Vertices and phi/theta acceptance of a generator, widened by `angle_tolerance` radians."""
+        return cls(np.asarray(generator.primary_vertices, dtype=float).reshape(-1, 3), max_distance,
+                   (np.tan(generator.phi_min - angle_tolerance), np.tan(generator.phi_max + angle_tolerance)),
+                   (np.tan(generator.theta_min - angle_tolerance), np.tan(generator.theta_max + angle_tolerance)))
+
+    def mask(self, from_xyz, to_xyz):
+        """Boolean (n_from, n_to) matrix of the kept hit pairs."""
+        dx = to_xyz[None, :, 0] - from_xyz[:, None, 0]
+        dy = to_xyz[None, :, 1] - from_xyz[:, None, 1]
+        dz = to_xyz[None, :, 2] - from_xyz[:, None, 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tx, ty = dx / dz, dy / dz
+        keep = (tx >= self.tx_range[0]) & (tx <= self.tx_range[1]) & (ty >= self.ty_range[0]) & (ty <= self.ty_range[1])
+        pointing = np.zeros_like(keep)
+        for vx, vy, vz in self.vertices:
+            lever = vz - from_xyz[:, None, 2]
+            pointing |= ((np.abs(from_xyz[:, None, 0] + tx * lever - vx) <= self.max_distance)
+                         & (np.abs(from_xyz[:, None, 1] + ty * lever - vy) <= self.max_distance))
+        return keep & pointing
+
+
 class SimpleHamiltonian(Hamiltonian):
     
-    def __init__(self, epsilon, alpha, beta, theta_d = 1e-4):
+    def __init__(self, epsilon, alpha, beta, theta_d = 1e-4, segment_filter: PointingFilter = None):
         self.epsilon                                    = epsilon
         self.gamma                                      = alpha
         self.delta                                      = beta
         self.theta_d                                   = theta_d
+        self.segment_filter                             = segment_filter
+        self.filter_report                              = None
         self.Z                                          = None
         self.A                                          = None
         self.b                                          = None
         self.segments                                   = None
         self.segments_grouped                           = None
         self.n_segments                                 = None
+        self.segments_event                             = None
     
+    @instrumentation.traced("hamiltonian.segments")
     def construct_segments(self, event: StateEventGenerator):
         
         segments_grouped = []
         segments = []
         n_segments = 0
         segment_id = count()
+        report = {"candidates": 0, "removed": 0, "true_candidates": 0, "true_lost": 0}
 
         for idx in range(len(event.modules)-1):
             from_hits = event.modules[idx].hits
             to_hits = event.modules[idx+1].hits
 
-            segments_group = []
-            for from_hit, to_hit in product(from_hits, to_hits):
-                seg = Segment([from_hit, to_hit],next(segment_id))
-                segments_group.append(seg)
-                segments.append(seg)
-                n_segments = n_segments + 1
-        
+            if self.segment_filter is None:
+                pairs = product(from_hits, to_hits)
+            else:
+                from_xyz = np.array([(h.x, h.y, h.z) for h in from_hits], dtype=float).reshape(-1, 3)
+                to_xyz = np.array([(h.x, h.y, h.z) for h in to_hits], dtype=float).reshape(-1, 3)
+                keep = self.segment_filter.mask(from_xyz, to_xyz)
+                from_tracks = np.array([h.track_id for h in from_hits]).reshape(-1, 1)
+                to_tracks = np.array([h.track_id for h in to_hits]).reshape(1, -1)
+                true = (from_tracks == to_tracks) & (from_tracks >= 0)
+                report["candidates"] += keep.size
+                report["removed"] += int(keep.size - keep.sum())
+                report["true_candidates"] += int(true.sum())
+                report["true_lost"] += int((true & ~keep).sum())
+                # Only the kept pairs become Segment objects, straight from the mask's index arrays
+                rows, cols = np.nonzero(keep)
+                pairs = zip(map(from_hits.__getitem__, rows.tolist()), map(to_hits.__getitem__, cols.tolist()))
+
+            segments_group = [Segment([from_hit, to_hit], next(segment_id)) for from_hit, to_hit in pairs]
+            segments.extend(segments_group)
+            n_segments = n_segments + len(segments_group)
+
             segments_grouped.append(segments_group)
         
         self.segments_grouped = segments_grouped
         self.segments = segments
         self.n_segments = n_segments
+        self.segments_event = event
+        if self.segment_filter is not None:
+            self.filter_report = report
+            instrumentation.count("segments_filtered", report["removed"])
+        instrumentation.count("segments_built", n_segments)
         
+    @instrumentation.traced("hamiltonian.assemble")
     def construct_hamiltonian(self, event: StateEventGenerator, convolution: bool= False):
         Segment.id_counter = 0
-        if self.segments_grouped is None:
+        # Segments are rebuilt when the instance is reused for another event
+        if self.segments_grouped is None or self.segments_event is not event:
             self.construct_segments(event)
         A = sci.sparse.eye(self.n_segments,format='lil')*(-(self.delta+self.gamma))
         b = np.ones(self.n_segments)*self.delta
@@ -67,10 +130,12 @@ class SimpleHamiltonian(Hamiltonian):
                         if abs(cosine - 1) < self.epsilon:
                             A[seg_i.segment_id, seg_j.segment_id] = A[seg_j.segment_id, seg_i.segment_id] =  1
         A = A.tocsc()
+        instrumentation.count("hamiltonian_nnz", A.nnz)
         
         self.A, self.b = -A, b
         return -A, b
     
+    @instrumentation.traced("hamiltonian.solve")
     def solve_classicaly(self):
 
         if self.A is None:
@@ -102,8 +167,11 @@ def find_segments(s0: Segment, active: Segment):
                 found_s.append(s1)
         return found_s
 
-def get_tracks(ham: SimpleHamiltonian, classical_solution: list[int], event: StateEventGenerator):
-    active_segments = [segment for segment,pseudo_state in zip(ham.segments,classical_solution) if pseudo_state > np.min(classical_solution)]
+@instrumentation.traced("tracks.reconstruct")
+def get_tracks(ham: SimpleHamiltonian, classical_solution: list[int], event: StateEventGenerator, threshold=None):
+    # Segments strictly above `threshold` are active (default: the minimum, as chosen by threshold_scan.roc_curve)
+    threshold = np.min(classical_solution) if threshold is None else threshold
+    active_segments = [segment for segment,pseudo_state in zip(ham.segments,classical_solution) if pseudo_state > threshold]
     active = deepcopy(active_segments)
     tracks = []
     while len(active):
@@ -129,4 +197,5 @@ def get_tracks(ham: SimpleHamiltonian, classical_solution: list[int], event: Sta
                 track_hits.append(matching_hits[0])
         if track_hits:
             tracks_processed.append(Track(track_ind, track_hits, 1))
+    instrumentation.count("tracks_found", len(tracks_processed))
     return tracks_processed
\ No newline at end of file
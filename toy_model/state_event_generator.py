@@ -5,6 +5,7 @@ collision events parameterized by the LHCb state vector (x, y, tx, ty, p/q).
 
 import numpy as np
 import toy_model.state_event_model as em
+import toy_model.instrumentation as instrumentation
 import dataclasses
 from itertools import count
 from abc import ABC, abstractmethod
@@ -171,6 +172,7 @@ class StateEventGenerator:
 
         return particle
 
+    @instrumentation.traced("event.generate")
     def generate_complete_events(self):
         """
         Generates fully propagated events, from the primary vertices through each detector layer,
@@ -272,9 +274,11 @@ class StateEventGenerator:
 
         self.true_event = em.Event(self.detector_geometry, self.true_tracks, self.true_hits, self.true_segments, self.true_modules)
 
+        instrumentation.count("hits_generated", len(self.hits))
         return self.true_event
 
     
+    @instrumentation.traced("event.make_noisy")
     def make_noisy_event(self, drop_rate=0.1, ghost_rate=0.1):
         """
         Simulates hit dropout and adds ghost hits in the detector.
@@ -0,0 +1,115 @@
+"""
+Sort-based threshold scan (ROC) for discretizing Hamiltonian solutions.
+
+A segment is predicted active when its solution value is strictly above the threshold T, as
+in `get_tracks`; `utils.solution_statistics` and `utils.plot_solution_comparison` report
+their counts and rates from this curve. Sorting the values once (descending) and taking
+cumulative sums of the truth labels gives the true- and false-positive counts at every
+distinct value, so the whole curve costs O(n log n) instead of one full comparison per
+threshold. Events are pooled: their values are concatenated and sorted together, which
+yields the aggregated counts at every threshold that matters for any event.
+
+Usage:
+    curve = roc_curve(solutions, labels)          # lists of per-event arrays, or single arrays
+    best = curve.best("youden")                   # {"threshold": ..., "tp": ..., "tpr": ..., "fpr": ...}
+    curve.at([0.45])                              # rates at fixed thresholds
+"""
+import dataclasses
+import numpy as np
+from scipy.integrate import trapezoid
+
+
+def segment_labels(segments):
+    """True for segments whose two hits belong to the same (non-ghost) track."""
+    return np.fromiter((s.hits[0].track_id == s.hits[1].track_id and s.hits[0].track_id >= 0 for s in segments),
+                       dtype=bool, count=len(segments))
+
+
+@dataclasses.dataclass
+class ROCCurve:
+    thresholds: np.ndarray  # descending; the last one is -inf (everything active)
+    tp: np.ndarray          # positives with value > threshold
+    fp: np.ndarray          # negatives with value > threshold
+    n_positive: int
+    n_negative: int
+
+    @property
+    def tpr(self):
+        return self.tp / max(self.n_positive, 1)
+
+    @property
+    def fpr(self):
+        return self.fp / max(self.n_negative, 1)
+
+    @property
+    def precision(self):
+        predicted = self.tp + self.fp
+        return np.divide(self.tp, predicted, out=np.ones(len(predicted)), where=predicted > 0)
+
+    @property
+    def f1(self):
+        denominator = 2 * self.tp + self.fp + (self.n_positive - self.tp)
+        return np.divide(2 * self.tp, denominator, out=np.zeros(len(self.tp)), where=denominator > 0)
+
+    @property
+    def accuracy(self):
+        return (self.tp + self.n_negative - self.fp) / max(self.n_positive + self.n_negative, 1)
+
+    def auc(self):
+        """Area under the ROC curve (trapezoidal)."""
+        return float(trapezoid(self.tpr, self.fpr))
+
+    def _point(self, i):
+        return {"threshold": float(self.thresholds[i]), "tp": int(self.tp[i]), "fp": int(self.fp[i]),
+                "tpr": float(self.tpr[i]), "fpr": float(self.fpr[i]),
+                "precision": float(self.precision[i]), "f1": float(self.f1[i]), "accuracy": float(self.accuracy[i])}
+
+    def best(self, criterion="youden"):
+        """Operating point maximizing "youden" (tpr - fpr), "f1" or "accuracy"; ties keep the highest threshold."""
+        if criterion == "youden":
+            score = self.tpr - self.fpr
+        elif criterion in ("f1", "accuracy"):
+            score = getattr(self, criterion)
+        else:
+            raise ValueError(f"Unknown criterion '{criterion}', expected 'youden', 'f1' or 'accuracy'.")
+        return self._point(int(np.argmax(score)))
+
+    def at(self, thresholds):
+        """Operating points at arbitrary thresholds, by binary search on the curve."""
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype=float))
+        # Counts above T equal those at the largest curve threshold <= T
+        ascending = self.thresholds[::-1]
+        index = len(ascending) - np.searchsorted(ascending, thresholds, side="right")
+        index = np.clip(index, 0, len(self.thresholds) - 1)
+        points = [self._point(i) for i in index]
+        for point, threshold in zip(points, thresholds):
+            point["threshold"] = float(threshold)
+        return points
+
+
+def roc_curve(values, labels):
+    """
+    ROC curve of `values` (solution values) against boolean `labels`, for one event (arrays)
+    or many events (lists of arrays, pooled).
+    """
+    if isinstance(values, (list, tuple)):
+        values = np.concatenate([np.asarray(v, dtype=float).ravel() for v in values]) if values else np.zeros(0)
+        labels = np.concatenate([np.asarray(l, dtype=bool).ravel() for l in labels]) if labels else np.zeros(0, bool)
+    values, labels = np.asarray(values, dtype=float).ravel(), np.asarray(labels, dtype=bool).ravel()
+    if len(values) != len(labels):
+        raise ValueError("values and labels must have the same length.")
+
+    order = np.argsort(-values, kind="stable")
+    sorted_values, sorted_labels = values[order], labels[order]
+    tp_cumulative = np.cumsum(sorted_labels)
+    fp_cumulative = np.arange(1, len(values) + 1) - tp_cumulative
+
+    # Distinct values u_0 > u_1 > ...: at T = u_j exactly the entries before the first u_j are above T
+    first = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]]) if len(values) else np.zeros(0, int)
+    above = np.r_[0, tp_cumulative][first], np.r_[0, fp_cumulative][first]
+    n_positive = int(tp_cumulative[-1]) if len(values) else 0
+    n_negative = len(values) - n_positive
+    return ROCCurve(thresholds=np.r_[sorted_values[first], -np.inf],
+                    tp=np.r_[above[0], n_positive].astype(np.int64),
+                    fp=np.r_[above[1], n_negative].astype(np.int64),
+                    n_positive=n_positive, n_negative=n_negative)
@@ -0,0 +1,167 @@
+"""
+Vectorized track-reconstruction metrics over many events at once.
+
+Events are described by id arrays: for the truth, the `track_id` of every hit in `event.hits`
+order (-1 for ghost hits); for the reconstruction, (track, hit) index pairs, where hit indexes
+into the same `event.hits`. All events are stacked with offsets into two sparse incidence
+matrices, reconstructed-track x hit and hit x true-track, whose product counts the hits
+every reconstructed track shares with every true track. From it:
+
+    purity      shared hits with the best-matching true track / hits of the reconstructed track
+    matched     purity >= min_purity; unmatched reconstructed tracks are ghosts
+    efficiency  reconstructible true tracks (>= min_true_hits hits) with at least one match
+    clone rate  matches beyond the first per true track / matched reconstructed tracks
+    hit purity  mean purity of the matched tracks; hit efficiency the mean fraction of the
+                true track's hits they contain
+
+Usage:
+    truth = [event_truth(event) for event in events]
+    reco = [tracks_to_arrays(get_tracks(ham, solution, event), event) for ...]
+    metrics = evaluate(truth, reco)
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+
+def event_truth(event):
+    """track_id of every hit in `event.hits` order (-1 for ghost hits)."""
+    return np.fromiter((hit.track_id for hit in event.hits), dtype=np.int64, count=len(event.hits))
+
+
+def _hit_positions(event):
+    return {id(hit): position for position, hit in enumerate(event.hits)}
+
+
+def tracks_to_arrays(tracks, event):
+    """(track, hit) index arrays of reconstructed Track objects, with hits as positions in `event.hits`."""
+    positions = _hit_positions(event)
+    track_index = [i for i, track in enumerate(tracks) for hit in track.hits if id(hit) in positions]
+    hit_index = [positions[id(hit)] for track in tracks for hit in track.hits if id(hit) in positions]
+    return np.array(track_index, dtype=np.int64), np.array(hit_index, dtype=np.int64)
+
+
+def segment_hit_indices(segments, event):
+    """(from, to) positions in `event.hits` of each segment, e.g. of `SimpleHamiltonian.segments`."""
+    positions = _hit_positions(event)
+    from_hits = np.fromiter((positions[id(segment.hits[0])] for segment in segments), dtype=np.int64,
+                            count=len(segments))
+    to_hits = np.fromiter((positions[id(segment.hits[1])] for segment in segments), dtype=np.int64,
+                          count=len(segments))
+    return from_hits, to_hits
+
+
+def segments_to_arrays(n_hits, from_hits, to_hits, active):
+    """
+    (track, hit) index arrays of the tracks formed by active segments: hits joined by active
+    segments form one track, as in `get_tracks`.
+    """
+    active = np.asarray(active, dtype=bool)
+    from_hits, to_hits = np.asarray(from_hits)[active], np.asarray(to_hits)[active]
+    graph = sp.coo_matrix((np.ones(len(from_hits)), (from_hits, to_hits)), shape=(n_hits, n_hits))
+    _, labels = connected_components(graph, directed=False)
+    used = np.zeros(n_hits, dtype=bool)
+    used[from_hits] = used[to_hits] = True
+    hit_index = np.flatnonzero(used)
+    _, track_index = np.unique(labels[hit_index], return_inverse=True)
+    return track_index.astype(np.int64), hit_index
+
+
+def _stack(truth, reco):
+    truth = [np.asarray(t, dtype=np.int64) for t in truth]
+    hit_offsets = np.concatenate([[0], np.cumsum([len(t) for t in truth], dtype=np.int64)])
+    n_reco = [int(r[0].max()) + 1 if len(r[0]) else 0 for r in reco]
+    reco_offsets = np.concatenate([[0], np.cumsum(n_reco, dtype=np.int64)])
+
+    hit_track = np.concatenate(truth) if truth else np.zeros(0, dtype=np.int64)
+    hit_event = np.repeat(np.arange(len(truth)), np.diff(hit_offsets))
+    empty = [np.zeros(0, dtype=np.int64)]
+    reco_track = np.concatenate(empty + [np.asarray(r[0], dtype=np.int64) + reco_offsets[e] for e, r in enumerate(reco)])
+    reco_hit = np.concatenate(empty + [np.asarray(r[1], dtype=np.int64) + hit_offsets[e] for e, r in enumerate(reco)])
+    return hit_track, hit_event, reco_track, reco_hit, reco_offsets
+
+
+def evaluate(truth, reco, min_purity=0.7, min_true_hits=3):
+    """
+    Reconstruction metrics for a list of events.
+
+    Args:
+        truth (list): Per event, the track id of every hit (see `event_truth`)
+        reco (list): Per event, (track, hit) index arrays (see `tracks_to_arrays`, `segments_to_arrays`)
+        min_purity (float): Fraction of a reconstructed track's hits that must share one true track
+        min_true_hits (int): Hits a true track needs to count as reconstructible
+
+    Returns:
+        dict: Overall rates and counts, and a "per_event" dict of the same quantities as arrays
+    """
+    if len(truth) != len(reco):
+        raise ValueError("truth and reco must describe the same number of events.")
+    hit_track, hit_event, reco_track, reco_hit, reco_offsets = _stack(truth, reco)
+    n_events, n_hits, n_reco = len(truth), len(hit_track), int(reco_offsets[-1])
+
+    # True tracks are (event, track_id) pairs; ghost hits belong to none
+    is_true = hit_track >= 0
+    keys = hit_event[is_true] * (int(hit_track.max(initial=0)) + 1) + hit_track[is_true]
+    true_keys, true_index = np.unique(keys, return_inverse=True)
+    n_true = len(true_keys)
+    true_event = true_keys // (int(hit_track.max(initial=0)) + 1)
+
+    reco_incidence = sp.csr_matrix((np.ones(len(reco_track)), (reco_track, reco_hit)), shape=(n_reco, n_hits))
+    reco_incidence.data[:] = 1  # a hit listed twice for one track counts once
+    truth_incidence = sp.csr_matrix((np.ones(len(true_index)), (np.flatnonzero(is_true), true_index)),
+                                    shape=(n_hits, n_true))
+    shared = (reco_incidence @ truth_incidence).tocsr()
+
+    reco_hits = np.asarray(reco_incidence.sum(axis=1)).ravel()
+    if n_true and n_reco:
+        best = np.asarray(shared.argmax(axis=1)).ravel()
+        best_shared = np.asarray(shared.max(axis=1).todense()).ravel()
+    else:
+        best, best_shared = np.zeros(n_reco, dtype=np.int64), np.zeros(n_reco)
+    purity = np.divide(best_shared, reco_hits, out=np.zeros(n_reco), where=reco_hits > 0)
+    matched = (best_shared > 0) & (purity >= min_purity)
+
+    true_hits = np.bincount(true_index, minlength=n_true)
+    reconstructible = true_hits >= min_true_hits
+    matches = np.bincount(best[matched], minlength=n_true)
+    found = reconstructible & (matches > 0)
+    clones = np.maximum(matches - 1, 0)
+    # Without true tracks nothing is matched and `best` points nowhere
+    best_true_hits = true_hits[best] if n_true else np.zeros(n_reco, dtype=np.int64)
+    hit_efficiency = np.divide(best_shared, best_true_hits, out=np.zeros(n_reco), where=matched)
+
+    reco_event = np.repeat(np.arange(n_events), np.diff(reco_offsets))
+
+    def per_event(values, events):
+        return np.bincount(events, weights=values, minlength=n_events)
+
+    def rate(numerator, denominator):
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator, dtype=float), where=denominator > 0)
+
+    counts = {
+        "n_reconstructed": per_event(np.ones(n_reco), reco_event),
+        "n_matched": per_event(matched, reco_event),
+        "n_ghosts": per_event(~matched, reco_event),
+        "n_true": per_event(np.ones(n_true), true_event),
+        "n_reconstructible": per_event(reconstructible, true_event),
+        "n_found": per_event(found, true_event),
+        "n_clones": per_event(clones, true_event),
+        "purity_sum": per_event(np.where(matched, purity, 0.0), reco_event),
+        "hit_efficiency_sum": per_event(hit_efficiency, reco_event),
+    }
+
+    def rates(c):
+        return {
+            "efficiency": rate(c["n_found"], c["n_reconstructible"]),
+            "ghost_rate": rate(c["n_ghosts"], c["n_reconstructed"]),
+            "clone_rate": rate(c["n_clones"], c["n_matched"]),
+            "hit_purity": rate(c["purity_sum"], c["n_matched"]),
+            "hit_efficiency": rate(c["hit_efficiency_sum"], c["n_matched"]),
+        }
+
+    totals = {key: np.array(value.sum()) for key, value in counts.items()}
+    result = {key: float(value) for key, value in rates(totals).items()}
+    result.update({key: int(value) for key, value in totals.items() if key.startswith("n_")})
+    result["per_event"] = {**rates(counts), **{key: value.astype(np.int64) for key, value in counts.items()
+                                               if key.startswith("n_")}}
+    return result
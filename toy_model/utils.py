@@ -6,6 +6,7 @@ import numpy as np
 import dataclasses
 from itertools import pairwise
 import matplotlib.pyplot as plt
+from toy_model.threshold_scan import roc_curve
 
 def plot_solution_comparison(classical_solution, discretized_solution, threshold=None, title = "Classical Solution", figsize=(12, 5)):
     """
@@ -18,7 +19,8 @@ def plot_solution_comparison(classical_solution, discretized_solution, threshold
     discretized_solution : array-like
         Binary solution after thresholding
     threshold : float, optional
-        Threshold value used for discretization (for reference line)
+        Threshold value used for discretization (for reference line); the rates at it
+        against the binary solution are read from `threshold_scan.roc_curve`
     figsize : tuple, optional
         Figure size (width, height)
     """
@@ -51,7 +53,11 @@ def plot_solution_comparison(classical_solution, discretized_solution, threshold
     # Add statistics
     n_active = np.sum(discretized_solution)
     total = len(discretized_solution)
-    ax2.text(0.02, 0.98, f'Active elements: {n_active}/{total}', 
+    text = f'Active elements: {n_active}/{total}'
+    if threshold is not None:
+        point = roc_curve(classical_solution, np.asarray(discretized_solution) == 1).at(threshold)[0]
+        text += f"\nTPR = {point['tpr']:.3f}, FPR = {point['fpr']:.3f}"
+    ax2.text(0.02, 0.98, text,
              transform=ax2.transAxes, verticalalignment='top',
              bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
     
@@ -101,7 +107,7 @@ def plot_solution_histogram(classical_solution, threshold=None, bins=50, figsize
     plt.show()
 
 
-def solution_statistics(classical_solution, discretized_solution, threshold):
+def solution_statistics(classical_solution, discretized_solution, threshold=None):
     """
     Print statistics about the classical and discretized solutions.
     
@@ -111,9 +117,17 @@ def solution_statistics(classical_solution, discretized_solution, threshold):
         Continuous solution from Hamiltonian optimization
     discretized_solution : array-like
         Binary solution after thresholding
-    threshold : float
-        Threshold value used for discretization
+    threshold : float, optional
+        Threshold value used for discretization; defaults to the one maximizing
+        tpr - fpr against `discretized_solution`. Counts and rates come from one
+        `threshold_scan.roc_curve`
     """
+    classical_solution = np.asarray(classical_solution)
+    discretized_solution = np.asarray(discretized_solution)
+    curve = roc_curve(classical_solution, discretized_solution == 1)
+    point = curve.best("youden") if threshold is None else curve.at(threshold)[0]
+    above = point["tp"] + point["fp"]
+
     print("=" * 50)
     print("SOLUTION STATISTICS")
     print("=" * 50)
@@ -125,9 +139,11 @@ def solution_statistics(classical_solution, discretized_solution, threshold):
     print(f"  Std deviation: {np.std(classical_solution):.6f}")
     
     print(f"\nDiscretization:")
-    print(f"  Threshold: {threshold}")
-    print(f"  Elements above threshold: {np.sum(classical_solution > threshold)}")
-    print(f"  Elements below threshold: {np.sum(classical_solution <= threshold)}")
+    print(f"  Threshold: {point['threshold']}{' (best tpr - fpr)' if threshold is None else ''}")
+    print(f"  Elements above threshold: {above}")
+    print(f"  Elements below threshold: {len(classical_solution) - above}")
+    print(f"  TPR: {point['tpr']:.4f}, FPR: {point['fpr']:.4f}, precision: {point['precision']:.4f}, "
+          f"F1: {point['f1']:.4f}, AUC: {curve.auc():.4f}")
     
     print(f"\nBinary Solution:")
     print(f"  Active elements (1s): {np.sum(discretized_solution)}")